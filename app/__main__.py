@@ -0,0 +1,304 @@
+# コマンドラインから使う入口（GUIを起動しない）
+# 例: python -m app export dictionaries/base_dictionary/*.txt --all
+# 起動を速くするため、各コマンドで使うモジュールはそのコマンドの中で読み込む
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_DICTIONARY_DIR = "dictionaries"
+
+
+def base_dictionary_dir(args):
+    return os.path.join(args.dictionaries, "base_dictionary")
+
+
+# GUIが使う読み込みキャッシュの置き場所（辞書を書き換えたら消す）
+def cache_dir(args):
+    return os.path.join(args.dictionaries, "cache")
+
+
+# 辞書フォルダの plugins に置いた形式も使えるようにする（GUIと同じ）
+def load_plugins(args):
+    from logic.plugins import load_plugin_dir
+
+    for path, e in load_plugin_dir(os.path.join(getattr(args, "dictionaries", DEFAULT_DICTIONARY_DIR), "plugins")):
+        print(f"プラグインを読み込めませんでした: {path}: {e}", file=sys.stderr)
+
+
+# 辞書txtをベース辞書フォルダに取り込む
+def cmd_import(args):
+    from logic.dictionary_importer import IMPORT_FORMATS, iter_import_files
+
+    if args.format is not None and args.format not in IMPORT_FORMATS:
+        print(f"不明な形式: {args.format}（{', '.join(IMPORT_FORMATS)} から選んでください）", file=sys.stderr)
+        return 2
+    target_dir = base_dictionary_dir(args)
+    os.makedirs(target_dir, exist_ok=True)
+    status = 0
+    jobs = []
+    for path in args.files:
+        base, _ = os.path.splitext(os.path.basename(path))
+        target = os.path.join(target_dir, base + ".txt")
+        if os.path.exists(target) and not args.overwrite:
+            print(f"{path}: {target} はすでに存在します（上書きは --overwrite）", file=sys.stderr)
+            status = 1
+            continue
+        jobs.append((path, target))
+    for result in iter_import_files(jobs, args.format, args.encoding, args.jobs, cache_dir(args)):
+        if result.error is not None:
+            print(result.summary(), file=sys.stderr)
+            status = 1
+            continue
+        print(f"{result.path} -> {result.target} ({result.summary()})")
+    return status
+
+
+# 書き出せない行（Shift_JISで表せない文字など）があれば、書き始める前に一覧を出して止める
+# --skip-invalidならその行だけ除いて書き出す（GUIの「問題のある行を除く」と同じ）
+def cmd_export(args):
+    from logic.dictionary_manager import DictionaryManager, EXPORT_FORMATS
+    from logic.journal import read_entries_with_journal
+    from logic.validation import LEVEL_ERROR, validate_entries
+
+    format_names = list(EXPORT_FORMATS) if args.all or not args.format else args.format
+    unknown = [name for name in format_names if name not in EXPORT_FORMATS]
+    if unknown:
+        print(f"不明な形式: {', '.join(unknown)}（{', '.join(EXPORT_FORMATS)} から選んでください）", file=sys.stderr)
+        return 2
+    manager = DictionaryManager(args.output)
+    status = 0
+    for path in args.files:
+        base, _ = os.path.splitext(os.path.basename(path))
+        entries = read_entries_with_journal(path)
+        report = validate_entries(entries)
+        error_rows = report.error_rows(format_names)
+        for row in error_rows:
+            yomi, hyouki, _ = entries[row]
+            messages = [
+                issue.message for issue in report.issues[row]
+                if issue.level == LEVEL_ERROR and issue.applies_to(format_names)
+            ]
+            print(f"{path}: {row + 1}件目\t{yomi}\t{hyouki}\t{'、'.join(messages)}", file=sys.stderr)
+        skip_rows = None
+        if error_rows:
+            if not args.skip_invalid:
+                print(f"{path}: 書き出せない行が{len(error_rows)}行あるため書き出しません（その行を除いて書き出すなら --skip-invalid）", file=sys.stderr)
+                status = 1
+                continue
+            skip_rows = report.skip_rows(format_names)
+        paths = manager.export(entries, base, format_names, parallel=not args.no_parallel, skip_rows=skip_rows)
+        for name, out_path in paths.items():
+            print(f"{path} -> {out_path} ({name})")
+        if skip_rows:
+            print(f"{path}: 問題のある{len(error_rows)}行は書き出していません")
+    return status
+
+
+# 複数の辞書を1つにまとめる
+def cmd_merge(args):
+    from logic.merge import merge_dictionaries
+
+    report = merge_dictionaries(args.files, args.output, args.policy, args.report, args.max_in_memory, cache_dir(args))
+    print(f"{len(args.files)}ファイル -> {args.output}: {report.summary()}")
+    if args.report:
+        print(f"明細: {args.report}")
+    return 0
+
+
+# 形式の崩れた行・空の項目・読み・タブや改行・重複・Shift_JISで書けない文字を調べる
+# --fixなら正規化で直せるものを直し、重複を消して書き戻す
+def cmd_validate(args):
+    from logic.journal import DictionaryJournal
+    from logic.validation import validate_entries
+
+    status = 0
+    for path in args.files:
+        problems = []
+        entries = []
+        line_numbers = []
+        malformed = 0
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if line.startswith("!") or not line.strip():
+                    continue
+                parts = line.rstrip("\r\n").split("\t")
+                if len(parts) != 3:
+                    problems.append((line_no, "列の数が3つではありません"))
+                    malformed += 1
+                    continue
+                entries.append(tuple(parts))
+                line_numbers.append(line_no)
+        report = validate_entries(entries)
+        for row, issues in report.issues.items():
+            for issue in issues:
+                problems.append((line_numbers[row], issue.message))
+        problems.sort(key=lambda problem: problem[0])
+        for line_no, message in problems:
+            print(f"{path}:{line_no}: {message}")
+        print(f"{path}: {len(problems)}件の問題（{report.summary()}）")
+        if args.fix and report.fix_plan():
+            # 列の崩れた行は直し方が分からないので、消してしまわないよう書き戻さない
+            if malformed:
+                print(f"{path}: 列の数が違う行があるため書き戻しません", file=sys.stderr)
+                status = 1
+                continue
+            # 行番号で記録した未反映の編集があると、書き戻したtxtに合わなくなるので触らない
+            journal = DictionaryJournal(path)
+            if journal.has_pending():
+                print(f"{path}: 未反映の編集（{os.path.basename(journal.path)}）があるため書き戻しません。GUIで開いて保存してから実行してください", file=sys.stderr)
+                status = 1
+                continue
+            for row, entry in report.fix_plan():
+                if entry is None:
+                    del entries[row]
+                else:
+                    entries[row] = entry
+            journal.compact(entries)
+            remaining = validate_entries(entries)
+            print(f"{path}: 正規化して書き戻しました（{remaining.summary()}）")
+            problems = remaining.error_rows()
+        if problems:
+            status = 1
+    return status
+
+
+def cmd_stats(args):
+    from collections import Counter
+    from logic.journal import journal_path_for, read_entries_with_journal
+
+    for path in args.files:
+        entries = read_entries_with_journal(path)
+        hinshi_counts = Counter(entry[2] for entry in entries)
+        journal_path = journal_path_for(path)
+        print(path)
+        print(f"  件数: {len(entries)}")
+        print(f"  読みの種類: {len({entry[0] for entry in entries})}")
+        print(f"  ファイルサイズ: {os.path.getsize(path)} bytes")
+        if os.path.exists(journal_path):
+            print(f"  未反映の編集: {os.path.getsize(journal_path)} bytes")
+        for hinshi, count in hinshi_counts.most_common():
+            print(f"  {hinshi}: {count}")
+    return 0
+
+
+def sync_folder(args):
+    from logic.sync_log import SyncFolder
+
+    return SyncFolder(base_dictionary_dir(args), os.path.join(args.dictionaries, "sync"))
+
+
+# ほかの端末から取り込めるよう、辞書の変更を配る（Ctrl+Cで終了）
+# 取り込む側には表示した合言葉を伝える（--tokenで指定もできる）
+def cmd_sync_serve(args):
+    import asyncio
+    from logic.lan_sync import SyncServer, is_loopback, load_pairing_token
+
+    folder = sync_folder(args)
+    token = args.token or load_pairing_token(folder.sync_dir)
+    server = SyncServer(folder, token, args.host, args.port)
+    if not is_loopback(args.host):
+        print(f"注意: {args.host} で待ち受けるので、同じネットワークの端末から接続できます（合言葉を知っている相手だけが辞書を受け取れます）", file=sys.stderr)
+
+    async def serve():
+        await server.start()
+        print(f"{args.host}:{server.port} で待ち受けています（端末ID {folder.replica}、合言葉 {token}）", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+# 相手の端末の辞書から、まだ取り込んでいない変更だけを受け取る
+def cmd_sync_pull(args):
+    from logic.lan_sync import parse_address, pull
+    from logic.sync_log import SyncError
+
+    try:
+        host, port = parse_address(args.address)
+        results = pull(sync_folder(args), host, port, args.token, args.names or None)
+    except SyncError as e:
+        print(f"同期できませんでした: {e}", file=sys.stderr)
+        return 1
+    if not results:
+        print("新しい変更はありません")
+    for name, (added, removed) in sorted(results.items()):
+        print(f"{name}: 追加 {added}件・削除 {removed}件")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app", description="辞書ファイル管理ツール（コマンドライン版）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="辞書ファイル（Mozc/MS-IME/ATOK/SKK形式も可）をベース辞書フォルダに取り込む")
+    import_parser.add_argument("files", nargs="+", help="取り込む辞書ファイル")
+    import_parser.add_argument("-f", "--format", help="入力形式（google_mozc, msime, atok, skk。省略時は推定）")
+    import_parser.add_argument("--encoding", help="文字コード（省略時は推定）")
+    import_parser.add_argument("-j", "--jobs", type=int, help="並行して取り込むプロセス数")
+    import_parser.add_argument("-d", "--dictionaries", default=DEFAULT_DICTIONARY_DIR, help="辞書フォルダ")
+    import_parser.add_argument("--overwrite", action="store_true", help="同名の辞書を上書きする")
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = subparsers.add_parser("export", help="IME形式にエクスポート")
+    export_parser.add_argument("files", nargs="+", help="ベースの辞書txtファイル")
+    export_parser.add_argument("-f", "--format", action="append", help="出力形式（google_mozc, msime, atok, skk。複数指定可）")
+    export_parser.add_argument("--all", action="store_true", help="全形式を出力（既定）")
+    export_parser.add_argument("-o", "--output", default=os.path.join(DEFAULT_DICTIONARY_DIR, "saved_dictionary"), help="出力先フォルダ")
+    export_parser.add_argument("--no-parallel", action="store_true", help="形式ごとの並行書き込みをしない")
+    export_parser.add_argument("--skip-invalid", action="store_true", help="書き出せない行を除いて書き出す（省略時は書き出さずに終了）")
+    export_parser.add_argument("-d", "--dictionaries", default=DEFAULT_DICTIONARY_DIR, help="辞書フォルダ（plugins の形式も使う）")
+    export_parser.set_defaults(func=cmd_export)
+
+    merge_parser = subparsers.add_parser("merge", help="複数の辞書を1つにまとめる")
+    merge_parser.add_argument("files", nargs="+", help="まとめる辞書txtファイル")
+    merge_parser.add_argument("-o", "--output", required=True, help="出力する辞書txtファイル")
+    merge_parser.add_argument("--policy", choices=["first", "last", "keep_all"], default="first", help="品詞だけが違うエントリの扱い")
+    merge_parser.add_argument("--report", help="追加・除外・衝突の明細を書き出すTSVファイル")
+    merge_parser.add_argument("--max-in-memory", type=int, default=200000, help="この件数を超えたら一時ファイルに書き出す")
+    merge_parser.add_argument("-d", "--dictionaries", default=DEFAULT_DICTIONARY_DIR, help="辞書フォルダ（出力先を上書きしたらそのキャッシュを消す）")
+    merge_parser.set_defaults(func=cmd_merge)
+
+    validate_parser = subparsers.add_parser("validate", help="辞書の内容をチェック")
+    validate_parser.add_argument("files", nargs="+", help="チェックする辞書txtファイル")
+    validate_parser.add_argument("--fix", action="store_true", help="正規化で直せるものを直し、重複を消して書き戻す")
+    validate_parser.set_defaults(func=cmd_validate)
+
+    sync_parser = subparsers.add_parser("sync", help="LAN内のほかの端末と辞書を同期")
+    sync_subparsers = sync_parser.add_subparsers(dest="sync_command", required=True)
+    serve_parser = sync_subparsers.add_parser("serve", help="辞書の変更を配る")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス（LANのほかの端末に公開するなら0.0.0.0）")
+    serve_parser.add_argument("-p", "--port", type=int, default=8765, help="ポート番号")
+    serve_parser.add_argument("-t", "--token", help="合言葉（省略時は辞書フォルダの sync/pairing_token）")
+    serve_parser.add_argument("-d", "--dictionaries", default=DEFAULT_DICTIONARY_DIR, help="辞書フォルダ")
+    serve_parser.set_defaults(func=cmd_sync_serve)
+    pull_parser = sync_subparsers.add_parser("pull", help="相手の辞書の変更を取り込む")
+    pull_parser.add_argument("address", help="相手のアドレス（例: 192.168.0.10:8765）")
+    pull_parser.add_argument("names", nargs="*", help="取り込む辞書のファイル名（省略時はすべて）")
+    pull_parser.add_argument("-t", "--token", default=os.environ.get("DICTIONARY_APP_SYNC_TOKEN", ""),
+                             help="相手が表示した合言葉（環境変数 DICTIONARY_APP_SYNC_TOKEN でも指定できる）")
+    pull_parser.add_argument("-d", "--dictionaries", default=DEFAULT_DICTIONARY_DIR, help="辞書フォルダ")
+    pull_parser.set_defaults(func=cmd_sync_pull)
+
+    stats_parser = subparsers.add_parser("stats", help="辞書の件数などを表示")
+    stats_parser.add_argument("files", nargs="+", help="辞書txtファイル")
+    stats_parser.set_defaults(func=cmd_stats)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        load_plugins(args)
+        return args.func(args)
+    except (OSError, UnicodeError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
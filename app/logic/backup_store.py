@@ -0,0 +1,151 @@
+# 世代管理つきのバックアップ置き場（OneDriveの同期フォルダなどに置く）
+# 辞書ファイルを行の区切りでチャンクに分け、SHA-256をファイル名にして chunks/ に保存する。
+# 区切る位置は行の内容から決めるので、1行追加しても変わるのはその前後のチャンクだけになり、
+# 2回目以降のバックアップでは変わったチャンクとmanifest（チャンクの一覧）だけを書き込めばよい。
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+
+from logic.instrumentation import span
+
+CHUNKS_DIR = "chunks"
+MANIFESTS_DIR = "manifests"
+
+# チャンクの大きさの目安（平均はおよそ512行分）
+MIN_CHUNK_SIZE = 4 * 1024
+MAX_CHUNK_SIZE = 64 * 1024
+BOUNDARY_MASK = 0x1FF
+
+
+class BackupError(Exception):
+    pass
+
+
+# 行の内容から決まる位置でデータを分割する
+def split_chunks(data):
+    chunks = []
+    start = 0
+    pos = 0
+    for line in data.splitlines(keepends=True):
+        pos += len(line)
+        size = pos - start
+        if size >= MAX_CHUNK_SIZE or (size >= MIN_CHUNK_SIZE and zlib.crc32(line) & BOUNDARY_MASK == 0):
+            chunks.append(data[start:pos])
+            start = pos
+    if start < len(data):
+        chunks.append(data[start:])
+    return chunks
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class BackupStore:
+    def __init__(self, root):
+        self.root = root
+        self.chunks_dir = os.path.join(root, CHUNKS_DIR)
+        self.manifests_dir = os.path.join(root, MANIFESTS_DIR)
+
+    # pathの辞書ファイルをバックアップし、manifestを返す
+    # 前回から内容が変わっていなければ新しい世代は作らず、前回のmanifestを返す
+    def backup(self, path, name=None):
+        with span("backup") as backup_span:
+            manifest = self._backup(path, name)
+            backup_span.set(size=manifest["size"], new_chunks=manifest.get("new_chunks", 0))
+        return manifest
+
+    def _backup(self, path, name):
+        name = name or os.path.basename(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        versions = self.list_versions(name)
+        if versions and versions[0]["sha256"] == digest:
+            return versions[0]
+
+        chunk_hashes = []
+        written = 0
+        for chunk in split_chunks(data):
+            chunk_hash = hashlib.sha256(chunk).hexdigest()
+            chunk_hashes.append(chunk_hash)
+            chunk_path = self._chunk_path(chunk_hash)
+            if not os.path.exists(chunk_path):
+                os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                _write_atomic(chunk_path, zlib.compress(chunk))
+                written += 1
+
+        now = time.time()
+        manifest = {
+            "name": name,
+            "version": time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000000) % 1000000:06d}",
+            "created": now,
+            "size": len(data),
+            "sha256": digest,
+            "chunks": chunk_hashes,
+            "new_chunks": written,
+        }
+        manifest_dir = os.path.join(self.manifests_dir, name)
+        os.makedirs(manifest_dir, exist_ok=True)
+        _write_atomic(os.path.join(manifest_dir, manifest["version"] + ".json"),
+                      json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+        return manifest
+
+    # バックアップのある辞書ファイル名の一覧
+    def list_names(self):
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        return sorted(name for name in os.listdir(self.manifests_dir)
+                      if os.path.isdir(os.path.join(self.manifests_dir, name)))
+
+    # nameの世代の一覧（新しい順）
+    def list_versions(self, name):
+        manifest_dir = os.path.join(self.manifests_dir, name)
+        if not os.path.isdir(manifest_dir):
+            return []
+        versions = []
+        for fname in sorted(os.listdir(manifest_dir), reverse=True):
+            if not fname.endswith(".json"):
+                continue
+            with open(os.path.join(manifest_dir, fname), encoding="utf-8") as f:
+                versions.append(json.load(f))
+        return versions
+
+    # 指定した世代をdestに復元する。チャンクとファイル全体のハッシュを確かめてから書き込む
+    def restore(self, name, version, dest):
+        manifest_path = os.path.join(self.manifests_dir, name, version + ".json")
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise BackupError(f"バックアップの情報を読み込めません: {name} {version}") from e
+
+        parts = []
+        for chunk_hash in manifest["chunks"]:
+            try:
+                with open(self._chunk_path(chunk_hash), "rb") as f:
+                    chunk = zlib.decompress(f.read())
+            except (OSError, zlib.error) as e:
+                raise BackupError(f"バックアップのデータが見つからないか壊れています: {chunk_hash}") from e
+            if hashlib.sha256(chunk).hexdigest() != chunk_hash:
+                raise BackupError(f"バックアップのデータが壊れています: {chunk_hash}")
+            parts.append(chunk)
+        data = b"".join(parts)
+        if len(data) != manifest["size"] or hashlib.sha256(data).hexdigest() != manifest["sha256"]:
+            raise BackupError("復元したデータがバックアップ時と一致しません。")
+        _write_atomic(os.path.abspath(dest), data)
+        return manifest
+
+    def _chunk_path(self, chunk_hash):
+        return os.path.join(self.chunks_dir, chunk_hash[:2], chunk_hash)
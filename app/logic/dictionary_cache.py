@@ -0,0 +1,166 @@
+# 辞書ファイルのバイナリキャッシュ
+# txtを毎回解析し直さなくて済むよう、解析済みの内容を次の形式で保存しておき、mmapで開いて必要な行だけ読む。
+#   ヘッダ | 品詞の名前の表 | 行ごとの開始位置(u64 × 件数+1) | 品詞コード(u8 × 件数) | 文字列領域
+# 文字列領域には各行の「読み\t表記」をUTF-8で並べている。
+# 元のtxtのサイズ・更新時刻・SHA-256をヘッダに持ち、txtが変わっていたら使わない（txtが正本）。
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from logic.dictionary_file import parse_line
+from logic.entry_store import HINSHI_LIST
+
+MAGIC = b"DICC"
+VERSION = 1
+# magic, version, バイト順(0=little, 1=big), 件数, 元ファイルのサイズ, 元ファイルの更新時刻(ns), 元ファイルのSHA-256
+HEADER = struct.Struct("<4sHHQQQ32s")
+CACHE_SUFFIX = ".cache"
+BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+
+
+def cache_path_for(cache_dir, dictionary_path):
+    return os.path.join(cache_dir, os.path.basename(dictionary_path) + CACHE_SUFFIX)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+# txtを読んでキャッシュを作る
+def build_cache(source_path, cache_path, should_stop=None):
+    stat = os.stat(source_path)
+    digest = hashlib.sha256()
+    offsets = array("Q", [0])
+    codes = array("B")
+    heap = bytearray()
+    hinshi_names = list(HINSHI_LIST)
+    hinshi_codes = {name: code for code, name in enumerate(hinshi_names)}
+    with open(source_path, "rb") as f:
+        for raw in f:
+            digest.update(raw)
+            entry = parse_line(raw.decode("utf-8"))
+            if entry is None:
+                continue
+            yomi, hyouki, hinshi = entry
+            code = hinshi_codes.get(hinshi)
+            if code is None:
+                if len(hinshi_names) >= 256:
+                    return False
+                code = hinshi_codes[hinshi] = len(hinshi_names)
+                hinshi_names.append(hinshi)
+            heap += f"{yomi}\t{hyouki}".encode("utf-8")
+            offsets.append(len(heap))
+            codes.append(code)
+            if should_stop is not None and len(codes) % 10000 == 0 and should_stop():
+                return False
+
+    # 読んでいる間に書き換えられていたら作らない
+    if os.stat(source_path).st_mtime_ns != stat.st_mtime_ns:
+        return False
+
+    names = "\n".join(hinshi_names).encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, BYTE_ORDER, len(codes), stat.st_size, stat.st_mtime_ns, digest.digest())
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=os.path.dirname(os.path.abspath(cache_path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(struct.pack("<I", len(names)))
+            f.write(names)
+            # u64の表が8バイト境界から始まるように詰め物を入れる
+            f.write(b"\0" * (-f.tell() % 8))
+            f.write(offsets.tobytes())
+            f.write(codes.tobytes())
+            f.write(heap)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+# キャッシュが元のtxtと一致していれば開いて返す。使えなければNone
+def open_cache(source_path, cache_path):
+    try:
+        stat = os.stat(source_path)
+        with open(cache_path, "rb") as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) != HEADER.size:
+        return None
+    magic, version, byte_order, _, size, mtime_ns, digest = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or byte_order != BYTE_ORDER or size != stat.st_size:
+        return None
+    # 更新時刻だけが変わった場合は中身のハッシュで確かめる
+    if mtime_ns != stat.st_mtime_ns and _file_sha256(source_path) != digest:
+        return None
+    try:
+        return CachedDictionary(cache_path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+# mmapしたキャッシュを読み取り専用のエントリ列として見せる
+# EntryStoreと同じく行ごとのIDを持つが、変更できないので行番号がそのままIDになる
+class CachedDictionary:
+    def __init__(self, cache_path):
+        with open(cache_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, _, count, _, _, _ = HEADER.unpack_from(self._mmap, 0)
+        pos = HEADER.size
+        (names_len,) = struct.unpack_from("<I", self._mmap, pos)
+        pos += 4
+        self._hinshi_names = bytes(self._mmap[pos:pos + names_len]).decode("utf-8").split("\n")
+        pos += names_len
+        pos += -pos % 8
+        self._count = count
+        self._view = memoryview(self._mmap)
+        self._offsets = self._view[pos:pos + 8 * (count + 1)].cast("Q")
+        pos += 8 * (count + 1)
+        self._codes = self._view[pos:pos + count]
+        self._heap_start = pos + count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("CachedDictionary index out of range")
+        start = self._heap_start + self._offsets[index]
+        end = self._heap_start + self._offsets[index + 1]
+        yomi, hyouki = self._mmap[start:end].decode("utf-8").split("\t", 1)
+        return (yomi, hyouki, self._hinshi_names[self._codes[index]])
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def id_at(self, index):
+        return index
+
+    def position_of(self, entry_id):
+        return entry_id if 0 <= entry_id < self._count else -1
+
+    # mmapを閉じる（Windowsでは開いている間、キャッシュファイルを消したり置き換えたりできない）
+    # mmapの上のmemoryviewを先に手放さないと閉じられない。閉じたあとは読めない
+    def close(self):
+        if self._mmap.closed:
+            return
+        self._offsets.release()
+        self._codes.release()
+        self._view.release()
+        self._mmap.close()
@@ -0,0 +1,50 @@
+# 辞書txtファイル（読み\t表記\t品詞）の読み書き
+import os
+import tempfile
+
+IME_HEADER = "!Microsoft IME Dictionary Tool"
+
+
+# 1行をエントリに変換（ヘッダ行や不正な行はNone）
+def parse_line(line):
+    if line.startswith("!"):
+        return None
+    parts = line.strip().split('\t')
+    if len(parts) == 3:
+        return tuple(parts)
+    return None
+
+
+def iter_entries(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = parse_line(line)
+            if entry is not None:
+                yield entry
+
+
+def read_entries(path):
+    return list(iter_entries(path))
+
+
+# ファイル名にimeを含む辞書はMicrosoft IMEのヘッダを付ける
+def needs_ime_header(path):
+    return "ime" in os.path.basename(path)
+
+
+# 一時ファイルに書いてからリネームするので、途中で落ちても元のファイルは壊れない
+def write_entries_atomic(path, entries):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            if needs_ime_header(path):
+                f.write(IME_HEADER + "\n")
+            f.writelines(f"{yomi}\t{hyouki}\t{hinshi}\n" for yomi, hyouki, hinshi in entries)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
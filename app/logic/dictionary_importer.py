@@ -0,0 +1,190 @@
+# 各IME形式からのインポート
+# エクスポート（dictionary_manager）の形式ごとに、1行をエントリに戻す解析関数をImportFormatとしてプラグインの登録簿に登録しておく。
+# ファイルは文字コードと形式を先頭から推定したうえで1行ずつ流して解析するので、数十万件の辞書でもメモリに全部は載せない。
+# 複数ファイルはプロセスプールでファイルごとに並行して取り込む。
+import codecs
+import csv
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from logic.entry_store import HINSHI_LIST
+from logic.journal import replace_dictionary
+from logic.plugins import KIND_IMPORT, PluginMapping, load_plugin_files, plugin_files, plugins, register_plugin
+
+# 文字コード・形式の推定に使う先頭部分の大きさ
+SAMPLE_SIZE = 64 * 1024
+
+# 各IMEの品詞名をこのアプリの品詞に寄せる（ここに無く、HINSHI_LISTにも無いものはそのまま残す）
+HINSHI_ALIASES = {
+    "固有名詞": "名詞", "人名": "名詞", "姓": "名詞", "名": "名詞", "組織": "名詞", "地名": "名詞",
+    "固有人名": "名詞", "固有地名": "名詞", "固有組織": "名詞", "固有一般": "名詞",
+    "名詞サ変": "名詞", "さ変名詞": "名詞", "サ変名詞": "名詞", "名詞形動": "名詞", "形容動詞": "名詞",
+    "数": "名詞", "短縮よみ": "名詞", "アルファベット": "名詞", "サジェストのみ": "名詞",
+    "顔文字": "記号", "句読点": "記号",
+    "独立語": "感動詞",
+}
+
+
+class ImportFormat:
+    def __init__(self, name, label, parse_line, comment_prefixes=("!",), detect=None):
+        self.name = name
+        self.label = label
+        # 1行を受け取り、エントリのリストを返す（SKKは1行に複数の候補がある）
+        self.parse_line = parse_line
+        self.comment_prefixes = comment_prefixes
+        # (パス, 先頭の空でない行のリスト) を受け取り、この形式ならTrueを返す（プラグインで足した形式の推定用）
+        self.detect = detect
+
+
+# 形式は logic.plugins に登録し、初めて使うときに読み込む（{名前: ImportFormat} として使える）
+IMPORT_FORMATS = PluginMapping(KIND_IMPORT)
+
+
+def register_import_format(import_format, order=100):
+    register_plugin(KIND_IMPORT, import_format.name, import_format.label, import_format, order)
+    return import_format
+
+
+def map_hinshi(hinshi):
+    if hinshi in HINSHI_LIST:
+        return hinshi
+    if hinshi in HINSHI_ALIASES:
+        return HINSHI_ALIASES[hinshi]
+    # 「動詞ワ行五段」「カ行五段」「サ変」など活用の種類つきの名前
+    if "動詞" in hinshi or hinshi.endswith("段") or hinshi.endswith("変"):
+        return "動詞"
+    if hinshi.startswith("形容詞"):
+        return "形容詞"
+    return hinshi
+
+
+# BOMと先頭部分の中身から文字コードを推定する
+def detect_encoding(sample):
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+        return "utf-16"
+    # BOMなしのUTF-16は、ASCII部分の上位バイトが0になる
+    if sample and sample.count(b"\0") * 4 > len(sample):
+        return "utf-16-le" if sample[1::2].count(b"\0") > sample[0::2].count(b"\0") else "utf-16-be"
+    for encoding in ("utf-8", "cp932"):
+        try:
+            # 先頭部分の最後で文字が途切れていてもよいように、finalを付けずにデコードする
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "utf-8"
+
+
+def _kana_ratio(text):
+    if not text:
+        return 0.0
+    return sum(1 for ch in text if "ぁ" <= ch <= "ヿ" or ch == "ー") / len(text)
+
+
+# 拡張子と先頭の数行から形式を推定する
+def detect_format(path, text):
+    lines = [line for line in text.splitlines()[:200] if line.strip()]
+    # プラグインファイルで足した形式は、推定の関数があれば先に試す
+    for plugin in plugins(KIND_IMPORT):
+        if plugin.source is not None:
+            detect = getattr(plugin.load(), "detect", None)
+            if detect is not None and detect(path, lines):
+                return plugin.name
+    if path.lower().endswith(".csv") or (lines and lines[0].startswith("!!ATOK")):
+        return "atok"
+    body = [line for line in lines if not line.startswith(("!", ";"))]
+    if path.lower().endswith(".dic") or (body and sum(" /" in line and "\t" not in line for line in body) * 2 > len(body)):
+        return "skk"
+    # タブ区切りは、かなの多い列が1列目か2列目かでMozc（読みが先）とMS-IME（表記が先）を見分ける
+    rows = [line.split("\t") for line in body]
+    first = sum(_kana_ratio(row[0]) for row in rows if len(row) >= 2)
+    second = sum(_kana_ratio(row[1]) for row in rows if len(row) >= 2)
+    return "msime" if second > first else "google_mozc"
+
+
+class ImportResult:
+    def __init__(self, path, target, format_name, encoding):
+        self.path = path
+        self.target = target
+        self.format_name = format_name
+        self.encoding = encoding
+        self.count = 0
+        self.skipped = 0
+        # HINSHI_LISTに寄せられなかった品詞名と件数
+        self.unknown_hinshi = Counter()
+        self.error = None
+
+    def summary(self):
+        if self.error is not None:
+            return f"{os.path.basename(self.path)}: 失敗 {self.error}"
+        text = f"{os.path.basename(self.path)}: {self.count}件（{IMPORT_FORMATS[self.format_name].label}, {self.encoding}）"
+        if self.skipped:
+            text += f" 読み飛ばし {self.skipped}行"
+        if self.unknown_hinshi:
+            text += " 未知の品詞: " + ", ".join(f"{name}({count})" for name, count in self.unknown_hinshi.most_common(5))
+        return text
+
+
+# pathのエントリを1件ずつ返す。形式・文字コードを省略すると推定する
+# resultを渡すと、推定結果と件数などを書き込む
+def iter_import(path, format_name=None, encoding=None, result=None):
+    with open(path, "rb") as f:
+        sample = f.read(SAMPLE_SIZE)
+    encoding = encoding or detect_encoding(sample)
+    if format_name is None:
+        format_name = detect_format(path, codecs.getincrementaldecoder(encoding)(errors="replace").decode(sample))
+    if result is None:
+        result = ImportResult(path, None, format_name, encoding)
+    result.format_name = format_name
+    result.encoding = encoding
+    import_format = IMPORT_FORMATS[format_name]
+
+    with open(path, encoding=encoding) as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.startswith(import_format.comment_prefixes):
+                continue
+            entries = import_format.parse_line(line)
+            if not entries:
+                result.skipped += 1
+                continue
+            for yomi, hyouki, hinshi in entries:
+                mapped = map_hinshi(hinshi.strip())
+                if mapped not in HINSHI_LIST:
+                    result.unknown_hinshi[mapped] += 1
+                result.count += 1
+                yield yomi.strip(), hyouki.strip(), mapped
+
+
+# 1ファイルを取り込んでtargetに書き出す（プロセスプールからも呼ばれる）
+# 取り込み先を上書きする場合、その辞書のジャーナルと（cache_dirを渡したとき）キャッシュは捨てる
+def import_file(path, target, format_name=None, encoding=None, cache_dir=None):
+    result = ImportResult(path, target, format_name, encoding)
+    try:
+        replace_dictionary(target, iter_import(path, format_name, encoding, result), cache_dir)
+    except (OSError, UnicodeError, csv.Error) as e:
+        result.error = str(e)
+    return result
+
+
+# jobsの(元ファイル, 取り込み先)を並行して取り込み、終わった順にImportResultを返す
+# 1ファイルだけのときはプロセスを起こさずにその場で取り込む
+def iter_import_files(jobs, format_name=None, encoding=None, max_workers=None, cache_dir=None):
+    jobs = list(jobs)
+    if len(jobs) <= 1 or max_workers == 1:
+        for path, target in jobs:
+            yield import_file(path, target, format_name, encoding, cache_dir)
+        return
+    # 追加のプラグインで登録した形式も使えるよう、各プロセスでも同じプラグインファイルを読み込む
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=load_plugin_files, initargs=(plugin_files(),)) as executor:
+        futures = [executor.submit(import_file, path, target, format_name, encoding, cache_dir) for path, target in jobs]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # 途中でやめた場合は、まだ始まっていないファイルを取り消す
+            for future in futures:
+                future.cancel()
@@ -1,19 +1,133 @@
-from pathlib import Path
+# 各IME形式へのエクスポート
+# 形式ごとの書き方はExportFormatとしてプラグインの登録簿（logic.plugins）に登録しておき、エントリを1回なめるだけで
+# 選ばれた全形式のファイルをまとめて書き出す。
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from logic.instrumentation import span
+from logic.plugins import KIND_EXPORT, PluginMapping, register_plugin
+
+# この件数ごとに整形・エンコードしてまとめて書き込む
+BATCH_SIZE = 10000
+
+
+class ExportFormat:
+    def __init__(self, name, label, description, suffix, format_line, encoding="utf-8", newline="\n", header=None):
+        self.name = name
+        self.label = label
+        self.description = description
+        self.suffix = suffix
+        self.format_line = format_line
+        self.encoding = encoding
+        self.newline = newline
+        self.header = header
+
+    # 複数行をまとめて1つのバイト列にする（Shift_JISなどへの変換も一度に行う）
+    def encode_batch(self, entries):
+        format_line = self.format_line
+        newline = self.newline
+        text = "".join([format_line(yomi, hyouki, hinshi) + newline for yomi, hyouki, hinshi in entries])
+        return text.encode(self.encoding)
+
+
+# 形式は logic.plugins に登録し、初めて使うときに読み込む（{名前: ExportFormat} として使える）
+EXPORT_FORMATS = PluginMapping(KIND_EXPORT)
+
+
+def register_format(export_format, order=100):
+    register_plugin(KIND_EXPORT, export_format.name, export_format.label, export_format, order)
+    return export_format
+
+
+# 1形式分の書き込み先。一時ファイルに書いて、全部書けたらリネームする
+# skip_rowsの行番号の行は書き出さない
+class _FormatWriter:
+    def __init__(self, export_format, path, skip_rows=None):
+        self.export_format = export_format
+        self.path = path
+        self.skip_rows = skip_rows
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, self.tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+        self.file = os.fdopen(fd, "wb", buffering=1024 * 1024)
+        if export_format.header is not None:
+            self.file.write((export_format.header + export_format.newline).encode(export_format.encoding))
+
+    # startはentriesの先頭の行番号
+    def write_batch(self, entries, start=0):
+        if self.skip_rows:
+            skip_rows = self.skip_rows
+            entries = [entry for i, entry in enumerate(entries, start) if i not in skip_rows]
+        self.file.write(self.export_format.encode_batch(entries))
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
 
 class DictionaryManager:
-    def __init__(self, google_path, ime_path):
-        self.google_path = Path(google_path)
-        self.ime_path = Path(ime_path)
-        self.google_path.parent.mkdir(parents=True, exist_ok=True)
-        self.ime_path.parent.mkdir(parents=True, exist_ok=True)
-
-    def export_google(self, entries):
-        with self.google_path.open("w", encoding="utf-8") as f:
-            for yomi, hyouki, hinshi in entries:
-                f.write(f"{yomi}\t{hyouki}\t{hinshi}\n")
-
-    def export_ime(self, entries):
-        with self.ime_path.open("w", encoding="utf-8") as f:
-            f.write("!Microsoft IME Dictionary Tool\n")
-            for yomi, hyouki, hinshi in entries:
-                f.write(f"{yomi}\t{hyouki}\t{hinshi}\n")
\ No newline at end of file
+    def __init__(self, saved_dir):
+        self.saved_dir = saved_dir
+        os.makedirs(self.saved_dir, exist_ok=True)
+
+    def output_path(self, base_name, format_name):
+        return os.path.join(self.saved_dir, base_name + EXPORT_FORMATS[format_name].suffix)
+
+    # entriesを1回だけ読み、format_namesの全形式を書き出す。{形式名: 出力パス}を返す
+    # parallelなら形式ごとの整形・書き込みを別スレッドで並行して行う
+    # 途中でエラーが起きた場合は、どの形式の出力ファイルも書き換えない
+    # skip_rowsは {形式名: 書き出さない行番号の集合}（その形式で表せない行を除くときなど）
+    def export(self, entries, base_name, format_names=None, parallel=True, skip_rows=None):
+        if format_names is None:
+            format_names = list(EXPORT_FORMATS)
+        with span("export", formats=",".join(format_names), parallel=parallel):
+            return self._export(entries, base_name, format_names, parallel, skip_rows or {})
+
+    def _export(self, entries, base_name, format_names, parallel, skip_rows):
+        writers = []
+        try:
+            for name in format_names:
+                writers.append(_FormatWriter(EXPORT_FORMATS[name], self.output_path(base_name, name), skip_rows.get(name)))
+            if parallel and len(writers) > 1:
+                self._write_parallel(entries, writers)
+            else:
+                for start, batch in _batches(entries):
+                    for writer in writers:
+                        writer.write_batch(batch, start)
+        except BaseException:
+            for writer in writers:
+                writer.abort()
+            raise
+        for writer in writers:
+            writer.commit()
+        return {writer.export_format.name: writer.path for writer in writers}
+
+    # 次のバッチを読んでいる間に、前のバッチを各形式のスレッドが書き込む
+    def _write_parallel(self, entries, writers):
+        with ThreadPoolExecutor(max_workers=len(writers)) as executor:
+            pending = []
+            for start, batch in _batches(entries):
+                for future in pending:
+                    future.result()
+                pending = [executor.submit(writer.write_batch, batch, start) for writer in writers]
+            for future in pending:
+                future.result()
+
+
+# (先頭の行番号, BATCH_SIZE件ずつのリスト) を返す
+def _batches(entries):
+    batch = []
+    start = 0
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            yield start, batch
+            start += len(batch)
+            batch = []
+    if batch:
+        yield start, batch
@@ -0,0 +1,122 @@
+# 辞書フォルダの監視
+# OneDriveの同期やエクスプローラーでの操作など、アプリの外での変更を拾ってファイル一覧に反映する。
+# フォルダ全体はQFileSystemWatcherで見張り、開いている辞書だけは個別にも見張る（中身の書き換えはフォルダの通知に出ないため）。
+# 通知はまとめて来るので少し待ってから1回だけ走査し、前回の走査結果（サイズ・更新時刻）との差分だけを知らせる。
+# 監視を登録できない場所（ネットワークドライブなど）では、一定間隔の走査に切り替える。
+import os
+
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from logic.instrumentation import timed
+
+# 通知が落ち着くまで待つ時間
+DEBOUNCE_MSEC = 300
+# 監視できないときの走査間隔
+POLL_INTERVAL_MSEC = 5000
+
+
+# oldとnewで変わった範囲を返す (先頭の一致数, oldの変わった範囲の終わり, newの変わった範囲の終わり)
+# 同じなら (len(old), len(old), len(new))
+def changed_range(old, new):
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    old_end = len(old)
+    new_end = len(new)
+    while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+    return start, old_end, new_end
+
+
+class DictionaryWatcher(QObject):
+    # いずれもファイル名（フォルダ内の名前）のリスト
+    files_added = pyqtSignal(list)
+    files_removed = pyqtSignal(list)
+    files_changed = pyqtSignal(list)
+
+    def __init__(self, directory, suffix=".txt", parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.suffix = suffix
+        self.watched_file = None
+        self._snapshot = {}
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(DEBOUNCE_MSEC)
+        self._debounce.timeout.connect(self.rescan)
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._schedule_rescan)
+        self._watcher.fileChanged.connect(self._schedule_rescan)
+        self._poll = QTimer(self)
+        self._poll.setInterval(POLL_INTERVAL_MSEC)
+        self._poll.timeout.connect(self.rescan)
+        if not self._watcher.addPath(directory):
+            self._poll.start()
+
+    # 開いている辞書を個別に見張る（Noneで解除）
+    def watch_file(self, path):
+        if self.watched_file is not None and self.watched_file in self._watcher.files():
+            self._watcher.removePath(self.watched_file)
+        self.watched_file = path
+        if path is not None and os.path.exists(path):
+            self._watcher.addPath(path)
+
+    # アプリ自身が書き込んだファイルを、変更として知らせないようにする
+    def acknowledge(self, path):
+        name = os.path.basename(path)
+        stat = self._stat(path)
+        if stat is None:
+            self._snapshot.pop(name, None)
+        else:
+            self._snapshot[name] = stat
+
+    def _schedule_rescan(self, _path=None):
+        self._debounce.start()
+
+    # フォルダを走査して、前回からの差分を知らせる
+    @timed("watcher.rescan")
+    def rescan(self):
+        self._debounce.stop()
+        current = {}
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(self.suffix):
+                        continue
+                    try:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            current[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            return
+
+        previous = self._snapshot
+        self._snapshot = current
+        added = sorted(name for name in current if name not in previous)
+        removed = sorted(name for name in previous if name not in current)
+        changed = sorted(name for name in current if name in previous and previous[name] != current[name])
+
+        # 置き換え（一時ファイル→rename）で書き込まれると個別の監視が外れるので付け直す
+        if self.watched_file is not None and os.path.exists(self.watched_file) \
+                and self.watched_file not in self._watcher.files():
+            self._watcher.addPath(self.watched_file)
+
+        if removed:
+            self.files_removed.emit(removed)
+        if added:
+            self.files_added.emit(added)
+        if changed:
+            self.files_changed.emit(changed)
+
+    def _stat(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
@@ -0,0 +1,207 @@
+# 編集操作の取り消し（Undo）とやり直し（Redo）
+# 1件の挿入・削除・更新をコマンドとして記録し、逆の操作で取り消せるようにする。
+# 複数行の削除・置換・貼り付けなどはトランザクションで1つにまとめ、1回のUndoで全部戻す。
+# 実際の変更はtarget（画面側）の insert_row / remove_row / update_row に任せる。
+# 履歴は文字数の合計と件数で上限を決め、古いものから捨てる。
+from collections import deque
+from contextlib import contextmanager
+
+# 履歴の上限（エントリの文字数の合計と、Undoできる回数）
+MAX_UNDO_CHARS = 4 * 1024 * 1024
+MAX_UNDO_STEPS = 1000
+
+# 1コマンドあたりのおおよその固定コスト（文字数換算）
+COMMAND_OVERHEAD = 32
+
+
+def _entry_size(entry):
+    return sum(len(field) for field in entry)
+
+
+class InsertCommand:
+    label = "追加"
+
+    def __init__(self, row, entry):
+        self.row = row
+        self.entry = entry
+        self.entry_id = None
+
+    def redo(self, target):
+        # やり直しのときは最初と同じIDで入れ直す
+        self.entry_id = target.insert_row(self.row, self.entry, self.entry_id)
+
+    def undo(self, target):
+        target.remove_row(self.row)
+
+    def size(self):
+        return _entry_size(self.entry) + COMMAND_OVERHEAD
+
+
+class RemoveCommand:
+    label = "削除"
+
+    def __init__(self, row):
+        self.row = row
+        self.entry = None
+        self.entry_id = None
+
+    def redo(self, target):
+        self.entry, self.entry_id = target.remove_row(self.row)
+
+    def undo(self, target):
+        target.insert_row(self.row, self.entry, self.entry_id)
+
+    def size(self):
+        return _entry_size(self.entry or ()) + COMMAND_OVERHEAD
+
+
+class UpdateCommand:
+    label = "変更"
+
+    def __init__(self, row, entry):
+        self.row = row
+        self.entry = entry
+        self.old_entry = None
+
+    def redo(self, target):
+        self.old_entry = target.update_row(self.row, self.entry)
+
+    def undo(self, target):
+        target.update_row(self.row, self.old_entry)
+
+    def size(self):
+        return _entry_size(self.entry) + _entry_size(self.old_entry or ()) + COMMAND_OVERHEAD
+
+
+# 複数のコマンドをまとめたもの。取り消しは逆順に行う
+class Transaction:
+    def __init__(self, label):
+        self.label = label
+        self.commands = []
+
+    def redo(self, target):
+        for command in self.commands:
+            command.redo(target)
+
+    def undo(self, target):
+        for command in reversed(self.commands):
+            command.undo(target)
+
+    def size(self):
+        return sum(command.size() for command in self.commands) + COMMAND_OVERHEAD
+
+
+# targetには insert_row(row, entry, entry_id) -> entry_id, remove_row(row) -> (entry, entry_id),
+# update_row(row, entry) -> 前のentry, begin_batch(), end_batch(), after_edit() が必要
+class UndoStack:
+    def __init__(self, target, max_chars=MAX_UNDO_CHARS, max_steps=MAX_UNDO_STEPS, on_change=None):
+        self.target = target
+        self.max_chars = max_chars
+        self.max_steps = max_steps
+        self.on_change = on_change
+        self._undo = deque()
+        self._redo = []
+        self._chars = 0
+        self._transaction = None
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo_label(self):
+        return self._undo[-1].label if self._undo else None
+
+    def redo_label(self):
+        return self._redo[-1].label if self._redo else None
+
+    # コマンドを実行して履歴に積む（トランザクション中ならその中に入れる）
+    def execute(self, command):
+        command.redo(self.target)
+        if self._transaction is not None:
+            self._transaction.commands.append(command)
+            return
+        self._push(command)
+        self.target.after_edit()
+
+    # with stack.transaction("置換"): の中で実行したコマンドを1回のUndoで戻せるようにまとめる
+    # 途中で例外が起きたら、それまでに実行した分を戻してから例外を投げ直す
+    @contextmanager
+    def transaction(self, label):
+        # 入れ子になった場合は外側のトランザクションにまとめる
+        if self._transaction is not None:
+            yield self._transaction
+            return
+
+        self._transaction = Transaction(label)
+        self.target.begin_batch()
+        try:
+            yield self._transaction
+        except BaseException:
+            self._transaction.undo(self.target)
+            raise
+        else:
+            if self._transaction.commands:
+                self._push(self._transaction)
+        finally:
+            transaction = self._transaction
+            self._transaction = None
+            self.target.end_batch()
+            if transaction.commands:
+                self.target.after_edit()
+
+    def undo(self):
+        if not self._undo or self._transaction is not None:
+            return None
+        command = self._undo.pop()
+        self._chars -= command.size()
+        self._run(command.undo, command)
+        self._redo.append(command)
+        self._changed()
+        return command.label
+
+    def redo(self):
+        if not self._redo or self._transaction is not None:
+            return None
+        command = self._redo.pop()
+        self._run(command.redo, command)
+        self._undo.append(command)
+        self._chars += command.size()
+        self._trim()
+        self._changed()
+        return command.label
+
+    # ファイルを切り替えたときなど、行番号が意味を持たなくなったら履歴を捨てる
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._chars = 0
+        self._changed()
+
+    def _run(self, action, command):
+        batch = isinstance(command, Transaction)
+        if batch:
+            self.target.begin_batch()
+        try:
+            action(self.target)
+        finally:
+            if batch:
+                self.target.end_batch()
+        self.target.after_edit()
+
+    def _push(self, command):
+        self._undo.append(command)
+        self._chars += command.size()
+        self._redo.clear()
+        self._trim()
+        self._changed()
+
+    # 直前の1回分は、上限を超える大きな操作でも取り消せるように残す
+    def _trim(self):
+        while len(self._undo) > 1 and (len(self._undo) > self.max_steps or self._chars > self.max_chars):
+            self._chars -= self._undo.popleft().size()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
@@ -0,0 +1,189 @@
+# 辞書エントリの省メモリな入れ物
+# (読み, 表記, 品詞)のタプルをリストで持つ代わりに、読み・表記はUTF-8でひとつのbytearrayに詰め、
+# 各行はその中の位置と長さだけを配列で持つ。品詞は種類が少ないので1バイトの番号で持つ。
+# 各行には行番号とは別に、削除などでずれないID（追加順の連番）を振っている。
+from array import array
+from bisect import bisect_left
+
+HINSHI_LIST = ["名詞", "動詞", "形容詞", "副詞", "連体詞", "接続詞", "感動詞", "記号", "カスタム名詞"]
+
+
+class EntryStore:
+    def __init__(self, entries=None):
+        self._blob = bytearray()
+        self._starts = array("Q")
+        self._yomi_lens = array("I")
+        self._hyouki_lens = array("I")
+        self._hinshi = array("B")
+        self._ids = array("Q")
+        self._next_id = 0
+        # IDが行の順に昇順で並んでいるか。並んでいなければ、IDから行番号への辞書を作って引く
+        self._ids_sorted = True
+        self._rows_by_id = None
+        self._hinshi_names = list(HINSHI_LIST)
+        self._hinshi_codes = {name: code for code, name in enumerate(self._hinshi_names)}
+        # 削除・更新で使われなくなったblob内のバイト数
+        self._garbage = 0
+        if entries is not None:
+            self.extend(entries)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(len(self)))]
+        return self._get(self._check_index(index))
+
+    def __setitem__(self, index, entry):
+        index = self._check_index(index)
+        self._garbage += self._yomi_lens[index] + self._hyouki_lens[index]
+        start, yomi_len, hyouki_len, code = self._pack(entry)
+        self._starts[index] = start
+        self._yomi_lens[index] = yomi_len
+        self._hyouki_lens[index] = hyouki_len
+        self._hinshi[index] = code
+        self._maybe_compact()
+
+    def __delitem__(self, index):
+        index = self._check_index(index)
+        self._garbage += self._yomi_lens[index] + self._hyouki_lens[index]
+        del self._starts[index]
+        del self._yomi_lens[index]
+        del self._hyouki_lens[index]
+        del self._hinshi[index]
+        del self._ids[index]
+        self._rows_by_id = None
+        self._maybe_compact()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._get(i)
+
+    def append(self, entry):
+        start, yomi_len, hyouki_len, code = self._pack(entry)
+        self._starts.append(start)
+        self._yomi_lens.append(yomi_len)
+        self._hyouki_lens.append(hyouki_len)
+        self._hinshi.append(code)
+        entry_id = self._new_id()
+        self._ids.append(entry_id)
+        if self._rows_by_id is not None:
+            self._rows_by_id[entry_id] = len(self._ids) - 1
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    # entry_idを指定すると、そのIDのまま戻せる（削除の取り消しなど）
+    def insert(self, index, entry, entry_id=None):
+        index = max(0, min(len(self), index if index >= 0 else len(self) + index))
+        start, yomi_len, hyouki_len, code = self._pack(entry)
+        self._starts.insert(index, start)
+        self._yomi_lens.insert(index, yomi_len)
+        self._hyouki_lens.insert(index, hyouki_len)
+        self._hinshi.insert(index, code)
+        entry_id = self._new_id() if entry_id is None else entry_id
+        ids = self._ids
+        if self._ids_sorted and not ((index == 0 or ids[index - 1] < entry_id) and (index == len(ids) or entry_id < ids[index])):
+            self._ids_sorted = False
+        ids.insert(index, entry_id)
+        self._rows_by_id = None
+
+    def id_at(self, index):
+        return self._ids[self._check_index(index)]
+
+    # IDから現在の行番号を探す（見つからなければ-1）
+    # 追加は末尾、削除の取り消しは元の位置なので、IDは通常昇順に並んでいて二分探索で引ける
+    # 途中に新しいIDを挿入して並びが崩れたら、行が動くたびに辞書を作り直して引く（振り直せば二分探索に戻る）
+    def position_of(self, entry_id):
+        if self._ids_sorted:
+            pos = bisect_left(self._ids, entry_id)
+            return pos if pos < len(self._ids) and self._ids[pos] == entry_id else -1
+        if self._rows_by_id is None:
+            self._rows_by_id = {row_id: row for row, row_id in enumerate(self._ids)}
+        return self._rows_by_id.get(entry_id, -1)
+
+    # IDを今の行順に0から振り直す（途中への挿入で新しいIDが混ざり、昇順でなくなった場合に使う）
+    # 振り直す前のIDを覚えているもの（検索インデックスなど）は作り直すこと
+    def renumber(self):
+        self._ids = array("Q", range(len(self)))
+        self._next_id = len(self)
+        self._ids_sorted = True
+        self._rows_by_id = None
+
+    def clear(self):
+        self._blob = bytearray()
+        self._starts = array("Q")
+        self._yomi_lens = array("I")
+        self._hyouki_lens = array("I")
+        self._hinshi = array("B")
+        self._ids = array("Q")
+        self._next_id = 0
+        self._ids_sorted = True
+        self._rows_by_id = None
+        self._garbage = 0
+
+    # 使われなくなった部分を取り除いてblobを詰め直す
+    def compact(self):
+        old = self._blob
+        blob = bytearray()
+        for i in range(len(self)):
+            start = self._starts[i]
+            self._starts[i] = len(blob)
+            blob += old[start:start + self._yomi_lens[i] + self._hyouki_lens[i]]
+        self._blob = blob
+        self._garbage = 0
+
+    # 実データの使用バイト数（ベンチマーク用）
+    def nbytes(self):
+        arrays = (self._starts, self._yomi_lens, self._hyouki_lens, self._hinshi, self._ids)
+        return len(self._blob) + sum(a.itemsize * len(a) for a in arrays)
+
+    def _get(self, index):
+        start = self._starts[index]
+        middle = start + self._yomi_lens[index]
+        end = middle + self._hyouki_lens[index]
+        blob = self._blob
+        return (
+            blob[start:middle].decode("utf-8"),
+            blob[middle:end].decode("utf-8"),
+            self._hinshi_names[self._hinshi[index]],
+        )
+
+    def _check_index(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("EntryStore index out of range")
+        return index
+
+    # 読み・表記をblobの末尾に追加し、位置・長さ・品詞コードを返す
+    def _pack(self, entry):
+        yomi, hyouki, hinshi = entry
+        yomi_bytes = yomi.encode("utf-8")
+        hyouki_bytes = hyouki.encode("utf-8")
+        start = len(self._blob)
+        self._blob += yomi_bytes
+        self._blob += hyouki_bytes
+        return start, len(yomi_bytes), len(hyouki_bytes), self._hinshi_code(hinshi)
+
+    def _new_id(self):
+        entry_id = self._next_id
+        self._next_id += 1
+        return entry_id
+
+    def _hinshi_code(self, hinshi):
+        code = self._hinshi_codes.get(hinshi)
+        if code is None:
+            if len(self._hinshi_names) >= 256:
+                raise ValueError(f"品詞の種類が多すぎます: {hinshi}")
+            code = len(self._hinshi_names)
+            self._hinshi_names.append(hinshi)
+            self._hinshi_codes[hinshi] = code
+        return code
+
+    def _maybe_compact(self):
+        if self._garbage > 4096 and self._garbage * 2 > len(self._blob):
+            self.compact()
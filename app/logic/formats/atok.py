@@ -0,0 +1,26 @@
+# ATOKのCSV形式「表記,読み,品詞」（Shift_JIS）
+import csv
+
+from logic.dictionary_importer import ImportFormat
+from logic.dictionary_manager import ExportFormat
+
+
+# CSVの項目に「,」や「"」が含まれていれば引用符で囲む
+def csv_field(value):
+    if "," in value or '"' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def parse_atok(line):
+    parts = next(csv.reader([line]))
+    if len(parts) < 3 or not parts[0] or not parts[1]:
+        return []
+    return [(parts[1], parts[0], parts[2])]
+
+
+EXPORT = ExportFormat(
+    "atok", "ATOK", "ATOK用CSVファイル（Shift_JIS）", "_atok.csv",
+    lambda yomi, hyouki, hinshi: f"{csv_field(hyouki)},{csv_field(yomi)},{hinshi}", encoding="shift_jis",
+)
+IMPORT = ImportFormat("atok", "ATOK", parse_atok)
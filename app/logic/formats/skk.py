@@ -0,0 +1,52 @@
+# SKKの辞書形式「よみ /候補1/候補2;注釈/」
+import os
+import re
+
+from logic.dictionary_importer import ImportFormat
+from logic.dictionary_manager import ExportFormat
+
+# 「/」「;」などを含む候補を書く (concat "...") の形（8進数のエスケープ）
+_CONCAT = re.compile(r'^\(concat "((?:[^"\\]|\\.)*)"\)$')
+_ESCAPE = re.compile(r"\\([0-7]{3}|.)")
+
+
+# 候補では「/」「;」が区切り、「(」で始まるとLispの式になるので、その場合は (concat "...") の形で書く
+def skk_candidate(hyouki):
+    if "/" not in hyouki and ";" not in hyouki and not hyouki.startswith("("):
+        return hyouki
+    escaped = hyouki.replace("\\", "\\\\").replace('"', '\\"').replace("/", "\\057").replace(";", "\\073")
+    return f'(concat "{escaped}")'
+
+
+# 文字列1つだけのconcatでなければNone
+def unescape_candidate(candidate):
+    match = _CONCAT.match(candidate)
+    if match is None:
+        return None
+    return _ESCAPE.sub(lambda m: chr(int(m.group(1), 8)) if len(m.group(1)) == 3 else m.group(1), match.group(1))
+
+
+# 1行を候補ごとのエントリにする
+# 送りあり（読みの末尾が英字）とLispの式の候補は、このアプリの形式では表せないので読み飛ばす
+# ただし (concat "...") は文字列に戻せるので取り込む
+def parse_skk(line):
+    yomi, sep, rest = line.partition(" /")
+    if not sep or not yomi:
+        return []
+    if len(yomi) > 1 and "a" <= yomi[-1] <= "z" and not yomi[-2].isascii():
+        return []
+    entries = []
+    for candidate in rest.split("/"):
+        hyouki = candidate.split(";", 1)[0]
+        if hyouki.startswith("("):
+            hyouki = unescape_candidate(hyouki)
+        if hyouki:
+            entries.append((yomi, hyouki, "名詞"))
+    return entries
+
+
+EXPORT = ExportFormat(
+    "skk", "SKK", "SKK用テキストファイル", "_skk.dic",
+    lambda yomi, hyouki, hinshi: f"{yomi} /{skk_candidate(hyouki)}/", newline=os.linesep,
+)
+IMPORT = ImportFormat("skk", "SKK", parse_skk, comment_prefixes=(";",))
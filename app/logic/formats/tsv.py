@@ -0,0 +1,28 @@
+# タブ区切りの形式（Google日本語入力 / Mozc と Microsoft IME）
+# Mozcは「読み\t表記\t品詞」、MS-IMEは「表記\t読み\t品詞」（Shift_JIS）
+import os
+
+from logic.dictionary_importer import ImportFormat
+from logic.dictionary_manager import ExportFormat
+
+
+def parse_tsv(line, yomi_first=True):
+    parts = line.split("\t")
+    # Mozcは4列目にコメントがあることがある
+    if len(parts) < 3 or not parts[0] or not parts[1]:
+        return []
+    if yomi_first:
+        return [(parts[0], parts[1], parts[2])]
+    return [(parts[1], parts[0], parts[2])]
+
+
+MOZC_EXPORT = ExportFormat(
+    "google_mozc", "Google日本語入力 / Mozc", "Google日本語入力/Mozc用TXTファイル", "_google_mozc.txt",
+    lambda yomi, hyouki, hinshi: f"{yomi}\t{hyouki}\t{hinshi}", newline=os.linesep,
+)
+MSIME_EXPORT = ExportFormat(
+    "msime", "Microsoft IME", "Microsoft IME用TXTファイル（Shift_JIS）", "_msime.txt",
+    lambda yomi, hyouki, hinshi: f"{hyouki}\t{yomi}\t{hinshi}", encoding="shift_jis",
+)
+MOZC_IMPORT = ImportFormat("google_mozc", "Google日本語入力 / Mozc", parse_tsv)
+MSIME_IMPORT = ImportFormat("msime", "Microsoft IME", lambda line: parse_tsv(line, yomi_first=False))
@@ -0,0 +1,199 @@
+# 処理時間などの計測
+# 「固まった」と言われたときに原因を追えるよう、読み込み・表示・保存・エクスポートなどの所要時間を記録する。
+#   with span("export", formats=3): ...    所要時間をヒストグラム「export」に記録
+#   @timed("save")                          関数全体を計測
+#   count("cache.hit") / observe("ui.stall", ms)
+# enable()するまでは何も記録せず、spanは共通の何もしないオブジェクトを返すだけなので、ほぼ負荷はかからない。
+# log_pathを指定すると、spanの1件ごとにJSON Linesで書き出す（サイズで世代交代）。
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# ヒストグラムの区切り（ミリ秒）
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+_enabled = False
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_logger = None
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.buckets[bisect_left(BUCKETS_MS, value)] += 1
+
+    # 区切りの上限で近似したパーセンタイル
+    def percentile(self, ratio):
+        if not self.count:
+            return None
+        target = self.count * ratio
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total,
+            "mean_ms": self.total / self.count if self.count else None,
+            "min_ms": self.min,
+            "max_ms": self.max,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+        }
+
+
+def enable(log_path=None, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+    global _enabled
+    set_log_path(log_path, max_bytes, backup_count)
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    set_log_path(None)
+
+
+def is_enabled():
+    return _enabled
+
+
+def log_path():
+    return _logger.handlers[0].baseFilename if _logger is not None else None
+
+
+# Noneでファイルへの書き出しをやめる
+def set_log_path(path, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+    global _logger
+    if _logger is not None:
+        for handler in list(_logger.handlers):
+            _logger.removeHandler(handler)
+            handler.close()
+        _logger = None
+    if path is None:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger("dictionary_app.metrics")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+    _logger = logger
+
+
+def count(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def observe(name, value_ms, **attrs):
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(value_ms)
+    if _logger is not None:
+        record = {"ts": time.time(), "name": name, "ms": round(value_ms, 3), "thread": threading.current_thread().name}
+        record.update(attrs)
+        _logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "start")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        if exc_type is not None:
+            count(self.name + ".error")
+            self.attrs["error"] = exc_type.__name__
+        observe(self.name, elapsed_ms, **self.attrs)
+        return False
+
+    # 処理の途中で分かった情報（件数など）を記録に足す
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **attrs):
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, attrs)
+
+
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 画面表示用に、今までの記録の写しを返す
+def snapshot():
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {name: histogram.to_dict() for name, histogram in _histograms.items()},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
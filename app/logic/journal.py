@@ -0,0 +1,174 @@
+# 辞書ファイルの追記型ジャーナル
+# 追加・削除・更新のたびに辞書全体を書き直さず、操作だけを「xxx.txt.journal」に追記する。
+# 読み込み時はベースのtxtにジャーナルを再生し、ある程度溜まったらtxtにまとめて書き戻す（コンパクション）。
+# 操作は行番号で記録するので、先頭行に作成時のtxtのサイズと更新時刻を書いておき、
+# txtが別の内容に置き換わっていたら（書き戻しの途中で落ちた場合も含む）再生せずに捨てる。
+import logging
+import os
+
+from logic.dictionary_cache import cache_path_for
+from logic.dictionary_file import read_entries, write_entries_atomic
+from logic.instrumentation import timed
+
+JOURNAL_SUFFIX = ".journal"
+
+OP_ADD = "+"
+OP_DELETE = "-"
+OP_UPDATE = "="
+OP_INSERT = "^"
+HEADER_PREFIX = "!base"
+
+logger = logging.getLogger("dictionary_app.journal")
+
+
+def journal_path_for(dictionary_path):
+    return dictionary_path + JOURNAL_SUFFIX
+
+
+# ジャーナルの前提になるtxtの状態（サイズ, 更新時刻）
+def base_fingerprint(dictionary_path):
+    try:
+        stat = os.stat(dictionary_path)
+    except OSError:
+        return "-", "-"
+    return str(stat.st_size), str(stat.st_mtime_ns)
+
+
+# まだtxtに書き戻していない編集も含めて辞書を読む
+def read_entries_with_journal(dictionary_path):
+    entries = read_entries(dictionary_path)
+    DictionaryJournal(dictionary_path).replay(entries)
+    return entries
+
+
+# 辞書txtを丸ごと新しい内容に置き換える（取り込み・マージの上書きなど）
+# 行番号で記録した古いジャーナルは新しい内容には当てはまらないので消す。cache_dirを渡すとキャッシュも消す
+def replace_dictionary(dictionary_path, entries, cache_dir=None):
+    write_entries_atomic(dictionary_path, entries)
+    DictionaryJournal(dictionary_path).discard()
+    if cache_dir is not None:
+        try:
+            os.remove(cache_path_for(cache_dir, dictionary_path))
+        except OSError:
+            pass
+
+
+class DictionaryJournal:
+    # このサイズを超えたらアイドルを待たずにコンパクションする
+    COMPACT_THRESHOLD = 256 * 1024
+
+    def __init__(self, dictionary_path):
+        self.dictionary_path = dictionary_path
+        self.path = journal_path_for(dictionary_path)
+        self._file = None
+        self._batch_depth = 0
+        # 前提のtxtと合わないジャーナルを捨てたらTrue（画面で知らせる用）
+        self.discarded_stale = False
+
+    # 操作の記録
+    def record_add(self, entry):
+        self._write(OP_ADD, *entry)
+
+    def record_delete(self, row):
+        self._write(OP_DELETE, str(row))
+
+    def record_update(self, row, entry):
+        self._write(OP_UPDATE, str(row), *entry)
+
+    # 途中の行への挿入（削除の取り消しなど）
+    def record_insert(self, row, entry):
+        self._write(OP_INSERT, str(row), *entry)
+
+    # まとめて記録する間はflushを最後の1回にする
+    def begin_batch(self):
+        self._batch_depth += 1
+
+    def end_batch(self):
+        self._batch_depth -= 1
+        if self._batch_depth == 0 and self._file is not None:
+            self._file.flush()
+
+    def _write(self, *fields):
+        if self._file is None:
+            new = not self.has_pending()
+            self._file = open(self.path, "a", encoding="utf-8")
+            if new:
+                self._file.write("\t".join((HEADER_PREFIX,) + base_fingerprint(self.dictionary_path)) + "\n")
+        self._file.write("\t".join(fields) + "\n")
+        # アプリが落ちても残るようにOSへ渡しておく（fsyncはコンパクション時のみ）
+        if not self._batch_depth:
+            self._file.flush()
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def has_pending(self):
+        return self.size() > 0
+
+    def should_compact(self):
+        return self.size() >= self.COMPACT_THRESHOLD
+
+    # 作成時のtxtから置き換わっていればTrue（先頭行が無い以前のジャーナルは、確かめようがないので再生する）
+    def is_stale(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                fields = f.readline().rstrip("\n").split("\t")
+        except OSError:
+            return False
+        return fields[0] == HEADER_PREFIX and tuple(fields[1:]) != base_fingerprint(self.dictionary_path)
+
+    # ジャーナルの操作をentriesに適用し、適用した件数を返す
+    def replay(self, entries):
+        if not os.path.exists(self.path):
+            return 0
+        if self.is_stale():
+            logger.warning("%s: 辞書ファイルが置き換わっているため、ジャーナルを再生せずに破棄しました", self.path)
+            self.discard()
+            self.discarded_stale = True
+            return 0
+        count = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                # 書き込み途中で落ちた最後の行は改行が無いので捨てる
+                if not line.endswith("\n"):
+                    break
+                fields = line.rstrip("\n").split("\t")
+                op = fields[0]
+                if op == HEADER_PREFIX:
+                    continue
+                try:
+                    if op == OP_ADD and len(fields) == 4:
+                        entries.append(tuple(fields[1:]))
+                    elif op == OP_DELETE and len(fields) == 2:
+                        del entries[int(fields[1])]
+                    elif op == OP_UPDATE and len(fields) == 5:
+                        entries[int(fields[1])] = tuple(fields[2:])
+                    elif op == OP_INSERT and len(fields) == 5:
+                        entries.insert(int(fields[1]), tuple(fields[2:]))
+                    else:
+                        continue
+                except (ValueError, IndexError):
+                    continue
+                count += 1
+        return count
+
+    # ベースのtxtにまとめて書き戻し、ジャーナルを空にする
+    @timed("save.compact")
+    def compact(self, entries):
+        self.close()
+        write_entries_atomic(self.dictionary_path, entries)
+        self.discard()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # ジャーナルを削除（辞書ファイル削除時など）
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
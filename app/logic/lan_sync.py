@@ -0,0 +1,302 @@
+# LAN内での辞書の同期（asyncioの小さなHTTPサーバーとクライアント）
+# サーバーは読み取り専用で、相手が持っていない変更（logic.sync_log）だけを送る。書き込むのは取り込む側だけ。
+#   GET /sync/v1/dictionaries                    -> {"replica": 端末ID, "dictionaries": {辞書名: バージョンベクトル}}
+#   GET /sync/v1/changes/<辞書名>?since=<ベクトル> -> 変更履歴の行（chunkedで少しずつ送る）
+# 取り込む側は相手のベクトルと自分のベクトルを比べ、進んでいる辞書の変更だけを受け取る。
+# お互いに取り込み合えば両方が同じ内容になる。同じPCで2つ起動しても試せる（127.0.0.1とポートを分ける）。
+# 辞書の中身を誰にでも配らないよう、リクエストには公開する側の合言葉（X-Sync-Token ヘッダ）が要る。
+# 待ち受けは既定でこのPCの中（127.0.0.1）だけにし、LANに出すのは選んだときだけにする。
+import asyncio
+import hmac
+import json
+import os
+import secrets
+import tempfile
+from urllib.parse import quote, unquote, urlsplit, parse_qs
+
+from logic.instrumentation import count, span
+from logic.sync_log import SyncError, format_vector, is_behind, is_dictionary_name, parse_vector
+
+DEFAULT_PORT = 8765
+API_PREFIX = "/sync/v1"
+LOCAL_HOST = "127.0.0.1"
+LAN_HOST = "0.0.0.0"
+TOKEN_HEADER = "x-sync-token"
+TOKEN_FILE = "pairing_token"
+CONNECT_TIMEOUT = 10
+# 相手からの応答を待つ時間（大きな辞書でも1回の読み取りごとの待ち時間なので短めでよい）
+READ_TIMEOUT = 60
+
+
+# 公開する側の合言葉（初回に作ってsyncフォルダに保存しておく。相手に伝えて入れてもらう）
+def load_pairing_token(sync_dir):
+    path = os.path.join(sync_dir, TOKEN_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            token = f.read().strip()
+        if token:
+            return token
+    os.makedirs(sync_dir, exist_ok=True)
+    token = secrets.token_hex(5)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(token + "\n")
+    return token
+
+
+def is_loopback(host):
+    return host in ("localhost", "::1") or host.startswith("127.")
+
+
+class SyncServer:
+    def __init__(self, sync_folder, token, host=LOCAL_HOST, port=DEFAULT_PORT):
+        if not token:
+            raise ValueError("合言葉が空です")
+        self.sync_folder = sync_folder
+        self.token = token
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port=0なら空いているポートが割り当てられる
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+            # 合言葉のヘッダだけを見て、ほかは読み捨てる
+            token = ""
+            while True:
+                line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                if key.strip().lower() == TOKEN_HEADER:
+                    token = value.strip()
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3 or parts[0] != "GET":
+                await self._send_error(writer, 405, "Method Not Allowed")
+                return
+            if not hmac.compare_digest(token.encode("latin-1"), self.token.encode("latin-1")):
+                count("sync.unauthorized")
+                await self._send_error(writer, 401, "Unauthorized")
+                return
+            await self._route(writer, urlsplit(parts[1]))
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except (OSError, UnicodeError):
+            # 辞書や変更履歴を読めなかった（送り始めていたら、終わりのchunkが無いので相手は失敗として扱う）
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, writer, url):
+        loop = asyncio.get_running_loop()
+        if url.path == API_PREFIX + "/dictionaries":
+            vectors = await loop.run_in_executor(None, self.sync_folder.vectors)
+            body = {"replica": self.sync_folder.replica, "dictionaries": {name: format_vector(v) for name, v in vectors.items()}}
+            await self._send_json(writer, body)
+            return
+        if url.path.startswith(API_PREFIX + "/changes/"):
+            name = unquote(url.path[len(API_PREFIX + "/changes/"):])
+            if not is_dictionary_name(name) or name not in self.sync_folder.dictionary_names():
+                await self._send_error(writer, 404, "Not Found")
+                return
+            try:
+                since = parse_vector(parse_qs(url.query).get("since", [""])[0])
+            except SyncError:
+                await self._send_error(writer, 400, "Bad Request")
+                return
+            await self._send_changes(writer, name, since)
+            return
+        await self._send_error(writer, 404, "Not Found")
+
+    # 変更履歴を少しずつ読んで、読んだ分ずつchunkedで送る（送り終わるのを待ってから次を読む）
+    async def _send_changes(self, writer, name, since):
+        loop = asyncio.get_running_loop()
+        log = await loop.run_in_executor(None, self.sync_folder.refresh, name)
+        batches = log.iter_since(since)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/tab-separated-values; charset=utf-8\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        sent = 0
+        with span("sync.serve", dictionary=name) as s:
+            try:
+                while True:
+                    lines = await loop.run_in_executor(None, next, batches, None)
+                    if lines is None:
+                        break
+                    data = "".join(lines).encode("utf-8")
+                    writer.write(b"%x\r\n%b\r\n" % (len(data), data))
+                    await writer.drain()
+                    sent += len(lines)
+            finally:
+                batches.close()
+            s.set(changes=sent)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _send_json(self, writer, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     b"Content-Length: %d\r\nConnection: close\r\n\r\n%b" % (len(data), data))
+        await writer.drain()
+
+    async def _send_error(self, writer, status, reason):
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+
+
+# "host:port" を分ける（ポートを省略したらDEFAULT_PORT）
+def parse_address(address):
+    host, sep, port = address.strip().rpartition(":")
+    if not sep:
+        return address.strip(), DEFAULT_PORT
+    try:
+        return host.strip("[]"), int(port)
+    except ValueError:
+        raise SyncError(f"アドレスの形式が正しくありません: {address}")
+
+
+async def _request(host, port, path, token):
+    if not token or not token.isascii() or not token.isprintable():
+        raise SyncError("相手の合言葉を入力してください")
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+    except (OSError, asyncio.TimeoutError) as e:
+        raise SyncError(f"{host}:{port} に接続できませんでした: {e}")
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nX-Sync-Token: {token}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+    parts = status_line.split(None, 2)
+    if len(parts) < 2 or not parts[1].isdigit():
+        writer.close()
+        raise SyncError(f"{host}:{port} の応答が正しくありません")
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    if int(parts[1]) == 401:
+        writer.close()
+        raise SyncError(f"{host}:{port} の合言葉が違います")
+    if int(parts[1]) != 200:
+        writer.close()
+        raise SyncError(f"{host}:{port} {path}: {status_line.decode('latin-1').strip()}")
+    return reader, writer, headers
+
+
+# 応答の本文をバイト列の塊ごとに返す（chunkedの終わりまで届かなければSyncError）
+async def _iter_body(reader, headers):
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+            try:
+                size = int(size_line.split(b";")[0], 16)
+            except ValueError:
+                raise SyncError("応答が途中で途切れました")
+            if size == 0:
+                await reader.readline()
+                return
+            data = await asyncio.wait_for(reader.readexactly(size + 2), READ_TIMEOUT)
+            yield data[:-2]
+    else:
+        yield await asyncio.wait_for(reader.readexactly(int(headers.get("content-length", "0"))), READ_TIMEOUT)
+
+
+async def fetch_vectors(host, port, token):
+    reader, writer, headers = await _request(host, port, API_PREFIX + "/dictionaries", token)
+    try:
+        data = b"".join([block async for block in _iter_body(reader, headers)])
+    finally:
+        writer.close()
+    try:
+        body = json.loads(data.decode("utf-8"))
+        return body["replica"], {name: parse_vector(vector) for name, vector in body["dictionaries"].items()}
+    except (ValueError, KeyError, AttributeError):
+        raise SyncError(f"{host}:{port} の辞書一覧が正しくありません")
+
+
+# 相手の変更のうち自分に無いものを、一時ファイルに書き出す（メモリに溜めない）
+async def fetch_changes(host, port, token, name, since, spool_path):
+    path = f"{API_PREFIX}/changes/{quote(name)}?since={quote(format_vector(since))}"
+    reader, writer, headers = await _request(host, port, path, token)
+    try:
+        with open(spool_path, "wb") as f:
+            async for block in _iter_body(reader, headers):
+                f.write(block)
+    except asyncio.IncompleteReadError:
+        raise SyncError(f"{name}: 応答が途中で途切れました")
+    finally:
+        writer.close()
+
+
+# 相手の辞書のうち、自分より進んでいるものの変更を一時ファイルに受け取る
+# 当てはめ（辞書txtの書き直し）はapply_spoolsで行う（画面では編集を保存してから呼ぶため分けてある）
+# {辞書名: 一時ファイルのパス} を返す
+async def fetch_all(sync_folder, host, port, token, names=None):
+    loop = asyncio.get_running_loop()
+    spools = {}
+    try:
+        with span("sync.fetch", peer=f"{host}:{port}") as s:
+            replica, remote = await fetch_vectors(host, port, token)
+            if replica == sync_folder.replica:
+                raise SyncError("自分自身とは同期できません")
+            local = await loop.run_in_executor(None, sync_folder.vectors)
+            for name, vector in remote.items():
+                if not is_dictionary_name(name) or (names is not None and name not in names):
+                    continue
+                since = local.get(name, {})
+                if not is_behind(since, vector):
+                    continue
+                fd, spool_path = tempfile.mkstemp(prefix=".sync.", suffix=".tsv", dir=sync_folder.sync_dir)
+                os.close(fd)
+                spools[name] = spool_path
+                await fetch_changes(host, port, token, name, since, spool_path)
+            s.set(dictionaries=len(spools))
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+        discard_spools(spools)
+        raise SyncError(f"{host}:{port} との同期に失敗しました: {e or type(e).__name__}")
+    except BaseException:
+        discard_spools(spools)
+        raise
+    return spools
+
+
+def discard_spools(spools):
+    for spool_path in spools.values():
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+
+# 受け取った変更を当てはめて一時ファイルを消す。{辞書名: (追加件数, 削除件数)} を返す
+def apply_spools(sync_folder, spools):
+    results = {}
+    try:
+        with span("sync.apply", dictionaries=len(spools)):
+            for name, spool_path in spools.items():
+                with open(spool_path, encoding="utf-8") as f:
+                    results[name] = sync_folder.apply_lines(name, f)
+                count("sync.applied", sum(results[name]))
+    finally:
+        discard_spools(spools)
+    return results
+
+
+# 受け取りから当てはめまでをまとめて行う（コマンドライン用）
+def pull(sync_folder, host, port, token, names=None):
+    return apply_spools(sync_folder, asyncio.run(fetch_all(sync_folder, host, port, token, names)))
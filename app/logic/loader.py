@@ -0,0 +1,134 @@
+# 辞書ファイルの分割読み込み
+# 大きな辞書でも画面が固まらないよう、別スレッドで少しずつ解析してテーブルに流し込む
+# 検索インデックスも同じスレッドで作る（IDは空のEntryStoreに読み込み順で追加したときの連番）
+# 未反映のジャーナルがある場合は、このスレッドでEntryStoreに読み込んでジャーナルを再生し、それからインデックスを作る。
+# 読み終わったら次回のためにバイナリキャッシュも作っておく。
+# キャッシュから開いた場合は、テーブルはすぐ表示して編集もできるので、インデックスだけを裏で作る。
+# 作り終わる前に必要になった側はwaitで待ってindexを受け取る（シグナルが届くのを待たなくてよい）。
+import os
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from logic.dictionary_cache import build_cache
+from logic.dictionary_file import parse_line
+from logic.entry_store import EntryStore
+from logic.instrumentation import span, timed
+from logic.search_index import EntryIndex
+
+CHUNK_SIZE = 5000
+
+
+# エントリをchunk_size件ずつのリストで返す
+# on_progressには(読み込んだバイト数, 全体のバイト数)を渡す。should_stopがTrueを返したら打ち切る
+def iter_entry_chunks(path, chunk_size=CHUNK_SIZE, should_stop=None, on_progress=None):
+    total = os.path.getsize(path)
+    done = 0
+    chunk = []
+    with open(path, "rb") as f:
+        for raw in f:
+            done += len(raw)
+            entry = parse_line(raw.decode("utf-8"))
+            if entry is not None:
+                chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                if should_stop is not None and should_stop():
+                    return
+                yield chunk
+                chunk = []
+                if on_progress is not None:
+                    on_progress(done, total)
+    if chunk:
+        yield chunk
+    if on_progress is not None:
+        on_progress(total, total)
+
+
+class DictionaryLoader(QThread):
+    chunk_loaded = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+    # (検索インデックス, このスレッドで作ったEntryStore)。EntryStoreはジャーナルを再生したときだけで、ほかはNone
+    loaded = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE, parent=None, cache_path=None, cached=None, journal=None):
+        super().__init__(parent)
+        self.path = path
+        self.chunk_size = chunk_size
+        self.cache_path = cache_path
+        self.cached = cached
+        self.journal = journal
+        # キャッシュから作った検索インデックス（作り終わるまではNone）
+        self.index = None
+
+    def run(self):
+        if self.cached is not None:
+            self.build_index_from_cache()
+            return
+        if self.journal is not None:
+            self.load_with_journal()
+            return
+        index = EntryIndex()
+        count = 0
+        with span("load.parse", file=os.path.basename(self.path)) as parse_span:
+            try:
+                for chunk in iter_entry_chunks(self.path, self.chunk_size, self.isInterruptionRequested, self.progress.emit):
+                    self.chunk_loaded.emit(chunk)
+                    index.extend(count, chunk)
+                    count += len(chunk)
+            except (OSError, UnicodeDecodeError) as e:
+                self.failed.emit(str(e))
+                return
+            if self.isInterruptionRequested():
+                return
+            index.finish_extend()
+            parse_span.set(entries=count)
+        self.loaded.emit(index, None)
+        self.build_cache(count)
+
+    def build_cache(self, count):
+        if self.cache_path is None:
+            return
+        try:
+            with span("cache.build", entries=count):
+                build_cache(self.path, self.cache_path, self.isInterruptionRequested)
+        except (OSError, UnicodeDecodeError):
+            # キャッシュは無くても動くので、作れなくても無視する
+            pass
+
+    # ジャーナルの操作は行番号で記録されているので、読み終わってから再生する
+    # 途中への挿入で振られたIDは昇順に並ばず、EntryStore.position_ofの二分探索が効かなくなるので振り直す
+    def load_with_journal(self):
+        entries = EntryStore()
+        with span("load.parse", file=os.path.basename(self.path), journal=True) as parse_span:
+            try:
+                for chunk in iter_entry_chunks(self.path, self.chunk_size, self.isInterruptionRequested, self.progress.emit):
+                    entries.extend(chunk)
+            except (OSError, UnicodeDecodeError) as e:
+                self.failed.emit(str(e))
+                return
+            if self.isInterruptionRequested():
+                return
+            if self.journal.replay(entries):
+                entries.renumber()
+            index = EntryIndex.from_store(entries)
+            parse_span.set(entries=len(entries))
+        if self.isInterruptionRequested():
+            return
+        self.loaded.emit(index, entries)
+        self.build_cache(len(entries))
+
+    @timed("load.index_from_cache")
+    def build_index_from_cache(self):
+        index = EntryIndex()
+        total = len(self.cached)
+        for start in range(0, total, self.chunk_size):
+            if self.isInterruptionRequested():
+                return
+            index.extend(start, self.cached[start:start + self.chunk_size])
+        index.finish_extend()
+        self.index = index
+        self.loaded.emit(index, None)
+
+    # 別のファイルが選ばれたときなどに途中で止める
+    def cancel(self):
+        self.requestInterruption()
@@ -0,0 +1,189 @@
+# 複数の辞書ファイルのマージ
+# (読み, 表記)をキーにしたハッシュ表でファイルを順に流し込み、同じキーの候補をまとめてから1件ずつ出力する。
+# ハッシュ表が大きくなりすぎたら、キー順に並べた一時ファイル（ラン）に書き出して空にし、
+# 最後に全ランをheapq.mergeで突き合わせるので、入力の合計が大きくてもメモリは一定に収まる。
+import heapq
+import os
+import tempfile
+from itertools import groupby
+
+from logic.dictionary_file import iter_entries
+from logic.instrumentation import timed
+from logic.journal import journal_path_for, read_entries_with_journal, replace_dictionary
+
+# 品詞だけが違うエントリの扱い
+POLICY_FIRST = "first"
+POLICY_LAST = "last"
+POLICY_KEEP_ALL = "keep_all"
+MERGE_POLICIES = {
+    POLICY_FIRST: "先に指定した辞書の品詞を使う",
+    POLICY_LAST: "後に指定した辞書の品詞を使う",
+    POLICY_KEEP_ALL: "品詞違いをすべて残す",
+}
+
+# この件数を超えたらハッシュ表をランに書き出す
+MAX_ENTRIES_IN_MEMORY = 200000
+
+
+# マージ結果の集計。report_pathを指定すると、追加・除外・衝突の明細をTSVで書き出す
+class MergeReport:
+    def __init__(self, paths, report_path=None):
+        self.paths = paths
+        self.report_path = report_path
+        self.total = 0
+        self.added = 0
+        self.dropped = 0
+        self.conflicts = 0
+        self.spilled_runs = 0
+        self._file = None
+        if report_path is not None:
+            self._file = open(report_path, "w", encoding="utf-8")
+            self._file.write("種別\t読み\t表記\t品詞\t辞書\t備考\n")
+
+    def record_added(self, yomi, hyouki, hinshi, source):
+        self.added += 1
+        self._write("追加", yomi, hyouki, hinshi, source, "")
+
+    def record_dropped(self, yomi, hyouki, hinshi, source, reason):
+        self.dropped += 1
+        self._write("除外", yomi, hyouki, hinshi, source, reason)
+
+    def record_conflict(self, yomi, hyouki, candidates):
+        self.conflicts += 1
+        detail = " / ".join(f"{hinshi}({os.path.basename(self.paths[source])})" for source, hinshi in candidates)
+        self._write("衝突", yomi, hyouki, "", None, detail)
+
+    def _write(self, kind, yomi, hyouki, hinshi, source, note):
+        if self._file is None:
+            return
+        name = os.path.basename(self.paths[source]) if source is not None else ""
+        self._file.write(f"{kind}\t{yomi}\t{hyouki}\t{hinshi}\t{name}\t{note}\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def summary(self):
+        return (f"出力 {self.total}件（追加 {self.added}件・除外 {self.dropped}件・"
+                f"品詞の衝突 {self.conflicts}件）")
+
+
+# pathsの辞書を1つにまとめてoutput_pathに書き出す
+# 1つ目の辞書を基準とし、それに無かったキーを「追加」として報告する
+# output_pathの辞書を置き換えた場合、そのジャーナルと（cache_dirを渡したとき）キャッシュは捨てる
+@timed("merge")
+def merge_dictionaries(paths, output_path, policy=POLICY_FIRST, report_path=None, max_entries_in_memory=MAX_ENTRIES_IN_MEMORY, cache_dir=None):
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"不明なマージ方法です: {policy}")
+    report = MergeReport(paths, report_path)
+    try:
+        with tempfile.TemporaryDirectory(prefix="dictionary_merge_") as spill_dir:
+            runs = []
+            table = {}
+            for source, path in enumerate(paths):
+                for yomi, hyouki, hinshi in _iter_source(path):
+                    candidates = table.get((yomi, hyouki))
+                    if candidates is None:
+                        table[(yomi, hyouki)] = [(source, hinshi)]
+                        if len(table) >= max_entries_in_memory:
+                            runs.append(_spill(table, spill_dir, len(runs)))
+                            table = {}
+                    else:
+                        candidates.append((source, hinshi))
+
+            if runs:
+                if table:
+                    runs.append(_spill(table, spill_dir, len(runs)))
+                    table = {}
+                report.spilled_runs = len(runs)
+                groups = _merge_runs(runs)
+            else:
+                # すべてメモリに収まった場合は、最初に出てきた順のまま出力する
+                groups = ((key, candidates) for key, candidates in table.items())
+
+            replace_dictionary(output_path, _resolve_all(groups, policy, report), cache_dir)
+    finally:
+        report.close()
+    return report
+
+
+# 未反映のジャーナルがある辞書はそれも含めて読む
+def _iter_source(path):
+    if os.path.exists(journal_path_for(path)):
+        return iter(read_entries_with_journal(path))
+    return iter_entries(path)
+
+
+# ハッシュ表をキー順に並べて一時ファイルに書き出す
+def _spill(table, spill_dir, number):
+    path = os.path.join(spill_dir, f"run{number:05d}.tsv")
+    with open(path, "w", encoding="utf-8") as f:
+        for (yomi, hyouki), candidates in sorted(table.items()):
+            fields = [yomi, hyouki]
+            for source, hinshi in candidates:
+                fields.append(str(source))
+                fields.append(hinshi)
+            f.write("\t".join(fields) + "\n")
+    return path
+
+
+def _read_run(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            candidates = [(int(fields[i]), fields[i + 1]) for i in range(2, len(fields), 2)]
+            yield (fields[0], fields[1]), candidates
+
+
+# 全ランをキー順に突き合わせ、同じキーの候補を1つにまとめる
+# heapq.mergeは同じキーなら先のランから返すので、辞書内の出現順は保たれる
+def _merge_runs(runs):
+    merged = heapq.merge(*(_read_run(path) for path in runs), key=lambda item: item[0])
+    for key, items in groupby(merged, key=lambda item: item[0]):
+        candidates = []
+        for _, run_candidates in items:
+            candidates.extend(run_candidates)
+        candidates.sort(key=lambda candidate: candidate[0])
+        yield key, candidates
+
+
+def _resolve_all(groups, policy, report):
+    for (yomi, hyouki), candidates in groups:
+        kept = _resolve(yomi, hyouki, candidates, policy, report)
+        in_base = candidates[0][0] == 0
+        for source, hinshi in kept:
+            report.total += 1
+            if not in_base:
+                report.record_added(yomi, hyouki, hinshi, source)
+            yield yomi, hyouki, hinshi
+
+
+# 同じ(読み, 表記)の候補から残すものを選ぶ。candidatesは辞書の指定順に並んでいる
+# 品詞まで同じものは、POLICY_LASTなら後に出てきたものを、ほかは先に出てきたものを残し、捨てた方を除外として報告する
+def _resolve(yomi, hyouki, candidates, policy, report):
+    keep_last = policy == POLICY_LAST
+    distinct = {}
+    for source, hinshi in candidates:
+        if hinshi not in distinct:
+            distinct[hinshi] = source
+        elif keep_last:
+            report.record_dropped(yomi, hyouki, hinshi, distinct[hinshi], "重複")
+            distinct[hinshi] = source
+        else:
+            report.record_dropped(yomi, hyouki, hinshi, source, "重複")
+    if len(distinct) == 1:
+        return [(source, hinshi) for hinshi, source in distinct.items()]
+
+    unique_candidates = [(source, hinshi) for hinshi, source in distinct.items()]
+    report.record_conflict(yomi, hyouki, unique_candidates)
+    if policy == POLICY_KEEP_ALL:
+        return unique_candidates
+    if policy == POLICY_FIRST:
+        winner = unique_candidates[0]
+    else:
+        winner = candidates[-1]
+    for source, hinshi in unique_candidates:
+        if hinshi != winner[1]:
+            report.record_dropped(yomi, hyouki, hinshi, source, "品詞の衝突")
+    return [winner]
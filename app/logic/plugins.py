@@ -0,0 +1,143 @@
+# 形式プラグインの登録簿
+# エクスポート・インポートの形式や、QRコード・クリップボードなどの共有方法は、名前・表示名と
+# 「モジュール名:属性名」だけを登録しておき、実際の処理を書いたモジュールは初めて使うときに読み込む（起動を速くするため）。
+#   export: ExportFormat（dictionary_manager）    import: ImportFormat（dictionary_importer）
+#   share:  action(window) の関数（画面右側にボタンとして並ぶ）
+# 辞書フォルダの plugins フォルダに置いた *.py も起動時に読み込むので、MainWindowを触らずに形式を足せる。
+# プラグインのファイルには register_plugin の呼び出しだけを書き、重いimportは処理の関数の中に書く。
+import importlib
+import importlib.util
+import os
+import sys
+from collections.abc import Mapping
+
+KIND_EXPORT = "export"
+KIND_IMPORT = "import"
+KIND_SHARE = "share"
+
+
+class Plugin:
+    # targetは "モジュール名:属性名" か、読み込み済みのオブジェクトそのもの
+    # orderが小さいものほどボタンなどで先に並ぶ
+    def __init__(self, kind, name, label, target, order=100, source=None):
+        self.kind = kind
+        self.name = name
+        self.label = label
+        self.target = target
+        self.order = order
+        self.source = source
+        self._loaded = None if isinstance(target, str) else target
+
+    def is_loaded(self):
+        return self._loaded is not None
+
+    # 処理の本体を読み込んで返す（2回目からは読み込み済みのものを返す）
+    def load(self):
+        if self._loaded is None:
+            module_name, _, attr = self.target.partition(":")
+            obj = importlib.import_module(module_name)
+            for part in attr.split(".") if attr else []:
+                obj = getattr(obj, part)
+            self._loaded = obj
+        return self._loaded
+
+
+_PLUGINS = {}
+# 読み込んだプラグインファイル（別プロセスでも同じものを読み込むため）
+_plugin_files = []
+# 読み込み中のプラグインファイル（登録元として覚えておく）
+_loading_file = None
+
+
+def register_plugin(kind, name, label, target, order=100):
+    plugin = Plugin(kind, name, label, target, order, source=_loading_file)
+    _PLUGINS[(kind, name)] = plugin
+    return plugin
+
+
+def get_plugin(kind, name):
+    return _PLUGINS.get((kind, name))
+
+
+def plugins(kind):
+    return sorted((p for p in _PLUGINS.values() if p.kind == kind), key=lambda p: (p.order, p.name))
+
+
+# フォルダ内の *.py を読み込んで登録させる（_で始まるものは除く）。[(パス, エラー)] を返す
+def load_plugin_dir(directory):
+    global _loading_file
+    errors = []
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return errors
+    for file_name in names:
+        if not file_name.endswith(".py") or file_name.startswith("_"):
+            continue
+        path = os.path.abspath(os.path.join(directory, file_name))
+        if path in _plugin_files:
+            continue
+        module_name = "dictionary_app_plugin_" + os.path.splitext(file_name)[0]
+        _loading_file = path
+        try:
+            spec = importlib.util.spec_from_file_location(module_name, path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+            _plugin_files.append(path)
+        except Exception as e:
+            sys.modules.pop(module_name, None)
+            errors.append((path, e))
+        finally:
+            _loading_file = None
+    return errors
+
+
+def plugin_files():
+    return list(_plugin_files)
+
+
+# 別プロセス（取り込みのプロセスプールなど）で、親と同じプラグインファイルを読み込む
+def load_plugin_files(paths):
+    for directory in sorted({os.path.dirname(path) for path in paths}):
+        load_plugin_dir(directory)
+
+
+# 種類ごとの {名前: 読み込んだ本体} として見せる（EXPORT_FORMATS・IMPORT_FORMATS）
+# 名前の一覧だけなら何も読み込まず、[名前]で取り出したときに初めて読み込む
+class PluginMapping(Mapping):
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __getitem__(self, name):
+        plugin = _PLUGINS.get((self.kind, name))
+        if plugin is None:
+            raise KeyError(name)
+        return plugin.load()
+
+    def __contains__(self, name):
+        return (self.kind, name) in _PLUGINS
+
+    def __iter__(self):
+        return iter([plugin.name for plugin in plugins(self.kind)])
+
+    def __len__(self):
+        return sum(1 for kind, _ in _PLUGINS if kind == self.kind)
+
+    def label(self, name):
+        return _PLUGINS[(self.kind, name)].label
+
+
+# 組み込みの形式（エントリポイントの一覧にあたる）
+register_plugin(KIND_EXPORT, "google_mozc", "Google日本語入力 / Mozc", "logic.formats.tsv:MOZC_EXPORT", order=10)
+register_plugin(KIND_EXPORT, "msime", "Microsoft IME", "logic.formats.tsv:MSIME_EXPORT", order=20)
+register_plugin(KIND_EXPORT, "atok", "ATOK", "logic.formats.atok:EXPORT", order=30)
+register_plugin(KIND_EXPORT, "skk", "SKK", "logic.formats.skk:EXPORT", order=40)
+register_plugin(KIND_IMPORT, "google_mozc", "Google日本語入力 / Mozc", "logic.formats.tsv:MOZC_IMPORT", order=10)
+register_plugin(KIND_IMPORT, "msime", "Microsoft IME", "logic.formats.tsv:MSIME_IMPORT", order=20)
+register_plugin(KIND_IMPORT, "atok", "ATOK", "logic.formats.atok:IMPORT", order=30)
+register_plugin(KIND_IMPORT, "skk", "SKK", "logic.formats.skk:IMPORT", order=40)
+register_plugin(KIND_SHARE, "clipboard_copy", "辞書をクリップボードにコピー", "ui.clipboard_share:export_to_clipboard", order=10)
+register_plugin(KIND_SHARE, "clipboard_paste", "クリップボードから辞書を読み込み", "ui.clipboard_share:import_from_clipboard", order=20)
+register_plugin(KIND_SHARE, "qr", "QRコード表示", "ui.qr_dialog:show_qr_code", order=30)
+register_plugin(KIND_SHARE, "lan_sync", "LAN同期", "ui.lan_sync_dialog:show_lan_sync", order=40)
@@ -0,0 +1,69 @@
+# QRコード共有用のエンコード
+# 辞書のTSVをzlibで圧縮し、QRコード1枚に収まる大きさに分割する。
+# 各分割には「何枚中の何枚目か」と全体のCRC32を付けたヘッダを付け、base64の文字列にする。
+import base64
+import struct
+import zlib
+
+from logic.instrumentation import timed
+
+MAGIC = b"DQ"
+VERSION = 1
+# magic, version, 何枚目(0始まり), 全体の枚数, 圧縮データ全体のCRC32
+HEADER = struct.Struct(">2sBHHI")
+# 1枚あたりの圧縮データのバイト数（base64後も誤り訂正レベルMのQRコードに収まる大きさ）
+CHUNK_DATA_SIZE = 1400
+
+
+class QRShareError(ValueError):
+    pass
+
+
+def entries_to_tsv(entries):
+    return "".join([f"{yomi}\t{hyouki}\t{hinshi}\n" for yomi, hyouki, hinshi in entries])
+
+
+@timed("qr.encode")
+def encode_qr_chunks(entries, chunk_size=CHUNK_DATA_SIZE):
+    payload = zlib.compress(entries_to_tsv(entries).encode("utf-8"), 9)
+    checksum = zlib.crc32(payload)
+    total = max(1, -(-len(payload) // chunk_size))
+    if total > 0xFFFF:
+        raise QRShareError("辞書が大きすぎてQRコードに分割できません。")
+    chunks = []
+    for index in range(total):
+        data = payload[index * chunk_size:(index + 1) * chunk_size]
+        frame = HEADER.pack(MAGIC, VERSION, index, total, checksum) + data
+        chunks.append(base64.b64encode(frame).decode("ascii"))
+    return chunks
+
+
+# 読み取ったQRコードの文字列（順不同）からエントリのリストに戻す
+def decode_qr_chunks(chunks):
+    frames = {}
+    total = checksum = None
+    for chunk in chunks:
+        try:
+            frame = base64.b64decode(chunk.strip(), validate=True)
+            magic, version, index, chunk_total, chunk_checksum = HEADER.unpack_from(frame)
+        except (ValueError, struct.error):
+            raise QRShareError("QRコードの形式が正しくありません。")
+        if magic != MAGIC or version != VERSION:
+            raise QRShareError("対応していない形式のQRコードです。")
+        if total is None:
+            total, checksum = chunk_total, chunk_checksum
+        elif (total, checksum) != (chunk_total, chunk_checksum):
+            raise QRShareError("別の辞書のQRコードが混ざっています。")
+        frames[index] = frame[HEADER.size:]
+    missing = [str(i + 1) for i in range(total or 0) if i not in frames]
+    if total is None or missing:
+        raise QRShareError(f"足りないQRコードがあります: {', '.join(missing)}枚目")
+    payload = b"".join(frames[i] for i in range(total))
+    if zlib.crc32(payload) != checksum:
+        raise QRShareError("QRコードのデータが壊れています。")
+    entries = []
+    for line in zlib.decompress(payload).decode("utf-8").splitlines():
+        parts = line.split("\t")
+        if len(parts) == 3:
+            entries.append(tuple(parts))
+    return entries
@@ -0,0 +1,212 @@
+# 辞書エントリの検索用インデックス
+# 読みはソート済みの配列で前方一致、表記は1文字・2文字のn-gramで部分一致を引く。
+# (読み, 表記)の組のハッシュも持っているので、重複登録のチェックもすぐにできる。
+# エントリはEntryStoreのIDで管理するので、行の削除で番号がずれても作り直さなくてよい。
+# 文字列の写しは持たず、IDだけを配列で持って、読み・表記は必要なときにstore（EntryStoreやCachedDictionary）から読む。
+# n-gramの一覧は作ったときのものを詰めた配列のまま変えず、編集で増えた分だけを別に持つ。
+# 削除・変更したエントリのIDは覚えておき、検索で引っかかったら実際の表記で確かめる。
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+# 表記に含まれる1文字・2文字のn-gramを整数にしたもの（文字列のキーより小さく済む）
+def _gram_code(gram):
+    if len(gram) == 1:
+        return ord(gram)
+    return ((ord(gram[0]) + 1) << 21) | ord(gram[1])
+
+
+def _gram_codes(text):
+    chars = [ord(c) for c in text]
+    codes = set(chars)
+    codes.update(((a + 1) << 21) | b for a, b in zip(chars, chars[1:]))
+    return codes
+
+
+class EntryIndex:
+    def __init__(self, store=None):
+        # 読み・表記を読み出す先。別のスレッドで作った場合は、受け取った側で設定する
+        self.store = store
+        # (読み, ID)の順に並べたID
+        self._yomi_order = array("q")
+        # (読み, 表記)のハッシュの昇順と、それに対応するID
+        self._key_hashes = array("q")
+        self._key_ids = array("q")
+        # n-gramのコードの昇順と、各コードのIDが_gram_idsのどこから始まるか（最後に全体の長さ）
+        self._gram_codes = array("q")
+        self._gram_starts = array("q", (0,))
+        self._gram_ids = array("q")
+        # 作ったあとの編集で増えたn-gram -> ID
+        self._added_grams = {}
+        # 作ったあとに削除・変更したID（n-gramの一覧に古い表記のまま残っている）
+        self._changed = set()
+        # extendで追加した分。finish_extendで並べて配列に移す
+        self._pending_yomi = []
+        self._pending_keys = []
+        self._pending_grams = {}
+
+    # EntryStoreの中身からまとめて作る
+    @classmethod
+    def from_store(cls, store, chunk_size=5000):
+        index = cls(store)
+        total = len(store)
+        for start in range(0, total, chunk_size):
+            end = min(start + chunk_size, total)
+            index._extend(zip((store.id_at(i) for i in range(start, end)), store[start:end]))
+        index.finish_extend()
+        return index
+
+    def __len__(self):
+        return len(self._yomi_order) + len(self._pending_yomi)
+
+    # 連番のIDでまとめて追加（読み込み時用。並べ替えはfinish_extendで1回だけ行う）
+    # storeが無くても作れるので、読み込みのスレッドで使う
+    def extend(self, first_id, entries):
+        self._extend(enumerate(entries, first_id))
+
+    def finish_extend(self):
+        if not self._pending_yomi:
+            return
+        pending = self._pending_yomi
+        pending.extend((self._yomi(entry_id), entry_id) for entry_id in self._yomi_order)
+        pending.sort()
+        self._yomi_order = array("q", [entry_id for _, entry_id in pending])
+        self._pending_yomi = []
+        pending = self._pending_keys
+        pending.extend(zip(self._key_hashes, self._key_ids))
+        pending.sort()
+        self._key_hashes = array("q", [key for key, _ in pending])
+        self._key_ids = array("q", [entry_id for _, entry_id in pending])
+        self._pending_keys = []
+        grams = self._pending_grams
+        for i, code in enumerate(self._gram_codes):
+            grams.setdefault(code, array("q")).extend(self._gram_ids[self._gram_starts[i]:self._gram_starts[i + 1]])
+        codes = sorted(grams)
+        self._gram_codes = array("q", codes)
+        self._gram_starts = array("q", (0,))
+        self._gram_ids = array("q")
+        for code in codes:
+            self._gram_ids.extend(grams.pop(code))
+            self._gram_starts.append(len(self._gram_ids))
+        self._pending_grams = {}
+
+    # storeに追加・変更したあとで呼ぶ
+    def add(self, entry_id, yomi, hyouki):
+        self.finish_extend()
+        order = self._yomi_order
+        order.insert(bisect_left(order, (yomi, entry_id), key=self._yomi_key), entry_id)
+        key = hash((yomi, hyouki))
+        pos = bisect_right(self._key_hashes, key)
+        self._key_hashes.insert(pos, key)
+        self._key_ids.insert(pos, entry_id)
+        for code in _gram_codes(hyouki):
+            ids = self._added_grams.get(code)
+            if ids is None:
+                self._added_grams[code] = array("q", (entry_id,))
+            else:
+                ids.append(entry_id)
+
+    # storeから削除・変更する前に呼ぶ（位置を探すのに今の読み・表記を使う）
+    def remove(self, entry_id):
+        self.finish_extend()
+        yomi, hyouki, _ = self._entry(entry_id)
+        order = self._yomi_order
+        del order[bisect_left(order, (yomi, entry_id), key=self._yomi_key)]
+        key = hash((yomi, hyouki))
+        pos = bisect_left(self._key_hashes, key)
+        while self._key_ids[pos] != entry_id:
+            pos += 1
+        del self._key_hashes[pos]
+        del self._key_ids[pos]
+        self._changed.add(entry_id)
+
+    # 同じ読み・表記が登録済みか（ハッシュが同じものは実際の文字列で確かめる）
+    def contains(self, yomi, hyouki):
+        self.finish_extend()
+        key = hash((yomi, hyouki))
+        hashes = self._key_hashes
+        pos = bisect_left(hashes, key)
+        while pos < len(hashes) and hashes[pos] == key:
+            if self._entry(self._key_ids[pos])[:2] == (yomi, hyouki):
+                return True
+            pos += 1
+        return False
+
+    # 読みが前方一致、または表記が部分一致するエントリのIDを昇順で返す
+    def search(self, query):
+        self.finish_extend()
+        if not query:
+            return sorted(self._yomi_order)
+        found = set(self._prefix_ids(query))
+        found.update(self._substring_ids(query))
+        return sorted(found)
+
+    def _prefix_ids(self, prefix):
+        order = self._yomi_order
+        pos = bisect_left(order, (prefix,), key=self._yomi_key)
+        while pos < len(order) and self._yomi(order[pos]).startswith(prefix):
+            yield order[pos]
+            pos += 1
+
+    def _substring_ids(self, text):
+        codes = {_gram_code(text)} if len(text) == 1 else {_gram_code(text[i:i + 2]) for i in range(len(text) - 1)}
+        # 候補の少ないn-gramから絞り込む
+        candidates = None
+        for code in sorted(codes, key=self._gram_count):
+            ids = self._gram_ids_of(code)
+            if not ids:
+                return set()
+            candidates = set(ids) if candidates is None else candidates.intersection(ids)
+            if not candidates:
+                return set()
+        # 3文字以上は、どのn-gramも含むだけで並びが違うことがあるので実際の文字列で確かめる
+        if len(text) > 2:
+            return {i for i in candidates if self._has_text(i, text)}
+        stale = candidates.intersection(self._changed)
+        if stale:
+            candidates.difference_update(i for i in stale if not self._has_text(i, text))
+        return candidates
+
+    def _gram_count(self, code):
+        pos = bisect_left(self._gram_codes, code)
+        count = len(self._added_grams.get(code, ()))
+        if pos < len(self._gram_codes) and self._gram_codes[pos] == code:
+            count += self._gram_starts[pos + 1] - self._gram_starts[pos]
+        return count
+
+    def _gram_ids_of(self, code):
+        pos = bisect_left(self._gram_codes, code)
+        if pos < len(self._gram_codes) and self._gram_codes[pos] == code:
+            ids = self._gram_ids[self._gram_starts[pos]:self._gram_starts[pos + 1]]
+        else:
+            ids = array("q")
+        ids.extend(self._added_grams.get(code, ()))
+        return ids
+
+    # 削除済みのIDならFalse
+    def _has_text(self, entry_id, text):
+        pos = self.store.position_of(entry_id)
+        return pos >= 0 and text in self.store[pos][1]
+
+    def _extend(self, id_entries):
+        pending_yomi = self._pending_yomi
+        pending_keys = self._pending_keys
+        grams = self._pending_grams
+        for entry_id, (yomi, hyouki, _) in id_entries:
+            pending_yomi.append((yomi, entry_id))
+            pending_keys.append((hash((yomi, hyouki)), entry_id))
+            for code in _gram_codes(hyouki):
+                ids = grams.get(code)
+                if ids is None:
+                    grams[code] = array("q", (entry_id,))
+                else:
+                    ids.append(entry_id)
+
+    def _entry(self, entry_id):
+        return self.store[self.store.position_of(entry_id)]
+
+    def _yomi(self, entry_id):
+        return self.store[self.store.position_of(entry_id)][0]
+
+    def _yomi_key(self, entry_id):
+        return (self._yomi(entry_id), entry_id)
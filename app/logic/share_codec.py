@@ -0,0 +1,155 @@
+# クリップボード共有用の形式
+# 1行目がヘッダ、2行目がzlibで圧縮したTSVのbase64という2行のテキストにする。
+#   DICTSHARE/1 full  <CRC32> - <ファイル名>
+#   DICTSHARE/1 delta <CRC32> <元の辞書のハッシュ> <ファイル名>
+# deltaは前回共有した内容（スナップショット）からの追加・削除だけを送る形式。
+# 以前のアプリが出力していた「1行目がファイル名、2行目以降がTSV」の形式も読み込める。
+import base64
+import hashlib
+import os
+import re
+import zlib
+from collections import Counter
+
+from logic.dictionary_file import read_entries, write_entries_atomic
+
+MAGIC = "DICTSHARE/1"
+MODE_FULL = "full"
+MODE_DELTA = "delta"
+
+OP_ADD = "+"
+OP_REMOVE = "-"
+
+
+class ShareFormatError(ValueError):
+    pass
+
+
+class SharePayload:
+    def __init__(self, mode, file_name, entries=None, added=None, removed=None, base_hash=None):
+        self.mode = mode
+        self.file_name = file_name
+        self.entries = entries or []
+        self.added = added or []
+        self.removed = removed or []
+        self.base_hash = base_hash
+
+
+# 並び順によらない辞書の内容のハッシュ
+def content_hash(entries):
+    lines = sorted(f"{yomi}\t{hyouki}\t{hinshi}" for yomi, hyouki, hinshi in entries)
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()[:16]
+
+
+# baseからcurrentへの差分（追加されたもの, 削除されたもの）
+def compute_delta(base_entries, current_entries):
+    base = Counter(tuple(entry) for entry in base_entries)
+    current = Counter(tuple(entry) for entry in current_entries)
+    return list((current - base).elements()), list((base - current).elements())
+
+
+def encode_full(file_name, entries):
+    body = "".join([f"{yomi}\t{hyouki}\t{hinshi}\n" for yomi, hyouki, hinshi in entries])
+    return _encode(MODE_FULL, "-", file_name, body)
+
+
+def encode_delta(file_name, base_entries, current_entries):
+    added, removed = compute_delta(base_entries, current_entries)
+    lines = [f"{OP_REMOVE}\t{yomi}\t{hyouki}\t{hinshi}\n" for yomi, hyouki, hinshi in removed]
+    lines += [f"{OP_ADD}\t{yomi}\t{hyouki}\t{hinshi}\n" for yomi, hyouki, hinshi in added]
+    return _encode(MODE_DELTA, content_hash(base_entries), file_name, "".join(lines)), len(added), len(removed)
+
+
+def _encode(mode, base_hash, file_name, body):
+    data = body.encode("utf-8")
+    checksum = f"{zlib.crc32(data):08x}"
+    encoded = base64.b64encode(zlib.compress(data, 9)).decode("ascii")
+    return f"{MAGIC} {mode} {checksum} {base_hash} {file_name}\n{encoded}\n"
+
+
+def decode_share(text):
+    lines = text.strip().splitlines()
+    if not lines:
+        raise ShareFormatError("クリップボードに有効な行がありません。")
+    if not lines[0].startswith(MAGIC + " "):
+        return _decode_plain(lines)
+
+    header = lines[0].split(" ", 4)
+    if len(header) != 5 or header[1] not in (MODE_FULL, MODE_DELTA) or len(lines) < 2:
+        raise ShareFormatError("共有データのヘッダが正しくありません。")
+    _, mode, checksum, base_hash, file_name = header
+    try:
+        data = zlib.decompress(base64.b64decode("".join(lines[1:]), validate=True))
+    except (ValueError, zlib.error):
+        raise ShareFormatError("共有データが途中で切れているか、壊れています。")
+    if f"{zlib.crc32(data):08x}" != checksum:
+        raise ShareFormatError("共有データのチェックサムが一致しません。")
+    body = data.decode("utf-8").splitlines()
+
+    if mode == MODE_FULL:
+        return SharePayload(MODE_FULL, file_name, entries=_parse_rows(body))
+    added = []
+    removed = []
+    for line in body:
+        parts = line.split("\t")
+        if len(parts) != 4:
+            continue
+        if parts[0] == OP_ADD:
+            added.append(tuple(parts[1:]))
+        elif parts[0] == OP_REMOVE:
+            removed.append(tuple(parts[1:]))
+    return SharePayload(MODE_DELTA, file_name, added=added, removed=removed, base_hash=base_hash)
+
+
+# 以前の形式（1行目にファイル名、2行目以降にTSV）
+def _decode_plain(lines):
+    first_line = lines[0].strip()
+    if not (first_line.endswith(".txt") or first_line.endswith("）")):
+        raise ShareFormatError("1行目にファイル名（例: xxx.txt）を含めてください。")
+    match = re.search(r"\(?([^\s()]+\.txt)\)?", first_line)
+    if not match:
+        raise ShareFormatError("先頭行からファイル名が抽出できませんでした。")
+    return SharePayload(MODE_FULL, match.group(1), entries=_parse_rows(lines[1:]))
+
+
+def _parse_rows(lines):
+    entries = []
+    for line in lines:
+        parts = line.strip().split("\t")
+        if len(parts) == 3:
+            entries.append(tuple(parts))
+    return entries
+
+
+# 差分をentriesに当てはめるための計画を立てる
+# 削除する行番号（降順）と、まだ無いので追加するエントリを返す
+def plan_delta(entries, added, removed):
+    to_remove = Counter(removed)
+    wanted = set(added)
+    rows = []
+    present = set()
+    for row, entry in enumerate(entries):
+        if to_remove.get(entry):
+            to_remove[entry] -= 1
+            rows.append(row)
+        elif entry in wanted:
+            present.add(entry)
+    to_add = [entry for entry in added if entry not in present]
+    return sorted(rows, reverse=True), to_add
+
+
+# 前回共有した内容の保存先
+def snapshot_path(snapshot_dir, file_name):
+    return os.path.join(snapshot_dir, file_name)
+
+
+def load_snapshot(snapshot_dir, file_name):
+    path = snapshot_path(snapshot_dir, file_name)
+    if not os.path.exists(path):
+        return None
+    return read_entries(path)
+
+
+def save_snapshot(snapshot_dir, file_name, entries):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    write_entries_atomic(snapshot_path(snapshot_dir, file_name), entries)
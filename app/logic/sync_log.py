@@ -0,0 +1,353 @@
+# LAN同期用の辞書ごとの変更履歴
+# 辞書をエントリ（読み・表記・品詞）の集合とみなし、追加・削除を「sync/<辞書名>.changes」に1行ずつ追記する。
+#   <端末ID>\t<端末ごとの連番>\t<Lamport時刻>\t<+ か ->\t<読み>\t<表記>\t<品詞>
+# 端末ごとの連番の最大値（バージョンベクトル）を比べれば、相手がまだ持っていない操作だけを送れる。
+# 同じエントリへの操作が食い違ったら (Lamport時刻, 端末ID) の大きいほうを採るので、どの端末でも同じ結果になる。
+# アプリやエディタでの編集は、前回記録したときの内容と辞書txtを比べて操作に直してから記録する（refresh）。
+import os
+import threading
+import uuid
+
+from logic.journal import DictionaryJournal, journal_path_for, read_entries_with_journal
+
+CHANGES_SUFFIX = ".changes"
+REPLICA_FILE = "replica_id"
+
+OP_ADD = "+"
+OP_REMOVE = "-"
+
+# 先頭の「!」の行には、書き直しで消した操作の分も含めたバージョンベクトルとLamport時刻を残す
+HEADER_PREFIX = "!"
+# 有効な操作の何倍を超えて履歴が伸びたら、勝った操作だけに書き直すか
+COMPACT_RATIO = 2
+COMPACT_MIN_LINES = 10000
+# 受け取った操作をこの件数ごとにまとめて適用する
+APPLY_BATCH = 10000
+
+
+class SyncError(Exception):
+    pass
+
+
+# この端末のID（初回に作って保存しておく）
+def load_replica_id(sync_dir):
+    path = os.path.join(sync_dir, REPLICA_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            replica = f.read().strip()
+        if replica:
+            return replica
+    os.makedirs(sync_dir, exist_ok=True)
+    replica = uuid.uuid4().hex[:12]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(replica + "\n")
+    return replica
+
+
+# バージョンベクトル {端末ID: 連番} と "端末ID=連番,..." の変換（URLのクエリにもそのまま使う）
+def format_vector(vector):
+    return ",".join(f"{replica}={seq}" for replica, seq in sorted(vector.items()))
+
+
+def parse_vector(text):
+    vector = {}
+    for part in text.split(","):
+        replica, sep, seq = part.partition("=")
+        if not sep:
+            continue
+        try:
+            vector[replica] = int(seq)
+        except ValueError:
+            raise SyncError(f"バージョンベクトルの形式が正しくありません: {text}")
+    return vector
+
+
+# otherにあってvectorに無い操作があるか
+def is_behind(vector, other):
+    return any(seq > vector.get(replica, 0) for replica, seq in other.items())
+
+
+def format_change(replica, seq, clock, op, entry):
+    return f"{replica}\t{seq}\t{clock}\t{op}\t{entry[0]}\t{entry[1]}\t{entry[2]}\n"
+
+
+# 1行を (端末ID, 連番, 時刻, 操作, エントリ) にする（壊れた行はNone）
+def parse_change(line):
+    fields = line.rstrip("\r\n").split("\t")
+    if len(fields) != 7 or fields[3] not in (OP_ADD, OP_REMOVE):
+        return None
+    try:
+        return fields[0], int(fields[1]), int(fields[2]), fields[3], tuple(fields[4:])
+    except ValueError:
+        return None
+
+
+class ChangeLog:
+    def __init__(self, path, replica):
+        self.path = path
+        self.replica = replica
+        # 記録と適用は、サーバーのスレッドと画面の両方から呼ばれる
+        self.lock = threading.Lock()
+        # 最後に記録したときの辞書txt・ジャーナルの状態（変わっていなければ読み直さない）
+        self.signature = None
+        self._reset()
+        self.catch_up()
+
+    def _reset(self):
+        self.vector = {}
+        self.clock = 0
+        # エントリ -> (時刻, 端末ID, 連番, 操作) 最後に勝った操作
+        self.state = {}
+        self.lines = 0
+        # 読み終えたところ（バイト数）と、読んでいるファイル
+        self._offset = 0
+        self._file_id = None
+
+    # ほかのプロセス（同じ辞書フォルダのサーバーとコマンドラインなど）が追記・書き直した分を読み込む
+    # 記録・適用の前に呼ぶ（古い状態のまま記録すると、連番が重なってしまう）
+    def catch_up(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            if self._file_id is not None:
+                self._reset()
+                self.signature = None
+            return
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id or stat.st_size < self._offset:
+            self._reset()
+            self.signature = None
+            self._file_id = file_id
+        if stat.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for raw in f:
+                # 書き込み途中の最後の行は、書き終わってから読む
+                if not raw.endswith(b"\n"):
+                    break
+                self._offset += len(raw)
+                line = raw.decode("utf-8")
+                if line.startswith(HEADER_PREFIX):
+                    clock, _, vector = line[1:].rstrip("\n").partition("\t")
+                    self.clock = max(self.clock, int(clock))
+                    for replica, seq in parse_vector(vector).items():
+                        self.vector[replica] = max(self.vector.get(replica, 0), seq)
+                    continue
+                change = parse_change(line)
+                if change is not None:
+                    self._remember(change)
+                    self.lines += 1
+
+    # 操作を状態に反映し、エントリの有無が変わったらTrue
+    def _remember(self, change):
+        replica, seq, clock, op, entry = change
+        if seq > self.vector.get(replica, 0):
+            self.vector[replica] = seq
+        if clock > self.clock:
+            self.clock = clock
+        current = self.state.get(entry)
+        if current is not None and (clock, replica) <= (current[0], current[1]):
+            return False
+        self.state[entry] = (clock, replica, seq, op)
+        return (current[3] if current is not None else OP_REMOVE) != op
+
+    def present(self):
+        return {entry for entry, (_, _, _, op) in self.state.items() if op == OP_ADD}
+
+    # 辞書の今の内容と、前回記録したときの内容の差をこの端末の操作として記録する
+    def record_local(self, entries):
+        current = dict.fromkeys(entries)
+        present = self.present()
+        ops = [(OP_ADD, entry) for entry in current if entry not in present]
+        ops += [(OP_REMOVE, entry) for entry in present if entry not in current]
+        if not ops:
+            return 0
+        seq = self.vector.get(self.replica, 0)
+        lines = []
+        for op, entry in ops:
+            seq += 1
+            change = (self.replica, seq, self.clock + 1, op, entry)
+            self._remember(change)
+            lines.append(format_change(*change))
+        self._append(lines)
+        return len(ops)
+
+    # 相手から受け取った操作を記録し、エントリの有無が変わったもの [(操作, エントリ)] を返す
+    # 同じ端末の操作は連番の順に届くので、記録済みの連番以下のものは読み飛ばす
+    def apply(self, changes):
+        flipped = []
+        lines = []
+        for change in changes:
+            replica, seq = change[0], change[1]
+            if seq <= self.vector.get(replica, 0):
+                continue
+            if self._remember(change):
+                flipped.append((change[3], change[4]))
+            lines.append(format_change(*change))
+        self._append(lines)
+        return flipped
+
+    def _append(self, lines):
+        if not lines:
+            return
+        with open(self.path, "ab") as f:
+            start = f.seek(0, os.SEEK_END)
+            f.write("".join(lines).encode("utf-8"))
+            end = f.tell()
+        # 読み終えたところの直後に書けたときだけ進める（間にほかのプロセスが書いていたら、次のcatch_upで読む）
+        if start == self._offset:
+            self._offset = end
+            if self._file_id is None:
+                stat = os.stat(self.path)
+                self._file_id = (stat.st_dev, stat.st_ino)
+        self.lines += len(lines)
+        if self.lines > COMPACT_MIN_LINES and self.lines > COMPACT_RATIO * len(self.state):
+            self.compact()
+
+    # 負けた操作を捨て、エントリごとに勝った操作だけを書き直す
+    # 端末ごとに連番の順で並べるので、相手には今までと同じ順で送れる
+    def compact(self):
+        winners = sorted((replica, seq, clock, op, entry) for entry, (clock, replica, seq, op) in self.state.items())
+        directory = os.path.dirname(os.path.abspath(self.path))
+        tmp_path = os.path.join(directory, f".{os.path.basename(self.path)}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(f"{HEADER_PREFIX}{self.clock}\t{format_vector(self.vector)}\n")
+                f.writelines([format_change(*change) for change in winners])
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            stat = os.stat(self.path)
+        except OSError:
+            # 送信中で開かれているなど（Windows）。追記した内容はそのままなので、次の機会に書き直す
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.lines = len(winners)
+        self._offset = stat.st_size
+        self._file_id = (stat.st_dev, stat.st_ino)
+
+    # sinceに無い操作の行を、batch行ずつのリストで返す（ファイルを少しずつ読むので大きな辞書でも送れる）
+    def iter_since(self, since, batch=APPLY_BATCH):
+        if not os.path.exists(self.path):
+            return
+        lines = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                if line.startswith(HEADER_PREFIX):
+                    continue
+                replica, _, rest = line.partition("\t")
+                seq = rest[:rest.find("\t")]
+                if seq.isdigit() and int(seq) > since.get(replica, 0):
+                    lines.append(line)
+                    if len(lines) >= batch:
+                        yield lines
+                        lines = []
+        if lines:
+            yield lines
+
+
+# 辞書フォルダ全体の同期の状態。変更履歴は辞書ごとに sync_dir に置く
+class SyncFolder:
+    def __init__(self, dictionary_dir, sync_dir):
+        self.dictionary_dir = dictionary_dir
+        self.sync_dir = sync_dir
+        os.makedirs(sync_dir, exist_ok=True)
+        self.replica = load_replica_id(sync_dir)
+        self._logs = {}
+        self._lock = threading.Lock()
+
+    def dictionary_names(self):
+        try:
+            return sorted(name for name in os.listdir(self.dictionary_dir) if is_dictionary_name(name))
+        except OSError:
+            return []
+
+    def log_for(self, name):
+        with self._lock:
+            log = self._logs.get(name)
+            if log is None:
+                log = ChangeLog(os.path.join(self.sync_dir, name + CHANGES_SUFFIX), self.replica)
+                self._logs[name] = log
+            return log
+
+    def _signature(self, name):
+        path = os.path.join(self.dictionary_dir, name)
+        signature = []
+        for p in (path, journal_path_for(path)):
+            try:
+                stat = os.stat(p)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    # 辞書txtが前回から変わっていれば、差をこの端末の操作として記録する
+    def refresh(self, name):
+        log = self.log_for(name)
+        with log.lock:
+            self._refresh_locked(name, log)
+        return log
+
+    def _refresh_locked(self, name, log):
+        log.catch_up()
+        signature = self._signature(name)
+        if signature == log.signature:
+            return
+        path = os.path.join(self.dictionary_dir, name)
+        if os.path.exists(path):
+            log.record_local(read_entries_with_journal(path))
+        log.signature = signature
+
+    # 辞書ごとのバージョンベクトル
+    def vectors(self):
+        return {name: dict(self.refresh(name).vector) for name in self.dictionary_names()}
+
+    # 受け取った操作の行（ファイルなど行のイテラブル）を記録し、辞書txtを書き直す
+    # 先にこの端末での編集を記録してから当てはめるので、まだ同期していない編集も消えない
+    # (追加件数, 削除件数) を返す
+    def apply_lines(self, name, lines):
+        if not is_dictionary_name(name):
+            raise SyncError(f"辞書の名前が正しくありません: {name}")
+        log = self.log_for(name)
+        with log.lock:
+            self._refresh_locked(name, log)
+            flipped = []
+            batch = []
+            error = None
+            for line in lines:
+                change = parse_change(line)
+                if change is None:
+                    # 記録済みの分は辞書txtにも反映しておく（履歴とtxtがずれると、次の記録でこの端末の削除と見なされる）
+                    error = SyncError(f"{name}: 変更履歴の形式が正しくありません")
+                    break
+                batch.append(change)
+                if len(batch) >= APPLY_BATCH:
+                    flipped += log.apply(batch)
+                    batch = []
+            flipped += log.apply(batch)
+            if flipped:
+                result = self._write_dictionary(name, log, flipped)
+            if error is not None:
+                raise error
+            return result if flipped else (0, 0)
+
+    def _write_dictionary(self, name, log, flipped):
+        path = os.path.join(self.dictionary_dir, name)
+        entries = read_entries_with_journal(path) if os.path.exists(path) else []
+        present = log.present()
+        # 今の並び順を保ち、増えたものは末尾に足す
+        kept = [entry for entry in entries if entry in present]
+        kept_set = set(kept)
+        added = list(dict.fromkeys(entry for op, entry in flipped if op == OP_ADD and entry in present and entry not in kept_set))
+        DictionaryJournal(path).compact(kept + added)
+        log.signature = self._signature(name)
+        return len(added), len(entries) - len(kept)
+
+
+# 相手から送られてきた名前をそのままパスに使ってよいか
+def is_dictionary_name(name):
+    return name.endswith(".txt") and not name.startswith(".") and os.path.basename(name) == name and "\\" not in name
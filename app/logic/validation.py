@@ -0,0 +1,299 @@
+# 辞書エントリのチェックと正規化
+# エクスポートの前などに辞書全体を1回なめて、行ごとの問題をまとめて返す（テーブルで色分けする）。
+#   ・正規化: 全角英数→半角、半角カナ→全角、読みのカタカナ→ひらがな、前後の空白・タブ・改行
+#   ・読みがひらがなだけか、空の項目がないか
+#   ・タブ・改行などの制御文字（txtやTSVの列が崩れる）
+#   ・Shift_JISで書き出す形式（MS-IME/ATOK）で表せない文字
+#   ・同じ読み・表記の重複と、品詞だけが違うもの（衝突）
+# 1行ずつ関数を呼ぶと大きな辞書で遅いので、チャンク内の文字列をつなげて正規表現やエンコードを一度にかけ、
+# 引っかかったチャンクだけ1行ずつ調べ直す。件数が多ければチャンクを複数のプロセスで並行して調べる。
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress, islice
+from operator import ne
+
+from logic.dictionary_manager import EXPORT_FORMATS
+from logic.entry_store import HINSHI_LIST
+from logic.instrumentation import span
+
+LEVEL_ERROR = "error"
+LEVEL_WARNING = "warning"
+
+# 1チャンクの行数と、複数プロセスで調べ始める件数
+CHUNK_ROWS = 50000
+PARALLEL_MIN_ROWS = 200000
+
+# 読みに使える文字（ひらがなと長音）
+_NOT_YOMI = re.compile(r"[^ぁ-ゖゝゞー]")
+_CONTROL = re.compile(r"[\x00-\x1f\x7f]")
+# 表記で正規化する範囲（全角英数記号・半角カナ）。①や㈱などはそのまま残す
+_HYOUKI_NORMALIZE = re.compile(r"[！-～｡-ﾟ]+")
+_KATAKANA = re.compile(r"[ァ-ヶヽヾ]")
+_SPACES = re.compile(r"[\s\x00-\x1f\x7f]+")
+_CONTROL_RUN = re.compile(r"[\x00-\x1f\x7f]+")
+# 改行でつないだ表記の、各行の前後の空白
+_EDGE_SPACE = re.compile(r"(?m)^[^\S\n]|[^\S\n]$")
+_KNOWN_HINSHI = set(HINSHI_LIST)
+
+
+class Issue:
+    # formatsはその形式で書き出すときだけ問題になる場合の形式名のリスト（Noneなら全形式）
+    # fixableは正規化で直る問題
+    def __init__(self, row, level, code, message, formats=None, fixable=False):
+        self.row = row
+        self.level = level
+        self.code = code
+        self.message = message
+        self.formats = formats
+        self.fixable = fixable
+
+    def applies_to(self, format_names):
+        return self.formats is None or any(name in self.formats for name in format_names)
+
+
+class ValidationReport:
+    def __init__(self, total):
+        self.total = total
+        # 行番号 -> [Issue]
+        self.issues = {}
+        # 行番号 -> 正規化後のエントリ（変わる行だけ）
+        self.normalized = {}
+
+    def add(self, issue):
+        self.issues.setdefault(issue.row, []).append(issue)
+
+    def __bool__(self):
+        return bool(self.issues)
+
+    # 行のいちばん重い問題の重さ
+    def level_of(self, row):
+        issues = self.issues.get(row)
+        if not issues:
+            return None
+        return LEVEL_ERROR if any(issue.level == LEVEL_ERROR for issue in issues) else LEVEL_WARNING
+
+    def message_of(self, row):
+        return "\n".join(issue.message for issue in self.issues.get(row, []))
+
+    def error_rows(self, format_names=None):
+        format_names = list(EXPORT_FORMATS) if format_names is None else format_names
+        return sorted(
+            row for row, issues in self.issues.items()
+            if any(issue.level == LEVEL_ERROR and issue.applies_to(format_names) for issue in issues)
+        )
+
+    # 形式ごとに書き出せない行（DictionaryManager.exportのskip_rowsに渡す）
+    def skip_rows(self, format_names):
+        return {
+            name: {
+                row for row, issues in self.issues.items()
+                if any(issue.level == LEVEL_ERROR and issue.applies_to([name]) for issue in issues)
+            }
+            for name in format_names
+        }
+
+    def fixable_count(self):
+        return sum(1 for issues in self.issues.values() if any(issue.fixable for issue in issues))
+
+    # 正規化で行う変更を、後ろの行から順に (行番号, 新しいエントリ) で返す（エントリがNoneなら削除）
+    # 後ろから順に適用すれば、途中で行番号がずれない
+    def fix_plan(self):
+        duplicates = {
+            row for row, issues in self.issues.items() if any(issue.code == "duplicate" for issue in issues)
+        }
+        plan = [(row, None) for row in duplicates]
+        plan.extend((row, entry) for row, entry in self.normalized.items() if row not in duplicates)
+        plan.sort(key=lambda item: item[0], reverse=True)
+        return plan
+
+    def counts(self):
+        counts = {}
+        for issues in self.issues.values():
+            for issue in issues:
+                counts[issue.code] = counts.get(issue.code, 0) + 1
+        return counts
+
+    def summary(self):
+        if not self.issues:
+            return f"{self.total}件: 問題はありません"
+        labels = {
+            "empty": "空の項目", "control": "タブ・改行", "yomi": "ひらがな以外の読み", "encoding": "文字コード",
+            "normalize": "正規化できる", "duplicate": "重複", "conflict": "品詞違い", "hinshi": "不明な品詞",
+        }
+        counts = self.counts()
+        detail = "、".join(f"{labels.get(code, code)} {n}件" for code, n in counts.items())
+        return f"{self.total}件中 {len(self.issues)}行に問題: {detail}"
+
+
+# 読みの正規化: NFKC（半角カナ・全角英数・全角スペース）→カタカナをひらがなに→空白を取り除く
+def normalize_yomi(yomi):
+    yomi = unicodedata.normalize("NFKC", yomi)
+    yomi = _KATAKANA.sub(lambda m: chr(ord(m.group()) - 0x60), yomi)
+    return _SPACES.sub("", yomi)
+
+
+# 表記の正規化: 全角英数・半角カナだけNFKCにし、タブ・改行などは空白1つにして前後を詰める
+def normalize_hyouki(hyouki):
+    hyouki = _HYOUKI_NORMALIZE.sub(lambda m: unicodedata.normalize("NFKC", m.group()), hyouki)
+    return _CONTROL_RUN.sub(" ", hyouki).strip()
+
+
+def normalize_entry(entry):
+    yomi, hyouki, hinshi = entry
+    return (normalize_yomi(yomi), normalize_hyouki(hyouki), hinshi.strip())
+
+
+# Shift_JISなど、UTF-8以外で書き出す形式を文字コードごとにまとめる（{文字コード: (形式名のリスト, 表示名)}）
+# 別プロセスではプラグインの形式が登録されていないので、表示名もここで作って渡す
+def _export_encodings():
+    format_names = {}
+    for name, export_format in EXPORT_FORMATS.items():
+        if export_format.encoding.replace("-", "").lower() not in ("utf8", "utf8sig"):
+            format_names.setdefault(export_format.encoding, []).append(name)
+    return {
+        encoding: (names, "・".join(EXPORT_FORMATS[name].label for name in names))
+        for encoding, names in format_names.items()
+    }
+
+
+# 1行分のチェック（正規化はしない）。Issueのリストを返す
+def check_entry(entry, row=0, encodings=None):
+    yomi, hyouki, hinshi = entry
+    encodings = _export_encodings() if encodings is None else encodings
+    issues = []
+    if not yomi or not hyouki or not hinshi:
+        issues.append(Issue(row, LEVEL_ERROR, "empty", "空の項目があります"))
+    if _CONTROL.search(yomi) or _CONTROL.search(hyouki) or _CONTROL.search(hinshi):
+        issues.append(Issue(row, LEVEL_ERROR, "control", "タブや改行が含まれています"))
+    if _NOT_YOMI.search(yomi):
+        issues.append(Issue(row, LEVEL_ERROR, "yomi", "読みにひらがな以外の文字があります"))
+    if hinshi not in _KNOWN_HINSHI:
+        issues.append(Issue(row, LEVEL_WARNING, "hinshi", f"不明な品詞です: {hinshi}"))
+    for encoding, (format_names, labels) in encodings.items():
+        try:
+            (yomi + hyouki + hinshi).encode(encoding)
+        except UnicodeEncodeError as e:
+            issues.append(Issue(
+                row, LEVEL_ERROR, "encoding", f"{labels}で書き出せない文字があります: {e.object[e.start:e.end]}",
+                formats=format_names,
+            ))
+    return issues
+
+
+# 全行がpatternに引っかからなければ、つなげた文字列1回の検索で済ませる
+def _any_match(pattern, values):
+    return pattern.search("".join(values)) is not None
+
+
+def _all_encodable(texts, encoding):
+    try:
+        "".join(texts).encode(encoding)
+        return True
+    except UnicodeEncodeError:
+        return False
+
+
+# チャンク（start行目から）を調べて (Issueのリスト, {行番号: 正規化後のエントリ}) を返す
+# 別プロセスでも呼べるよう、モジュールの関数にしておく
+def _check_chunk(start, entries, encodings):
+    yomis = [entry[0] for entry in entries]
+    hyoukis = [entry[1] for entry in entries]
+    hinshis = [entry[2] for entry in entries]
+
+    # まとめて調べて、問題のありそうなチャンクだけ1行ずつ見る
+    suspicious = (
+        not all(yomis) or not all(hyoukis)
+        or _any_match(_CONTROL, yomis) or _any_match(_CONTROL, hyoukis)
+        or _any_match(_NOT_YOMI, yomis)
+        or not _KNOWN_HINSHI.issuperset(hinshis)
+        or not all(
+            _all_encodable(yomis, encoding) and _all_encodable(hyoukis, encoding) and _all_encodable(set(hinshis), encoding)
+            for encoding in encodings
+        )
+    )
+    needs_normalize = (
+        suspicious
+        or not unicodedata.is_normalized("NFKC", "".join(yomis))
+        or _any_match(_HYOUKI_NORMALIZE, hyoukis)
+        or _EDGE_SPACE.search("\n".join(hyoukis)) is not None
+    )
+
+    issues = []
+    normalized = {}
+    if not suspicious and not needs_normalize:
+        return issues, normalized
+    for i, entry in enumerate(entries):
+        row = start + i
+        row_issues = check_entry(entry, row, encodings) if suspicious else []
+        fixed = normalize_entry(entry) if needs_normalize else entry
+        if fixed != entry:
+            normalized[row] = fixed
+            remaining = {issue.code for issue in check_entry(fixed, row, encodings)}
+            for issue in row_issues:
+                issue.fixable = issue.code not in remaining
+            issues.append(Issue(row, LEVEL_WARNING, "normalize", f"正規化すると「{fixed[0]}」「{fixed[1]}」になります", fixable=True))
+        issues.extend(row_issues)
+    return issues, normalized
+
+
+def _chunks(entries, size):
+    it = iter(entries)
+    start = 0
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+# 辞書全体を調べてValidationReportを返す
+# parallelがNoneなら件数で決める（多ければプロセスを分けて並行して調べる）
+def validate_entries(entries, parallel=None, max_workers=None):
+    total = len(entries)
+    report = ValidationReport(total)
+    encodings = _export_encodings()
+    if parallel is None:
+        parallel = total >= PARALLEL_MIN_ROWS
+    with span("validate", entries=total, parallel=parallel):
+        # EntryStoreからの取り出しは1回だけにして、重複のチェックにも使い回す
+        chunks = list(_chunks(entries, CHUNK_ROWS))
+        if parallel and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=max_workers or min(os.cpu_count() or 1, 8)) as executor:
+                futures = [executor.submit(_check_chunk, start, chunk, encodings) for start, chunk in chunks]
+                results = [future.result() for future in futures]
+        else:
+            results = [_check_chunk(start, chunk, encodings) for start, chunk in chunks]
+        for issues, normalized in results:
+            for issue in issues:
+                report.add(issue)
+            report.normalized.update(normalized)
+        _check_duplicates(chunks, report)
+    return report
+
+
+# 正規化後の (読み, 表記) で重複と品詞違いを探す
+def _check_duplicates(chunks, report):
+    keys = []
+    hinshis = []
+    for _, chunk in chunks:
+        keys.extend([(yomi, hyouki) for yomi, hyouki, _ in chunk])
+        hinshis.extend([hinshi for _, _, hinshi in chunk])
+    for row, (yomi, hyouki, hinshi) in report.normalized.items():
+        keys[row] = (yomi, hyouki)
+        hinshis[row] = hinshi
+    # 後ろから詰めると、各キーに最初に出てきた行番号が残る
+    rows = range(len(keys))
+    first_rows = dict(zip(reversed(keys), reversed(rows)))
+    if len(first_rows) == len(keys):
+        return
+    # 最初の行番号が自分と違う行だけを取り出す（1行ずつのループはPythonで回さない）
+    firsts = list(map(first_rows.__getitem__, keys))
+    for row in compress(rows, map(ne, firsts, rows)):
+        first = firsts[row]
+        if hinshis[first] == hinshis[row]:
+            report.add(Issue(row, LEVEL_WARNING, "duplicate", f"{first + 1}行目と重複しています", fixable=True))
+        else:
+            report.add(Issue(row, LEVEL_WARNING, "conflict", f"{first + 1}行目と品詞だけが違います（{hinshis[first]}）"))
@@ -1,10 +1,13 @@
 import sys
 import os
+import multiprocessing
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from PyQt6.QtWidgets import QApplication
 from ui.main_window import MainWindow
 
 if __name__ == "__main__":
+    # 辞書の取り込みでプロセスプールを使うため（exe化したときに必要）
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow("dictionaries")
     window.show()
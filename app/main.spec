@@ -6,7 +6,11 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('..\\venv\\Lib\\site-packages\\PyQt6\\Qt6\\bin', 'PyQt6\\Qt6\\bin')],
-    hiddenimports=[],
+    # logic.plugins で "モジュール名:属性名" として登録し、使うときに読み込むもの（静的な解析では見つからない）
+    hiddenimports=[
+        'logic.formats.tsv', 'logic.formats.atok', 'logic.formats.skk',
+        'ui.clipboard_share', 'ui.qr_dialog', 'ui.lan_sync_dialog',
+    ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,129 @@
+# クリップボードでの辞書の共有（共有プラグイン「clipboard_copy」「clipboard_paste」）
+# 圧縮・差分の処理（share_codec）はここで初めて読み込む
+import os
+
+from PyQt6.QtWidgets import QApplication, QMessageBox
+
+from logic.edit_commands import InsertCommand, RemoveCommand
+from logic.entry_store import EntryStore
+from logic.journal import DictionaryJournal, read_entries_with_journal
+from logic.search_index import EntryIndex
+from logic.share_codec import (
+    MODE_DELTA, ShareFormatError, content_hash, decode_share, encode_delta, encode_full,
+    load_snapshot, plan_delta, save_snapshot
+)
+
+
+# クリップボードに辞書テキストをコピー（圧縮形式。前回共有した内容があれば差分だけにもできる）
+def export_to_clipboard(window):
+    if not window.entries or not window.current_file:
+        QMessageBox.warning(window, "共有失敗", "エクスポートする辞書ファイルを選択してください。")
+        return
+    if window.is_loading():
+        QMessageBox.warning(window, "共有失敗", "辞書ファイルの読み込みが終わるまでお待ちください。")
+        return
+
+    file_name = os.path.basename(window.current_file)
+    text = encode_full(file_name, window.entries)
+    base_entries = load_snapshot(window.share_snapshot_dir, file_name)
+    if base_entries is not None:
+        delta_text, added, removed = encode_delta(file_name, base_entries, window.entries)
+        if len(delta_text) < len(text):
+            ret = QMessageBox.question(
+                window, "差分で共有",
+                f"前回共有したときからの差分（追加 {added}件・削除 {removed}件）だけをコピーしますか？\n"
+                "「いいえ」を選ぶと辞書全体をコピーします。",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if ret == QMessageBox.StandardButton.Yes:
+                text = delta_text
+
+    clipboard = QApplication.clipboard()
+    clipboard.setText(text)
+    # 次回の差分共有のために、今回共有した内容を覚えておく
+    save_snapshot(window.share_snapshot_dir, file_name, window.entries)
+    QMessageBox.information(window, "コピー完了", f"{file_name} と辞書データをクリップボードにコピーしました。（{len(text)}文字）")
+
+
+# クリップボードから読み込み
+def import_from_clipboard(window):
+    clipboard = QApplication.clipboard()
+    text = clipboard.text()
+    if not text:
+        QMessageBox.warning(window, "貼り付け失敗", "クリップボードにテキストがありません。")
+        return
+
+    try:
+        payload = decode_share(text)
+    except ShareFormatError as e:
+        QMessageBox.warning(window, "貼り付け失敗", str(e))
+        return
+    file_name = os.path.basename(payload.file_name)
+    target_file = os.path.join(window.dictionary_dir, file_name)
+    if payload.mode == MODE_DELTA:
+        apply_shared_delta(window, payload, target_file)
+        return
+
+    new_entries = payload.entries
+    if not new_entries:
+        QMessageBox.warning(window, "貼り付け失敗", "有効な辞書データが見つかりませんでした。")
+        return
+
+    ret = QMessageBox.question(
+        window, "辞書データ読み込み",
+        f"{file_name} に {len(new_entries)} 件のデータを上書き保存します。よろしいですか？",
+        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+    )
+    if ret != QMessageBox.StandardButton.Yes:
+        return
+
+    window.close_current_file()
+    window.open_file(target_file)
+    window.entries = EntryStore(new_entries)
+    window.index = EntryIndex.from_store(window.entries)
+    window.save_current_file()
+    window.refresh_table()
+    window.refresh_file_list()
+
+    QMessageBox.information(window, "読み込み完了", f"{file_name} を作成または上書きし、辞書データをインポートしました。")
+
+
+# 差分形式の共有データを、ファイルを書き直さずにジャーナルとして当てはめる
+def apply_shared_delta(window, payload, target_file):
+    file_name = os.path.basename(target_file)
+    if not os.path.exists(target_file):
+        QMessageBox.warning(window, "貼り付け失敗", f"差分を当てはめる元の辞書 {file_name} がありません。先に辞書全体を共有してもらってください。")
+        return
+    is_current = window.current_file is not None and os.path.abspath(window.current_file) == os.path.abspath(target_file)
+    if is_current and window.is_loading():
+        QMessageBox.warning(window, "貼り付け失敗", "辞書ファイルの読み込みが終わるまでお待ちください。")
+        return
+    entries = window.entries if is_current else read_entries_with_journal(target_file)
+
+    message = f"{file_name} に差分（追加 {len(payload.added)}件・削除 {len(payload.removed)}件）を反映します。よろしいですか？"
+    if content_hash(entries) != payload.base_hash:
+        message = "この辞書は共有元が差分を作ったときの内容と一致しません。\n" + message
+    ret = QMessageBox.question(
+        window, "差分の読み込み", message,
+        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+    )
+    if ret != QMessageBox.StandardButton.Yes:
+        return
+
+    rows, to_add = plan_delta(entries, payload.added, payload.removed)
+    if is_current:
+        with window.undo_stack.transaction("差分の反映"):
+            for row in rows:
+                window.undo_stack.execute(RemoveCommand(row))
+            for entry in to_add:
+                window.undo_stack.execute(InsertCommand(len(window.entries), entry))
+    else:
+        journal = DictionaryJournal(target_file)
+        for row in rows:
+            del entries[row]
+            journal.record_delete(row)
+        for entry in to_add:
+            entries.append(entry)
+            journal.record_add(entry)
+        journal.close()
+    QMessageBox.information(window, "読み込み完了", f"{file_name} に差分を反映しました。（追加 {len(to_add)}件・削除 {len(rows)}件）")
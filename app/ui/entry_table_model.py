@@ -0,0 +1,142 @@
+# 単語一覧テーブル用のモデル
+# QTableWidgetItemを作らず、エントリのリストを直接参照して表示する
+# 検索中は表示する行番号のリスト（rows）を通して見せる
+# チェックで問題が見つかった行は、エントリのIDごとに色とツールチップを付ける
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QColor
+
+
+class EntryTableModel(QAbstractTableModel):
+    HEADERS = ["読み", "表記", "品詞"]
+    ISSUE_COLORS = {"error": QColor(255, 205, 205), "warning": QColor(255, 243, 196)}
+
+    def __init__(self, entries=None, parent=None):
+        super().__init__(parent)
+        self.entries = entries if entries is not None else []
+        self.rows = None
+        # エントリのID -> (重さ, メッセージ)
+        self.issues = {}
+        self._batch_depth = 0
+
+    # Qtから呼ばれる部分
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self.rows is not None:
+            return len(self.rows)
+        return len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.entries[self.source_row(index.row())][index.column()]
+        if self.issues and role in (Qt.ItemDataRole.BackgroundRole, Qt.ItemDataRole.ToolTipRole):
+            issue = self.issues.get(self.entries.id_at(self.source_row(index.row())))
+            if issue is None:
+                return None
+            return self.ISSUE_COLORS[issue[0]] if role == Qt.ItemDataRole.BackgroundRole else issue[1]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return self.source_row(section) + 1
+
+    # 表示上の行番号をエントリの行番号に変換
+    def source_row(self, row):
+        if self.rows is not None:
+            return self.rows[row]
+        return row
+
+    # 検索結果の行だけを表示する（Noneで解除）
+    def set_filter(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    # エントリ全体の差し替え（ファイル読み込み時など）
+    def set_entries(self, entries):
+        self.beginResetModel()
+        self.entries = entries
+        self.rows = None
+        self.issues = {}
+        self.endResetModel()
+
+    # チェック結果の色付け（{エントリのID: (重さ, メッセージ)}、空で解除）
+    def set_issues(self, issues):
+        self.issues = issues
+        if self.rowCount():
+            self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, len(self.HEADERS) - 1))
+
+    # まとめて変更する間は行ごとのシグナルを出さず、end_batchで1回だけ表示し直す
+    def begin_batch(self):
+        self._batch_depth += 1
+
+    def end_batch(self):
+        self._batch_depth -= 1
+        if self._batch_depth == 0 and self.rows is None:
+            self.beginResetModel()
+            self.endResetModel()
+
+    def _silent(self):
+        return self.rows is not None or self._batch_depth > 0
+
+    # 以下の変更系は、検索中・まとめて変更中はデータだけ変えてシグナルを出さない
+    # （呼び出し側がすぐにset_filterやend_batchで表示し直す）
+
+    # 1行追加
+    def append_entry(self, entry):
+        if self._silent():
+            self.entries.append(entry)
+            return
+        row = len(self.entries)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.entries.append(entry)
+        self.endInsertRows()
+
+    # まとめて追加（分割読み込み時など）
+    def extend_entries(self, entries):
+        if not entries:
+            return
+        if self._silent():
+            self.entries.extend(entries)
+            return
+        row = len(self.entries)
+        self.beginInsertRows(QModelIndex(), row, row + len(entries) - 1)
+        self.entries.extend(entries)
+        self.endInsertRows()
+
+    # 途中に1行挿入（entry_idを指定するとそのIDで戻す）
+    def insert_entry(self, row, entry, entry_id=None):
+        if self._silent():
+            self.entries.insert(row, entry, entry_id)
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.entries.insert(row, entry, entry_id)
+        self.endInsertRows()
+
+    # 1行削除
+    def remove_entry(self, row):
+        if self._silent():
+            del self.entries[row]
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.entries[row]
+        self.endRemoveRows()
+
+    # 1行更新（書き換えた行の色付けは外す）
+    def update_entry(self, row, entry):
+        self.entries[row] = entry
+        if self.issues:
+            self.issues.pop(self.entries.id_at(row), None)
+        if self._silent():
+            return
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
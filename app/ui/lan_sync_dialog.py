@@ -0,0 +1,239 @@
+# LAN同期の画面（共有プラグイン「lan_sync」）
+# 「公開する」でこの端末の辞書の変更を配り、相手のアドレスを入れて「取り込む」で相手の変更を受け取る。
+# 通信は別スレッドのasyncioで行い、受け取った変更の当てはめ（辞書txtの書き直し）は編集を保存してから画面のスレッドで行う。
+# 公開は既定でこのPCの中だけ。LANに公開するときは確認し、相手には表示した合言葉を伝えて入れてもらう。
+import asyncio
+import socket
+
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtWidgets import (
+    QApplication, QComboBox, QDialog, QHBoxLayout, QLabel, QLineEdit, QMessageBox, QPushButton, QSpinBox, QVBoxLayout
+)
+
+from logic.lan_sync import (
+    DEFAULT_PORT, LAN_HOST, LOCAL_HOST, SyncServer, apply_spools, fetch_all, load_pairing_token, parse_address
+)
+from logic.sync_log import SyncError, SyncFolder
+
+
+def show_lan_sync(window):
+    if window.sync_folder is None:
+        window.sync_folder = SyncFolder(window.dictionary_dir, window.sync_dir)
+    dlg = LanSyncDialog(window)
+    dlg.exec()
+
+
+# ほかの端末から見えるこのPCのアドレス（UDPなので実際には何も送らない）
+def local_address():
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("192.0.2.1", 9))
+            return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+
+
+# 変更を配るサーバー。画面を閉じても、アプリを終了するまで動かしておく
+class SyncServerThread(QThread):
+    serving = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, sync_folder, token, host, port, parent=None):
+        super().__init__(parent)
+        self.server = SyncServer(sync_folder, token, host, port)
+        self.loop = asyncio.new_event_loop()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.server.start())
+        except OSError as e:
+            self.failed.emit(str(e))
+            self.loop.close()
+            return
+        self.serving.emit(self.server.port)
+        self.loop.run_forever()
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+
+    def stop(self):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.wait()
+
+
+# 相手の変更を一時ファイルに受け取る
+class SyncPullThread(QThread):
+    fetched = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, sync_folder, host, port, token, parent=None):
+        super().__init__(parent)
+        self.sync_folder = sync_folder
+        self.host = host
+        self.port = port
+        self.token = token
+
+    def run(self):
+        try:
+            spools = asyncio.run(fetch_all(self.sync_folder, self.host, self.port, self.token))
+        except SyncError as e:
+            self.failed.emit(str(e))
+            return
+        self.fetched.emit(spools)
+
+
+class LanSyncDialog(QDialog):
+    def __init__(self, window):
+        super().__init__(window)
+        self.main_window = window
+        self.pull_thread = None
+        self.setWindowTitle("LAN同期")
+        self.setMinimumWidth(380)
+
+        self.server_label = QLabel()
+        self.server_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        self.host_combo = QComboBox()
+        self.host_combo.addItem("このPCの中だけ", LOCAL_HOST)
+        self.host_combo.addItem("LANのほかの端末にも", LAN_HOST)
+        self.port_input = QSpinBox()
+        self.port_input.setRange(1024, 65535)
+        self.port_input.setValue(DEFAULT_PORT)
+        self.serve_button = QPushButton()
+        self.serve_button.clicked.connect(self.toggle_server)
+
+        serve_row = QHBoxLayout()
+        serve_row.addWidget(self.host_combo)
+        serve_row.addWidget(QLabel("ポート"))
+        serve_row.addWidget(self.port_input)
+        serve_row.addWidget(self.serve_button)
+
+        self.address_input = QLineEdit()
+        self.address_input.setPlaceholderText(f"相手のアドレス（例: 192.168.0.10:{DEFAULT_PORT}）")
+        self.token_input = QLineEdit()
+        self.token_input.setPlaceholderText("相手の合言葉")
+        self.token_input.setMaximumWidth(120)
+        self.pull_button = QPushButton("取り込む")
+        self.pull_button.clicked.connect(self.pull)
+        self.address_input.returnPressed.connect(self.pull)
+        self.token_input.returnPressed.connect(self.pull)
+
+        pull_row = QHBoxLayout()
+        pull_row.addWidget(self.address_input)
+        pull_row.addWidget(self.token_input)
+        pull_row.addWidget(self.pull_button)
+
+        self.status_label = QLabel()
+        self.status_label.setWordWrap(True)
+
+        close_button = QPushButton("閉じる")
+        close_button.clicked.connect(self.accept)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("この端末の辞書を公開する"))
+        layout.addLayout(serve_row)
+        layout.addWidget(self.server_label)
+        layout.addWidget(QLabel("相手の辞書の変更を取り込む（お互いに取り込むと同じ内容になります）"))
+        layout.addLayout(pull_row)
+        layout.addWidget(self.status_label)
+        layout.addWidget(close_button, alignment=Qt.AlignmentFlag.AlignRight)
+        self.setLayout(layout)
+        self.update_server_state()
+
+    def update_server_state(self, port=None):
+        server = self.main_window.sync_server
+        running = server is not None
+        self.serve_button.setText("公開をやめる" if running else "公開する")
+        self.port_input.setEnabled(not running)
+        self.host_combo.setEnabled(not running)
+        if not running:
+            self.server_label.setText("公開していません")
+        elif port is not None or server.isRunning():
+            address = local_address() if server.server.host == LAN_HOST else server.server.host
+            self.server_label.setText(f"公開中: {address}:{server.server.port}　合言葉: {server.server.token}")
+
+    def toggle_server(self):
+        if self.main_window.sync_server is not None:
+            self.main_window.sync_server.stop()
+            self.main_window.sync_server = None
+            self.update_server_state()
+            return
+        host = self.host_combo.currentData()
+        if host == LAN_HOST:
+            ret = QMessageBox.question(
+                self, "LANに公開",
+                "同じネットワークにいるほかの端末から、このPCに接続できるようになります。\n"
+                "合言葉を知っている相手は辞書の内容をすべて受け取れるので、信頼できるネットワークでだけ公開してください。\n\n公開しますか？",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No
+            )
+            if ret != QMessageBox.StandardButton.Yes:
+                return
+        token = load_pairing_token(self.main_window.sync_folder.sync_dir)
+        thread = SyncServerThread(self.main_window.sync_folder, token, host, self.port_input.value(), self.main_window)
+        thread.serving.connect(self.update_server_state)
+        thread.failed.connect(self.on_server_failed)
+        self.main_window.sync_server = thread
+        thread.start()
+        self.update_server_state()
+
+    def on_server_failed(self, message):
+        self.main_window.sync_server = None
+        self.update_server_state()
+        QMessageBox.warning(self, "公開失敗", f"ポート {self.port_input.value()} で待ち受けできませんでした。\n{message}")
+
+    def pull(self):
+        if self.pull_thread is not None:
+            return
+        try:
+            host, port = parse_address(self.address_input.text())
+        except SyncError as e:
+            QMessageBox.warning(self, "入力エラー", str(e))
+            return
+        if not host:
+            QMessageBox.warning(self, "入力エラー", "相手のアドレスを入力してください。")
+            return
+        token = self.token_input.text().strip()
+        if not token:
+            QMessageBox.warning(self, "入力エラー", "相手の画面に表示された合言葉を入力してください。")
+            return
+        self.pull_button.setEnabled(False)
+        self.status_label.setText(f"{host}:{port} から受け取り中...")
+        self.pull_thread = SyncPullThread(self.main_window.sync_folder, host, port, token, self)
+        self.pull_thread.fetched.connect(self.on_fetched)
+        self.pull_thread.failed.connect(self.on_pull_failed)
+        self.pull_thread.finished.connect(self.on_pull_finished)
+        self.pull_thread.start()
+
+    # 受け取った変更を当てはめる。開いている辞書に未反映の編集があれば先に保存しておき、書き直した分は監視で読み直される
+    def on_fetched(self, spools):
+        if not spools:
+            self.status_label.setText("新しい変更はありません")
+            return
+        journal = self.main_window.journal
+        if journal is not None and journal.has_pending():
+            self.main_window.save_current_file()
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            results = apply_spools(self.main_window.sync_folder, spools)
+        except (OSError, UnicodeError, SyncError) as e:
+            self.status_label.setText("")
+            QMessageBox.critical(self, "同期失敗", f"受け取った変更を辞書に反映できませんでした。\n{e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        lines = [f"{name}: 追加 {added}件・削除 {removed}件" for name, (added, removed) in sorted(results.items())]
+        self.status_label.setText("\n".join(lines))
+
+    def on_pull_failed(self, message):
+        self.status_label.setText("")
+        QMessageBox.warning(self, "同期失敗", message)
+
+    def on_pull_finished(self):
+        self.pull_thread = None
+        self.pull_button.setEnabled(True)
+
+    # 受け取り中に閉じた場合は終わるのを待つ（受け取った分はそのあと反映される）
+    def done(self, result):
+        if self.pull_thread is not None:
+            self.pull_thread.wait()
+        super().done(result)
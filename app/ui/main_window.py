@@ -1,21 +1,41 @@
 # 必要な標準ライブラリ・外部ライブラリをインポート
+# 起動を速くするため、一部の機能でしか使わないもの（QRコード・クリップボード共有・バックアップ・マージ・取り込みなど）は
+# 使うときに読み込む。エクスポート・共有の形式はプラグインの登録簿（logic.plugins）からボタンを作る
 import os
-import shutil
-import subprocess
-import qrcode
-from pathlib import Path
-from PIL.ImageQt import ImageQt
-from PIL import Image
+import time
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
-    QTableWidgetItem, QLineEdit, QComboBox, QPushButton, QListWidget,
-    QLabel, QFileDialog, QMessageBox, QInputDialog, QDialog, QSplitter
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTableView,
+    QAbstractItemView, QLineEdit, QComboBox, QPushButton, QListWidget, QListWidgetItem,
+    QLabel, QFileDialog, QMessageBox, QInputDialog, QSplitter,
+    QProgressBar
 )
-from PyQt6.QtGui import QPixmap, QImage
-from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QKeySequence, QShortcut
+from PyQt6.QtCore import Qt, QTimer, QThread, pyqtSignal
+from logic.dictionary_cache import CachedDictionary, cache_path_for, open_cache
+from logic.dictionary_file import read_entries
+from logic.dictionary_manager import DictionaryManager, EXPORT_FORMATS
+from logic.dictionary_watcher import DictionaryWatcher, changed_range
+from logic.edit_commands import InsertCommand, RemoveCommand, UndoStack, UpdateCommand
+from logic.entry_store import EntryStore, HINSHI_LIST
+from logic import instrumentation
+from logic.instrumentation import count, observe, span
+from logic.journal import DictionaryJournal, journal_path_for
+from logic.loader import DictionaryLoader
+from logic.plugins import KIND_SHARE, load_plugin_dir, plugins
+from logic.search_index import EntryIndex
+from logic.validation import LEVEL_ERROR, check_entry, normalize_entry, validate_entries
+from ui.entry_table_model import EntryTableModel
+from ui.metrics_dialog import MetricsDialog, StallMonitor
 
 # メインの画面
 class MainWindow(QWidget):
+    # 最後の編集からこの時間が経ったらコンパクションする
+    COMPACT_IDLE_MSEC = 3000
+    # 外で変更された辞書を読み直すとき、変わった行がこれより多ければ丸ごと入れ替える
+    PARTIAL_RELOAD_MAX_ROWS = 10000
+    # この環境変数が設定されていれば起動時から計測する（値が "log" ならログファイルにも書き出す）
+    METRICS_ENV = "DICTIONARY_APP_METRICS"
+
     def __init__(self, dictionary_dir):
         super().__init__()
         self.setWindowTitle("辞書ファイル管理ツール")
@@ -23,33 +43,88 @@ class MainWindow(QWidget):
         # フォルダパスの設定など
         self.dictionary_dir = os.path.join(dictionary_dir, "base_dictionary")
         self.saved_dir = os.path.join(dictionary_dir, "saved_dictionary")
+        self.cache_dir = os.path.join(dictionary_dir, "cache")
         self.onedrive_dir = os.path.expanduser("~/OneDrive/MyIMEBackup")
+        self.share_snapshot_dir = os.path.join(self.saved_dir, "share_base")
+        self.metrics_log_path = os.path.join(dictionary_dir, "logs", "metrics.jsonl")
+        self.plugin_dir = os.path.join(dictionary_dir, "plugins")
+        self.sync_dir = os.path.join(dictionary_dir, "sync")
 
         os.makedirs(self.dictionary_dir, exist_ok=True)
         os.makedirs(self.saved_dir, exist_ok=True)
         os.makedirs(self.onedrive_dir, exist_ok=True)
 
-        self.entries = []
+        self.dictionary_manager = DictionaryManager(self.saved_dir)
+        self._backup_store = None
+        # LAN同期（画面を開いたときに作る）
+        self.sync_folder = None
+        self.sync_server = None
+
+        self.entries = EntryStore()
+        self._index = EntryIndex(self.entries)
         self.current_file = None
+        self.journal = None
+        self.loader = None
+        # キャッシュから開いたときに裏で検索インデックスを作るスレッド
+        self.index_loader = None
+        self.load_started = None
+        # 編集の取り消し・やり直し（ファイルを切り替えたら空にする）
+        self.undo_stack = UndoStack(self, on_change=self.update_undo_buttons)
+        # 編集中のエントリのID（編集中でなければNone）
+        self.editing_id = None
+
+        # 編集が落ち着いたらジャーナルをtxtに書き戻す
+        self.compact_timer = QTimer(self)
+        self.compact_timer.setSingleShot(True)
+        self.compact_timer.setInterval(self.COMPACT_IDLE_MSEC)
+        self.compact_timer.timeout.connect(self.save_current_file)
+
+        # 辞書フォルダの変更を監視してファイル一覧に反映する
+        self.file_items = {}
+        self.watcher = DictionaryWatcher(self.dictionary_dir, parent=self)
+        self.watcher.files_added.connect(self.on_files_added)
+        self.watcher.files_removed.connect(self.on_files_removed)
+        self.watcher.files_changed.connect(self.on_files_changed)
+
+        # 処理時間の計測（パフォーマンス情報の画面からオン・オフできる）
+        self.stall_monitor = StallMonitor(self)
+        metrics_env = os.environ.get(self.METRICS_ENV)
+        if metrics_env:
+            self.set_metrics_enabled(True, self.metrics_log_path if metrics_env == "log" else None)
+
+        # 追加の形式・共有方法（ボタンを作る前に登録させる）
+        plugin_errors = load_plugin_dir(self.plugin_dir)
 
         self.init_ui()
         self.refresh_file_list()
+        if plugin_errors:
+            QTimer.singleShot(0, lambda: self.warn_plugin_errors(plugin_errors))
+
+    # 読み込めなかったプラグインファイルを知らせる（ほかの機能はそのまま使える）
+    def warn_plugin_errors(self, errors):
+        lines = [f"{os.path.basename(path)}: {e}" for path, e in errors]
+        QMessageBox.warning(self, "プラグイン", "読み込めなかったプラグインがあります:\n" + "\n".join(lines))
 
     # 画面設計
     def init_ui(self):
         # 左側
         # ファイル操作パネル
         self.file_list = QListWidget()
+        self.file_list.setSortingEnabled(True)
         self.file_list.itemSelectionChanged.connect(self.load_selected_file)
 
         # ファイル操作ボタン
         new_file_button = QPushButton("新規辞書ファイル作成")
         remove_file_button = QPushButton("辞書ファイル削除")
         open_folder_button = QPushButton("辞書フォルダを開く")
+        merge_button = QPushButton("辞書をマージ")
+        self.import_button = QPushButton("IMEの辞書を取り込む")
 
         new_file_button.clicked.connect(self.create_new_file)
         remove_file_button.clicked.connect(self.remove_selected_file)
         open_folder_button.clicked.connect(self.open_dictionary_folder)
+        merge_button.clicked.connect(self.merge_files)
+        self.import_button.clicked.connect(self.import_ime_dictionaries)
 
         file_btns = QHBoxLayout()
         file_btns.addWidget(new_file_button)
@@ -64,13 +139,14 @@ class MainWindow(QWidget):
 
         # 品詞は選択
         self.hinshi_combo = QComboBox()
-        self.hinshi_combo.addItems([
-            "名詞", "動詞", "形容詞", "副詞", "連体詞", "接続詞", "感動詞", "記号", "カスタム名詞"
-        ])
+        self.hinshi_combo.addItems(HINSHI_LIST)
 
-        # txtファイルに追加
-        add_button = QPushButton("辞書に追加")
-        add_button.clicked.connect(self.add_entry)
+        # txtファイルに追加（編集中は選んだ行を書き換える）
+        self.add_button = QPushButton("辞書に追加")
+        self.add_button.clicked.connect(self.add_entry)
+        self.cancel_edit_button = QPushButton("編集をやめる")
+        self.cancel_edit_button.clicked.connect(self.cancel_edit)
+        self.cancel_edit_button.hide()
 
         # 入力フォーム
         input_layout = QVBoxLayout()
@@ -80,13 +156,16 @@ class MainWindow(QWidget):
         input_layout.addWidget(self.hyouki_input)
         input_layout.addWidget(QLabel("品詞"))
         input_layout.addWidget(self.hinshi_combo)
-        input_layout.addWidget(add_button)
+        input_layout.addWidget(self.add_button)
+        input_layout.addWidget(self.cancel_edit_button)
 
         left_layout = QVBoxLayout()
         left_layout.addWidget(QLabel("辞書ファイル一覧"))
         left_layout.addWidget(self.file_list)
         left_layout.addLayout(file_btns)
         left_layout.addWidget(open_folder_button)
+        left_layout.addWidget(merge_button)
+        left_layout.addWidget(self.import_button)
         left_layout.addSpacing(20)
         left_layout.addLayout(input_layout)
 
@@ -95,69 +174,99 @@ class MainWindow(QWidget):
         left_widget.setMaximumWidth(300)
 
         # 中央
+        # 検索ボックス
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("検索（読みの前方一致・表記の部分一致）")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.apply_filter)
+
         # 単語一覧テーブル
-        self.table = QTableWidget(0, 3)
-        self.table.setHorizontalHeaderLabels(["読み", "表記", "品詞"])
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        # 行ごとにウィジェットを作らないようモデル/ビューで表示する
+        self.table_model = EntryTableModel(self.entries)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
 
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(header.ResizeMode.Stretch)
         self.table.setMinimumWidth(400)
 
-        # 単語の編集・削除
+        # 単語の編集・削除（削除は複数行まとめて選べる）
         edit_button = QPushButton("編集")
         delete_button = QPushButton("削除")
+        replace_button = QPushButton("置換")
+        check_button = QPushButton("チェック")
+        self.undo_button = QPushButton("元に戻す")
+        self.redo_button = QPushButton("やり直す")
         edit_button.clicked.connect(self.edit_entry)
         delete_button.clicked.connect(self.delete_entry)
+        replace_button.clicked.connect(self.replace_text)
+        check_button.clicked.connect(self.check_entries)
+        self.undo_button.clicked.connect(self.undo_edit)
+        self.redo_button.clicked.connect(self.redo_edit)
+        self.update_undo_buttons()
+
+        QShortcut(QKeySequence.StandardKey.Undo, self, self.undo_edit)
+        QShortcut(QKeySequence.StandardKey.Redo, self, self.redo_edit)
+        QShortcut(QKeySequence.StandardKey.Delete, self.table, self.delete_entry, context=Qt.ShortcutContext.WidgetShortcut)
+        QShortcut(QKeySequence.StandardKey.Paste, self.table, self.paste_entries, context=Qt.ShortcutContext.WidgetShortcut)
 
         table_btns = QHBoxLayout()
         table_btns.addWidget(edit_button)
         table_btns.addWidget(delete_button)
+        table_btns.addWidget(replace_button)
+        table_btns.addWidget(check_button)
+        table_btns.addWidget(self.undo_button)
+        table_btns.addWidget(self.redo_button)
+
+        # 読み込みの進み具合
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 1000)
+        self.load_progress.hide()
 
         center_layout = QVBoxLayout()
+        center_layout.addWidget(self.search_input)
         center_layout.addWidget(self.table)
+        center_layout.addWidget(self.load_progress)
         center_layout.addLayout(table_btns)
 
         center_widget = QWidget()
         center_widget.setLayout(center_layout)
 
         # 右側
-        # エクスポート・バックアップ
-        export_google_button = QPushButton("Google日本語入力 / Mozc 用エクスポート")
-        export_msime_button = QPushButton("Microsoft IME 用エクスポート")
-        export_atok_button = QPushButton("ATOK 用エクスポート")
-        export_skk_button = QPushButton("SKK 用エクスポート")
+        # エクスポート・バックアップ（形式のボタンはプラグインの登録簿から並べる）
+        export_layout = QVBoxLayout()
+        for name in EXPORT_FORMATS:
+            button = QPushButton(f"{EXPORT_FORMATS.label(name)} 用エクスポート")
+            button.clicked.connect(lambda _=False, n=name: self.export_formats([n]))
+            export_layout.addWidget(button)
+        export_all_button = QPushButton("すべての形式でエクスポート")
         backup_onedrive_btn = QPushButton("OneDriveにバックアップ")
         restore_onedrive_btn = QPushButton("OneDriveから復元")
 
-        export_google_button.clicked.connect(self.export_google_mozc)
-        export_msime_button.clicked.connect(self.export_msime)
-        export_atok_button.clicked.connect(self.export_atok)
-        export_skk_button.clicked.connect(self.export_skk)
+        export_all_button.clicked.connect(self.export_all)
         backup_onedrive_btn.clicked.connect(self.backup_to_onedrive)
         restore_onedrive_btn.clicked.connect(self.restore_from_onedrive)
 
-        # 共有用クリップボード・QRコード
-        export_clipboard_button = QPushButton("辞書をクリップボードにコピー")
-        import_clipboard_button = QPushButton("クリップボードから辞書を読み込み")
-        show_qr_button = QPushButton("QRコード表示")
-
-        export_clipboard_button.clicked.connect(self.export_to_clipboard)
-        import_clipboard_button.clicked.connect(self.import_from_clipboard)
-        show_qr_button.clicked.connect(self.show_qr_code)
-
-        export_layout = QVBoxLayout()
-        export_layout.addWidget(export_google_button)
-        export_layout.addWidget(export_msime_button)
-        export_layout.addWidget(export_atok_button)
-        export_layout.addWidget(export_skk_button)
+        export_layout.addWidget(export_all_button)
         export_layout.addWidget(backup_onedrive_btn)
         export_layout.addWidget(restore_onedrive_btn)
-        export_layout.addWidget(export_clipboard_button)
-        export_layout.addWidget(import_clipboard_button)
-        export_layout.addWidget(show_qr_button)
+
+        # 共有用クリップボード・QRコードなど（押したときに初めてモジュールを読み込む）
+        for plugin in plugins(KIND_SHARE):
+            button = QPushButton(plugin.label)
+            button.clicked.connect(lambda _=False, p=plugin: self.run_share_plugin(p))
+            export_layout.addWidget(button)
+
+        # 処理時間の確認用
+        metrics_button = QPushButton("パフォーマンス情報")
+        metrics_button.clicked.connect(self.show_metrics)
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, self.show_metrics)
+
         export_layout.addStretch()
+        export_layout.addWidget(metrics_button)
 
         export_widget = QWidget()
         export_widget.setLayout(export_layout)
@@ -177,88 +286,568 @@ class MainWindow(QWidget):
 
 
     # ここから処理
-    # ファイルリストの更新
+    # ファイルリストの更新（フォルダを走査し直し、変わったところだけ反映する）
     def refresh_file_list(self):
-        self.file_list.clear()
-        for fname in os.listdir(self.dictionary_dir):
-            if fname.endswith(".txt"):
-                self.file_list.addItem(fname)
+        self.watcher.rescan()
+
+    def on_files_added(self, names):
+        for name in names:
+            item = QListWidgetItem(name)
+            self.file_items[name] = item
+            self.file_list.addItem(item)
+
+    def on_files_removed(self, names):
+        for name in names:
+            path = os.path.join(self.dictionary_dir, name)
+            if self.current_file is not None and os.path.abspath(self.current_file) == os.path.abspath(path):
+                if not self.close_removed_file():
+                    continue
+            self.discard_file_data(path)
+            item = self.file_items.pop(name, None)
+            if item is not None:
+                # 選択中の項目なら選択を外してテーブルも空にする（隣の辞書が勝手に開かれないように）
+                if item.isSelected():
+                    self.file_list.setCurrentItem(None)
+                self.file_list.takeItem(self.file_list.row(item))
+
+    def on_files_changed(self, names):
+        for name in names:
+            path = os.path.join(self.dictionary_dir, name)
+            self.remove_cache(path)
+            if self.current_file is not None and os.path.abspath(self.current_file) == os.path.abspath(path):
+                self.reload_current_file()
+
+    # 開いている辞書が外で削除されたとき。未保存の編集があれば残すか選んでもらう
+    # ファイルを書き戻して残した場合はFalse
+    def close_removed_file(self):
+        if self.journal.has_pending() and not self.is_loading():
+            ret = QMessageBox.question(
+                self, "辞書ファイルの削除",
+                f"{os.path.basename(self.current_file)} が削除されましたが、保存していない編集があります。\n"
+                "編集した内容で辞書ファイルを作り直しますか？",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if ret == QMessageBox.StandardButton.Yes:
+                self.save_current_file()
+                return False
+        self.cancel_loading()
+        self.journal.discard()
+        self.journal = None
+        self.compact_timer.stop()
+        self.watcher.watch_file(None)
+        self.current_file = None
+        self.cancel_edit()
+        self.undo_stack.clear()
+        return True
+
+    # 開いている辞書が外で書き換えられたら、変わった部分だけ読み直す
+    def reload_current_file(self):
+        if self.is_loading():
+            self.load_selected_file()
+            return
+        if self.journal.has_pending():
+            ret = QMessageBox.question(
+                self, "辞書ファイルの変更",
+                f"{os.path.basename(self.current_file)} がアプリの外で変更されましたが、保存していない編集があります。\n"
+                "「はい」で変更後のファイルを読み込み（編集は破棄）、「いいえ」で編集した内容で上書きします。",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if ret != QMessageBox.StandardButton.Yes:
+                self.save_current_file()
+                return
+            self.journal.discard()
+            self.load_selected_file()
+            return
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            new_entries = read_entries(self.current_file)
+        except (OSError, UnicodeDecodeError):
+            # 書き込みの途中などで読めなければ、次の通知で読み直す
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        start, old_end, new_end = changed_range(self.entries, new_entries)
+        replaced = min(old_end, new_end) - start
+        inserts_in_middle = new_end > old_end and old_end < len(self.entries)
+        if start == old_end == new_end:
+            return
+        # 外での変更は取り消しの対象にできないので、履歴は捨てる
+        self.undo_stack.clear()
+        if inserts_in_middle or replaced + abs(old_end - new_end) > self.PARTIAL_RELOAD_MAX_ROWS:
+            # 検索インデックスも作り直しになるので、開き直して読み込みのスレッドに任せる
+            self.load_selected_file()
+            return
+
+        # IDを保ったまま、変わった行の更新・余った行の削除・末尾への追加だけを行う
+        self.ensure_writable()
+        # 検索インデックスは行の中身を読んで位置を探すので、行を変える前に外す
+        for row in range(start, start + replaced):
+            entry_id = self.entries.id_at(row)
+            self.index.remove(entry_id)
+            self.table_model.update_entry(row, new_entries[row])
+            self.index.add(entry_id, new_entries[row][0], new_entries[row][1])
+        for row in range(old_end - 1, start + replaced - 1, -1):
+            self.index.remove(self.entries.id_at(row))
+            self.table_model.remove_entry(row)
+        appended = new_entries[start + replaced:new_end]
+        first = len(self.entries)
+        self.table_model.extend_entries(appended)
+        for offset, (yomi, hyouki, _) in enumerate(appended):
+            self.index.add(self.entries.id_at(first + offset), yomi, hyouki)
+        self.apply_filter()
+
+    # 辞書ファイルに付随するジャーナル・キャッシュを消す
+    def discard_file_data(self, path):
+        if os.path.exists(journal_path_for(path)):
+            os.remove(journal_path_for(path))
+        self.remove_cache(path)
+
+    def remove_cache(self, path):
+        try:
+            os.remove(cache_path_for(self.cache_dir, path))
+        except OSError:
+            # 残っても元のtxtと一致しないので使われない
+            pass
 
     # ファイル選択時の処理
     def load_selected_file(self):
+        self.close_current_file()
+        self.entries = EntryStore()
+        self.index = EntryIndex(self.entries)
+        self.refresh_table()
         items = self.file_list.selectedItems()
         if not items:
-            self.entries = []
-            self.table.setRowCount(0)
-            self.current_file = None
             return
         fname = items[0].text()
-        self.current_file = os.path.join(self.dictionary_dir, fname)
-        self.entries = []
-        with open(self.current_file, encoding="utf-8") as f:
-            for line in f:
-                if line.startswith("!"):
-                    continue
-                parts = line.strip().split('\t')
-                if len(parts) == 3:
-                    self.entries.append(tuple(parts))
-        self.refresh_table()
+        self.open_file(os.path.join(self.dictionary_dir, fname))
+        self.load_started = time.perf_counter()
+
+        # キャッシュが使えればmmapで開いてすぐ表示し、検索インデックスだけ別スレッドで作る（その間も編集・検索はできる）
+        # 使えなければ別スレッドでtxtを読み込み、届いた分から表示する（ついでにキャッシュも作る）
+        # 未反映の編集があれば、別スレッドで読み込んで再生し終えてから表示する
+        cache_path = cache_path_for(self.cache_dir, self.current_file)
+        pending = self.journal.has_pending()
+        cached = None if pending else open_cache(self.current_file, cache_path)
+        count("cache.hit" if cached is not None else "cache.miss")
+        if cached is not None:
+            self.entries = cached
+            self.refresh_table()
+            self.index_loader = DictionaryLoader(self.current_file, parent=self, cached=cached)
+            self.index_loader.loaded.connect(self.on_index_loaded)
+            self.index_loader.finished.connect(self.index_loader.deleteLater)
+            self.index_loader.start()
+            observe("load.total", (time.perf_counter() - self.load_started) * 1000,
+                    file=os.path.basename(self.current_file), entries=len(self.entries), cached=True)
+            return
+        self.loader = DictionaryLoader(self.current_file, parent=self, cache_path=cache_path,
+                                       journal=self.journal if pending else None)
+        self.loader.chunk_loaded.connect(self.on_chunk_loaded)
+        self.loader.progress.connect(self.on_load_progress)
+        self.loader.loaded.connect(self.on_load_finished)
+        self.loader.failed.connect(self.on_load_failed)
+        self.loader.finished.connect(self.loader.deleteLater)
+        self.load_progress.setValue(0)
+        self.load_progress.show()
+        self.search_input.setEnabled(False)
+        self.loader.start()
+
+    # 読み込み中のスレッドを止める
+    def cancel_loading(self):
+        if self.index_loader is not None:
+            self.index_loader.cancel()
+            self.index_loader = None
+        if self.loader is None:
+            return
+        self.loader.cancel()
+        self.loader = None
+        self.load_progress.hide()
+        self.search_input.setEnabled(True)
+
+    def is_loading(self):
+        return self.loader is not None
+
+    # 検索インデックス。キャッシュから開いてまだ作っている途中なら、できあがるまで待つ
+    @property
+    def index(self):
+        if self.index_loader is not None:
+            self.wait_for_index()
+        return self._index
+
+    @index.setter
+    def index(self, index):
+        if self.index_loader is not None:
+            self.index_loader.cancel()
+            self.index_loader = None
+        self._index = index
+
+    def wait_for_index(self):
+        loader = self.index_loader
+        self.index_loader = None
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            loader.wait()
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.set_cached_index(loader.index if loader.index is not None else EntryIndex.from_store(self.entries))
+
+    # 裏で作っていた検索インデックスができた（待っていた場合は受け取り済みなので無視される）
+    def on_index_loaded(self, index, entries):
+        if self.sender() is not self.index_loader:
+            return
+        self.index_loader = None
+        self.set_cached_index(index)
+        self.apply_filter()
+
+    # ensure_writableでEntryStoreに移していても、IDは行番号のままなのでそのまま使える
+    def set_cached_index(self, index):
+        index.store = self.entries
+        self._index = index
+
+    # 以下、古いローダーからのシグナルは無視する
+    def on_chunk_loaded(self, chunk):
+        if self.sender() is not self.loader:
+            return
+        self.table_model.extend_entries(chunk)
 
-    # テーブルを更新
-    def refresh_table(self):
-        self.table.setRowCount(len(self.entries))
-        for i, (yomi, hyouki, hinshi) in enumerate(self.entries):
-            self.table.setItem(i, 0, QTableWidgetItem(yomi))
-            self.table.setItem(i, 1, QTableWidgetItem(hyouki))
-            self.table.setItem(i, 2, QTableWidgetItem(hinshi))
+    def on_load_progress(self, done, total):
+        if self.sender() is not self.loader:
+            return
+        self.load_progress.setValue(int(done * 1000 / total) if total else 1000)
 
-    # ファイルを保存
+    # entriesは、前回保存しきれなかった編集をローダーで再生した場合のEntryStore
+    def on_load_finished(self, index, entries):
+        if self.sender() is not self.loader:
+            return
+        self.loader = None
+        self.load_progress.hide()
+        if entries is not None:
+            self.entries = entries
+            self.refresh_table()
+        index.store = self.entries
+        self.index = index
+        if self.journal.discarded_stale:
+            QMessageBox.warning(
+                self, "未保存の編集",
+                f"{os.path.basename(self.current_file)} が置き換わっていたため、前回保存されなかった編集は反映しませんでした。"
+            )
+        self.search_input.setEnabled(True)
+        self.apply_filter()
+        # 選んでから検索できるようになるまでの時間
+        observe("load.total", (time.perf_counter() - self.load_started) * 1000,
+                file=os.path.basename(self.current_file), entries=len(self.entries),
+                cached=isinstance(self.entries, CachedDictionary))
+
+    def on_load_failed(self, message):
+        if self.sender() is not self.loader:
+            return
+        self.cancel_loading()
+        QMessageBox.critical(self, "読み込み失敗", f"辞書ファイルを読み込めませんでした。\n{message}")
+
+    # 編集対象のファイルを切り替える
+    def open_file(self, path):
+        self.current_file = path
+        self.journal = DictionaryJournal(path)
+        self.watcher.watch_file(path)
+
+    # 開いているファイルの編集を書き戻して閉じる
+    def close_current_file(self):
+        # 読み込み途中のエントリで上書きしないよう、書き戻しは読み込み完了後のみ
+        if self.loader is None and self.journal is not None and self.journal.has_pending():
+            self.save_current_file()
+        self.cancel_loading()
+        if self.journal is not None:
+            self.journal.close()
+        self.compact_timer.stop()
+        self.watcher.watch_file(None)
+        self.current_file = None
+        self.journal = None
+        self.cancel_edit()
+        self.undo_stack.clear()
+        # キャッシュから開いたままなら閉じて、表示も空にする
+        if isinstance(self.entries, CachedDictionary):
+            self.close_cache(self.entries)
+            self.entries = EntryStore()
+            self.index = EntryIndex(self.entries)
+            self.refresh_table()
+
+    # テーブルを更新（エントリを丸ごと差し替えたとき用）
+    def refresh_table(self):
+        with span("table.refresh", rows=len(self.entries)):
+            self.table_model.set_entries(self.entries)
+
+    # 検索ボックスの内容で絞り込む
+    def apply_filter(self):
+        text = self.search_input.text().strip()
+        if not text or self.is_loading():
+            if self.table_model.rows is not None:
+                self.table_model.set_filter(None)
+            return
+        with span("search") as s:
+            rows = [self.entries.position_of(entry_id) for entry_id in self.index.search(text)]
+            self.table_model.set_filter(rows)
+            s.set(hits=len(rows))
+
+    # 選択中の行番号（未選択なら-1）
+    def selected_row(self):
+        index = self.table.currentIndex()
+        if not index.isValid():
+            return -1
+        return self.table_model.source_row(index.row())
+
+    # 選択中の全行の行番号（昇順）
+    def selected_rows(self):
+        return sorted(self.table_model.source_row(index.row()) for index in self.table.selectionModel().selectedRows())
+
+    # キャッシュから開いた辞書は読み取り専用なので、最初の編集の前にEntryStoreへ移す
+    # IDはどちらも先頭からの連番なので、検索インデックスはそのまま使える
+    def ensure_writable(self):
+        if not isinstance(self.entries, CachedDictionary):
+            return
+        cached = self.entries
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            self.entries = EntryStore(cached)
+        finally:
+            QApplication.restoreOverrideCursor()
+        # 中身は同じなので、表示のリセットはせずに参照先だけ差し替える
+        self.table_model.entries = self.entries
+        self.index.store = self.entries
+        self.close_cache(cached)
+
+    # キャッシュのmmapを閉じる（開いたままだと、Windowsではキャッシュを作り直したり消したりできない）
+    # 裏で検索インデックスを作っているスレッドが読んでいる途中なら、止まるのを待ってから閉じる
+    def close_cache(self, cached):
+        for loader in self.findChildren(DictionaryLoader):
+            if loader.cached is cached:
+                loader.cancel()
+                loader.wait()
+        cached.close()
+
+    # 以下はUndoStackから呼ばれる1行ごとの変更（テーブル・検索インデックス・ジャーナルをまとめて更新）
+    # 編集はすべてUndoStack経由で行い、取り消しの行番号がずれないようにする
+    def insert_row(self, row, entry, entry_id=None):
+        self.ensure_writable()
+        self.table_model.insert_entry(row, entry, entry_id)
+        entry_id = self.entries.id_at(row)
+        self.index.add(entry_id, entry[0], entry[1])
+        if row == len(self.entries) - 1:
+            self.journal.record_add(entry)
+        else:
+            self.journal.record_insert(row, entry)
+        return entry_id
+
+    # 検索インデックスは行の中身を読んで位置を探すので、行を変える前に外す
+    def remove_row(self, row):
+        self.ensure_writable()
+        entry = self.entries[row]
+        entry_id = self.entries.id_at(row)
+        self.index.remove(entry_id)
+        self.table_model.remove_entry(row)
+        self.journal.record_delete(row)
+        return entry, entry_id
+
+    def update_row(self, row, entry):
+        self.ensure_writable()
+        old_entry = self.entries[row]
+        entry_id = self.entries.id_at(row)
+        self.index.remove(entry_id)
+        self.table_model.update_entry(row, entry)
+        self.index.add(entry_id, entry[0], entry[1])
+        self.journal.record_update(row, entry)
+        return old_entry
+
+    # トランザクション中は表示の更新とジャーナルのflushを最後の1回にまとめる
+    def begin_batch(self):
+        self.table_model.begin_batch()
+        self.journal.begin_batch()
+
+    def end_batch(self):
+        self.journal.end_batch()
+        self.table_model.end_batch()
+
+    # 1回の操作（トランザクションなら全体）が終わったら、保存の予約と絞り込みの更新を1回だけ行う
+    def after_edit(self):
+        count("edit")
+        self.schedule_save()
+        self.apply_filter()
+
+    # 元に戻す・やり直す
+    def undo_edit(self):
+        if self.current_file and not self.is_loading():
+            self.undo_stack.undo()
+
+    def redo_edit(self):
+        if self.current_file and not self.is_loading():
+            self.undo_stack.redo()
+
+    def update_undo_buttons(self):
+        undo_label = self.undo_stack.undo_label()
+        redo_label = self.undo_stack.redo_label()
+        self.undo_button.setEnabled(undo_label is not None)
+        self.redo_button.setEnabled(redo_label is not None)
+        self.undo_button.setToolTip(f"元に戻す: {undo_label}" if undo_label else "")
+        self.redo_button.setToolTip(f"やり直す: {redo_label}" if redo_label else "")
+
+    # ファイルを保存（txtを丸ごと書き直してジャーナルを空にする）
     def save_current_file(self):
-        if not self.current_file:
+        self.compact_timer.stop()
+        if not self.current_file or self.is_loading():
             return
-        with open(self.current_file, "w", encoding="utf-8") as f:
-            if "ime" in os.path.basename(self.current_file):
-                f.write("!Microsoft IME Dictionary Tool\n")
-            for yomi, hyouki, hinshi in self.entries:
-                f.write(f"{yomi}\t{hyouki}\t{hinshi}\n")
+        try:
+            self.journal.compact(self.entries)
+            # 自分で書き込んだ分は外からの変更として扱わない
+            self.watcher.acknowledge(self.current_file)
+        except OSError as e:
+            QMessageBox.critical(self, "保存失敗", f"辞書ファイルの保存に失敗しました。\n{e}")
+
+    # 編集内容の保存予約（ジャーナルが大きければすぐ書き戻す）
+    def schedule_save(self):
+        if self.journal.should_compact():
+            self.save_current_file()
+        else:
+            self.compact_timer.start()
 
     # 辞書に追加
     def add_entry(self):
-        yomi = self.yomi_input.text().strip()
-        hyouki = self.hyouki_input.text().strip()
-        hinshi = self.hinshi_combo.currentText()
+        yomi, hyouki, hinshi = normalize_entry((self.yomi_input.text(), self.hyouki_input.text(), self.hinshi_combo.currentText()))
         if not yomi or not hyouki or not self.current_file:
             QMessageBox.warning(self, "入力エラー", "ファイル選択・読み・表記の全てを入力してください。")
             return
-        self.entries.append((yomi, hyouki, hinshi))
-        self.save_current_file()
-        self.refresh_table()
+        if self.is_loading():
+            QMessageBox.warning(self, "入力エラー", "辞書ファイルの読み込みが終わるまでお待ちください。")
+            return
+        errors = self.entry_errors((yomi, hyouki, hinshi))
+        if errors:
+            QMessageBox.warning(self, "入力エラー", "\n".join(errors))
+            return
+        if self.editing_id is not None:
+            self.save_edit((yomi, hyouki, hinshi))
+            return
+        if self.index.contains(yomi, hyouki):
+            QMessageBox.warning(self, "登録済み", f"「{yomi}」→「{hyouki}」はすでに登録されています。")
+            return
+        self.undo_stack.execute(InsertCommand(len(self.entries), (yomi, hyouki, hinshi)))
+        self.table.scrollToBottom()
         self.yomi_input.clear()
         self.hyouki_input.clear()
 
-    # 単語編集
+    # 正規化したエントリに残る、どの形式でも困る問題のメッセージ（形式ごとの文字コードはエクスポート時に調べる）
+    def entry_errors(self, entry):
+        return [issue.message for issue in check_entry(entry) if issue.level == LEVEL_ERROR and issue.formats is None]
+
+    # 単語編集（選んだ行を入力欄に出し、「変更を保存」で書き換える。それまでは辞書に手を付けない）
     def edit_entry(self):
-        selected = self.table.currentRow()
+        selected = self.selected_row()
         if selected < 0 or not self.current_file:
             QMessageBox.warning(self, "編集失敗", "編集する行を選択してください。")
             return
+        if self.is_loading():
+            QMessageBox.warning(self, "編集失敗", "辞書ファイルの読み込みが終わるまでお待ちください。")
+            return
         yomi, hyouki, hinshi = self.entries[selected]
         self.yomi_input.setText(yomi)
         self.hyouki_input.setText(hyouki)
         self.hinshi_combo.setCurrentText(hinshi)
-        del self.entries[selected]
-        self.save_current_file()
-        self.refresh_table()
+        self.editing_id = self.entries.id_at(selected)
+        self.add_button.setText("変更を保存")
+        self.cancel_edit_button.show()
+
+    def save_edit(self, entry):
+        row = self.entries.position_of(self.editing_id)
+        if row < 0:
+            QMessageBox.warning(self, "編集失敗", "編集していた行はすでに削除されています。")
+            self.cancel_edit()
+            return
+        old_entry = self.entries[row]
+        if entry[:2] != old_entry[:2] and self.index.contains(entry[0], entry[1]):
+            QMessageBox.warning(self, "登録済み", f"「{entry[0]}」→「{entry[1]}」はすでに登録されています。")
+            return
+        if entry != old_entry:
+            self.undo_stack.execute(UpdateCommand(row, entry))
+        self.cancel_edit()
 
-    # 単語削除
+    def cancel_edit(self):
+        if self.editing_id is None:
+            return
+        self.editing_id = None
+        self.add_button.setText("辞書に追加")
+        self.cancel_edit_button.hide()
+        self.yomi_input.clear()
+        self.hyouki_input.clear()
+
+    # 単語削除（複数行を選んでいれば1回の操作としてまとめて削除）
     def delete_entry(self):
-        selected = self.table.currentRow()
-        if selected < 0 or not self.current_file:
+        rows = self.selected_rows()
+        if not rows or not self.current_file:
             QMessageBox.warning(self, "削除失敗", "削除する行を選択してください。")
             return
-        del self.entries[selected]
-        self.save_current_file()
-        self.refresh_table()
+        if self.is_loading():
+            QMessageBox.warning(self, "削除失敗", "辞書ファイルの読み込みが終わるまでお待ちください。")
+            return
+        if len(rows) == 1:
+            self.undo_stack.execute(RemoveCommand(rows[0]))
+            return
+        with self.undo_stack.transaction(f"{len(rows)}件の削除"):
+            for row in reversed(rows):
+                self.undo_stack.execute(RemoveCommand(row))
+
+    # 読み・表記の文字列をまとめて置き換える（検索中は表示中の行だけ）
+    def replace_text(self):
+        if not self.current_file:
+            QMessageBox.warning(self, "置換失敗", "辞書ファイルを選択してください。")
+            return
+        if self.is_loading():
+            QMessageBox.warning(self, "置換失敗", "辞書ファイルの読み込みが終わるまでお待ちください。")
+            return
+        old, ok = QInputDialog.getText(self, "置換", "置き換える文字列:")
+        if not ok or not old:
+            return
+        new, ok = QInputDialog.getText(self, "置換", f"「{old}」を次の文字列に置き換え:")
+        if not ok:
+            return
+
+        rows = self.table_model.rows if self.table_model.rows is not None else range(len(self.entries))
+        replaced = 0
+        skipped = 0
+        with self.undo_stack.transaction("置換"):
+            for row in list(rows):
+                yomi, hyouki, hinshi = self.entries[row]
+                if old not in yomi and old not in hyouki:
+                    continue
+                entry = normalize_entry((yomi.replace(old, new), hyouki.replace(old, new), hinshi))
+                # 空になるもの・読みがひらがなでなくなるものや、置き換えた結果が他の行と重なるものは変えない
+                if self.entry_errors(entry) or self.index.contains(entry[0], entry[1]):
+                    skipped += 1
+                    continue
+                self.undo_stack.execute(UpdateCommand(row, entry))
+                replaced += 1
+        message = f"{replaced}件を置き換えました。"
+        if skipped:
+            message += f"\n空になる・読みがひらがなでなくなる・重複するため {skipped}件は変更していません。"
+        QMessageBox.information(self, "置換完了", message)
+
+    # クリップボードの「読み<TAB>表記<TAB>品詞」の行をまとめて追加する（Ctrl+V）
+    def paste_entries(self):
+        if not self.current_file or self.is_loading():
+            return
+        entries = []
+        for line in QApplication.clipboard().text().splitlines():
+            parts = line.strip().split("\t")
+            if len(parts) == 2:
+                parts.append(HINSHI_LIST[0])
+            if len(parts) != 3:
+                continue
+            entry = normalize_entry(parts)
+            if self.entry_errors(entry) or self.index.contains(entry[0], entry[1]) or entry in entries:
+                continue
+            entries.append(entry)
+        if not entries:
+            return
+        with self.undo_stack.transaction(f"{len(entries)}件の貼り付け"):
+            for entry in entries:
+                self.undo_stack.execute(InsertCommand(len(self.entries), entry))
+        self.table.scrollToBottom()
 
     # 新規ファイル作成
     def create_new_file(self):
@@ -277,14 +866,116 @@ class MainWindow(QWidget):
             return
         fname = items[0].text()
         full_path = os.path.join(self.dictionary_dir, fname)
+        if self.journal is not None and self.current_file == full_path:
+            self.cancel_loading()
+            self.journal.discard()
+            self.journal = None
+            self.compact_timer.stop()
+            self.watcher.watch_file(None)
+            self.current_file = None
+            self.cancel_edit()
+            self.undo_stack.clear()
+            self.entries = EntryStore()
+            self.refresh_table()
         os.remove(full_path)
+        self.discard_file_data(full_path)
         self.refresh_file_list()
-        self.entries = []
-        self.table.setRowCount(0)
+        self.entries = EntryStore()
+        self.index = EntryIndex(self.entries)
+        self.refresh_table()
         self.current_file = None
 
+    # 複数の辞書を1つにまとめる
+    def merge_files(self):
+        from logic.merge import MERGE_POLICIES, merge_dictionaries
+
+        paths, _ = QFileDialog.getOpenFileNames(self, "マージする辞書ファイルを選択（先に選んだものが基準）", self.dictionary_dir, "Text Files (*.txt)")
+        if len(paths) < 2:
+            if paths:
+                QMessageBox.warning(self, "マージ失敗", "辞書ファイルを2つ以上選択してください。")
+            return
+        labels = list(MERGE_POLICIES.values())
+        label, ok = QInputDialog.getItem(self, "品詞が違う場合", "同じ読み・表記で品詞が違うとき:", labels, 0, False)
+        if not ok:
+            return
+        policy = list(MERGE_POLICIES)[labels.index(label)]
+        output, _ = QFileDialog.getSaveFileName(self, "マージ結果の保存先", os.path.join(self.dictionary_dir, "merged.txt"), "Text Files (*.txt)")
+        if not output:
+            return
+        if not output.endswith(".txt"):
+            output += ".txt"
+
+        # 開いている辞書が関係する場合は、先に編集を書き戻しておく
+        current = os.path.abspath(self.current_file) if self.current_file else None
+        if current in [os.path.abspath(p) for p in paths + [output]]:
+            self.close_current_file()
+            self.file_list.clearSelection()
+
+        base, _ = os.path.splitext(os.path.basename(output))
+        report_path = os.path.join(self.saved_dir, f"{base}_merge_report.tsv")
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            report = merge_dictionaries(paths, output, policy, report_path, cache_dir=self.cache_dir)
+        except (OSError, UnicodeDecodeError) as e:
+            QMessageBox.critical(self, "マージ失敗", f"辞書のマージに失敗しました。\n{e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.refresh_file_list()
+        QMessageBox.information(self, "マージ完了", f"{report.summary()}\n{output}\n\n明細：\n{report_path}")
+
+    # Mozc・MS-IME・ATOK・SKKの辞書ファイルを取り込む（別スレッドで、複数ファイルは別プロセスで並行して）
+    def import_ime_dictionaries(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "取り込むIMEの辞書ファイルを選択", "", "辞書ファイル (*.txt *.csv *.dic);;すべてのファイル (*)")
+        if not paths:
+            return
+        jobs = []
+        for path in paths:
+            base, _ = os.path.splitext(os.path.basename(path))
+            jobs.append((path, os.path.join(self.dictionary_dir, base + ".txt")))
+        existing = [target for _, target in jobs if os.path.exists(target)]
+        if existing:
+            ret = QMessageBox.question(
+                self, "辞書の取り込み",
+                "同じ名前の辞書があります。上書きしますか？\n「いいえ」を選ぶとそのファイルは取り込みません。\n\n"
+                + "\n".join(os.path.basename(target) for target in existing),
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel
+            )
+            if ret == QMessageBox.StandardButton.Cancel:
+                return
+            if ret == QMessageBox.StandardButton.No:
+                jobs = [job for job in jobs if job[1] not in existing]
+            else:
+                if self.current_file and os.path.abspath(self.current_file) in [os.path.abspath(t) for t in existing]:
+                    self.close_current_file()
+                    self.file_list.clearSelection()
+                # 上書きする辞書のジャーナルとキャッシュは、開いていないものも含めて新しい内容に合わないので捨てる
+                for target in existing:
+                    self.discard_file_data(target)
+        if not jobs:
+            return
+
+        self.import_results = []
+        self.import_button.setEnabled(False)
+        thread = ImportThread(jobs, self.cache_dir, parent=self)
+        thread.file_imported.connect(self.import_results.append)
+        thread.finished.connect(self.on_import_finished)
+        thread.finished.connect(thread.deleteLater)
+        thread.start()
+
+    def on_import_finished(self):
+        self.import_button.setEnabled(True)
+        self.refresh_file_list()
+        failed = [result for result in self.import_results if result.error is not None]
+        message = "\n".join(result.summary() for result in self.import_results)
+        if failed:
+            QMessageBox.warning(self, "取り込み", f"{len(failed)}件のファイルを取り込めませんでした。\n\n{message}")
+        else:
+            QMessageBox.information(self, "取り込み完了", f"{len(self.import_results)}件のファイルを取り込みました。\n\n{message}")
+
     # エクスプローラー開く
     def open_dictionary_folder(self):
+        import subprocess
         path = os.path.abspath(self.dictionary_dir)
         try:
             subprocess.Popen(f'explorer "{path}"')
@@ -292,67 +983,143 @@ class MainWindow(QWidget):
             QMessageBox.critical(self, "エクスプローラー起動失敗", f"エラー: {e}")
 
     # エクスポート機能群
-    def export_google_mozc(self):
-        if not self.current_file or not self.entries:
-            QMessageBox.warning(self, "エクスポート失敗", "エクスポートする辞書ファイルを選択してください。")
+    # 共有方法のボタンが押されたとき、初めてそのモジュールを読み込んで実行する
+    def run_share_plugin(self, plugin):
+        try:
+            action = plugin.load()
+        except ImportError as e:
+            QMessageBox.warning(self, "エラー", f"{plugin.label} に必要なモジュールを読み込めませんでした: {e}")
             return
-        base, _ = os.path.splitext(os.path.basename(self.current_file))
-        fname = os.path.join(self.saved_dir, f"{base}_google_mozc.txt")
-        with open(fname, "w", encoding="utf-8") as f:
-            for yomi, hyouki, hinshi in self.entries:
-                f.write(f"{yomi}\t{hyouki}\t{hinshi}\n")
-        QMessageBox.information(self, "エクスポート完了", f"Google日本語入力/Mozc用TXTファイルを出力しました：\n{fname}")
+        action(self)
+
+    def export_all(self):
+        self.export_formats(list(EXPORT_FORMATS))
 
-    def export_msime(self):
+    # 選んだ形式をまとめて書き出す（エントリを読むのは1回だけ）
+    def export_formats(self, format_names):
         if not self.current_file or not self.entries:
             QMessageBox.warning(self, "エクスポート失敗", "エクスポートする辞書ファイルを選択してください。")
             return
-        base, _ = os.path.splitext(os.path.basename(self.current_file))
-        fname = os.path.join(self.saved_dir, f"{base}_msime.txt")
-        import codecs
-        with codecs.open(fname, "w", encoding="shift_jis") as f:
-            for yomi, hyouki, hinshi in self.entries:
-                f.write(f"{hyouki}\t{yomi}\t{hinshi}\n")
-        QMessageBox.information(self, "エクスポート完了", f"Microsoft IME用TXTファイルを出力しました（Shift_JIS）：\n{fname}")
-
-    def export_atok(self):
-        if not self.current_file or not self.entries:
-            QMessageBox.warning(self, "エクスポート失敗", "エクスポートする辞書ファイルを選択してください。")
+        if self.is_loading():
+            QMessageBox.warning(self, "エクスポート失敗", "辞書ファイルの読み込みが終わるまでお待ちください。")
             return
+        # 書き出せない行があれば、書き始める前に正規化するか除くかを選んでもらう
+        report = self.validate_current()
+        skip_rows = None
+        if report.error_rows(format_names):
+            choice = self.ask_validation_action(report, format_names)
+            if choice is None:
+                return
+            if choice == "fix":
+                self.apply_fixes(report)
+                report = self.validate_current()
+            if report.error_rows(format_names):
+                skip_rows = report.skip_rows(format_names)
         base, _ = os.path.splitext(os.path.basename(self.current_file))
-        fname = os.path.join(self.saved_dir, f"{base}_atok.csv")
-        import codecs
-        with codecs.open(fname, "w", encoding="shift_jis") as f:
-            for yomi, hyouki, hinshi in self.entries:
-                f.write(f"{hyouki},{yomi},{hinshi}\n")
-        QMessageBox.information(self, "エクスポート完了", f"ATOK用CSVファイルを出力しました（Shift_JIS）：\n{fname}")
-
-    def export_skk(self):
-        if not self.current_file or not self.entries:
-            QMessageBox.warning(self, "エクスポート失敗", "エクスポートする辞書ファイルを選択してください。")
+        try:
+            paths = self.dictionary_manager.export(self.entries, base, format_names, skip_rows=skip_rows)
+        except (OSError, UnicodeEncodeError) as e:
+            QMessageBox.critical(self, "エクスポート失敗", f"エクスポートに失敗しました。\n{e}")
             return
-        base, _ = os.path.splitext(os.path.basename(self.current_file))
-        fname = os.path.join(self.saved_dir, f"{base}_skk.dic")
-        with open(fname, "w", encoding="utf-8") as f:
-            for yomi, hyouki, _ in self.entries:
-                f.write(f"{yomi} /{hyouki}/\n")
-        QMessageBox.information(self, "エクスポート完了", f"SKK用テキストファイルを出力しました：\n{fname}")
-
-    # OneDriveにバックアップ
+        lines = [f"{EXPORT_FORMATS[name].description}：\n{path}" for name, path in paths.items()]
+        if skip_rows:
+            lines.append(f"問題のある {len(report.error_rows(format_names))}行は書き出していません（赤い行）。")
+        QMessageBox.information(self, "エクスポート完了", "ファイルを出力しました。\n" + "\n".join(lines))
+
+    # 辞書全体をチェックして、問題のある行に色を付ける
+    def validate_current(self):
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            report = validate_entries(self.entries)
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.table_model.set_issues({
+            self.entries.id_at(row): (report.level_of(row), report.message_of(row)) for row in report.issues
+        })
+        return report
+
+    # 書き出せない行があるときの選択。"fix"（正規化して続ける）・"skip"（除いて続ける）・None（やめる）
+    def ask_validation_action(self, report, format_names):
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Icon.Warning)
+        box.setWindowTitle("書き出せない行があります")
+        box.setText(f"{len(report.error_rows(format_names))}行が選んだ形式で書き出せません。\n{report.summary()}")
+        fix_button = box.addButton("正規化して続ける", QMessageBox.ButtonRole.AcceptRole) if report.fixable_count() else None
+        skip_button = box.addButton("問題のある行を除いて続ける", QMessageBox.ButtonRole.AcceptRole)
+        box.addButton(QMessageBox.StandardButton.Cancel)
+        box.exec()
+        if fix_button is not None and box.clickedButton() is fix_button:
+            return "fix"
+        if box.clickedButton() is skip_button:
+            return "skip"
+        return None
+
+    # 正規化で直せるものを直し、重複を消す（1回の操作として元に戻せる）
+    def apply_fixes(self, report):
+        plan = report.fix_plan()
+        if not plan:
+            return
+        with self.undo_stack.transaction("正規化"):
+            for row, entry in plan:
+                if entry is None:
+                    self.undo_stack.execute(RemoveCommand(row))
+                else:
+                    self.undo_stack.execute(UpdateCommand(row, entry))
+
+    # 「チェック」ボタン。結果を色付けし、直せるものがあれば正規化するか聞く
+    def check_entries(self):
+        if not self.current_file:
+            QMessageBox.warning(self, "チェック", "チェックする辞書ファイルを選択してください。")
+            return
+        if self.is_loading():
+            QMessageBox.warning(self, "チェック", "辞書ファイルの読み込みが終わるまでお待ちください。")
+            return
+        report = self.validate_current()
+        if not report:
+            QMessageBox.information(self, "チェック", report.summary())
+            return
+        fixable = report.fixable_count()
+        if not fixable:
+            QMessageBox.information(self, "チェック", report.summary() + "\n問題のある行に色を付けました。")
+            return
+        answer = QMessageBox.question(
+            self, "チェック",
+            f"{report.summary()}\n問題のある行に色を付けました。\n\n{fixable}行は正規化で直せます（重複は削除します）。正規化しますか？",
+        )
+        if answer == QMessageBox.StandardButton.Yes:
+            self.apply_fixes(report)
+            QMessageBox.information(self, "チェック", self.validate_current().summary())
+
+    # OneDriveのバックアップ置き場（初めて使うときに読み込む）
+    def get_backup_store(self):
+        if self._backup_store is None:
+            from logic.backup_store import BackupStore
+            self._backup_store = BackupStore(self.onedrive_dir)
+        return self._backup_store
+
+    # OneDriveにバックアップ（変わったチャンクだけを書き込む）
     def backup_to_onedrive(self):
         if not self.current_file:
             QMessageBox.warning(self, "バックアップ失敗", "バックアップする辞書ファイルを選択してください。")
             return
+        if self.is_loading():
+            QMessageBox.warning(self, "バックアップ失敗", "辞書ファイルの読み込みが終わるまでお待ちください。")
+            return
         try:
-            shutil.copy2(self.current_file, os.path.join(self.onedrive_dir, os.path.basename(self.current_file)))
-            QMessageBox.information(self, "バックアップ完了", "OneDriveにバックアップしました。")
+            # 未反映の編集があれば書き戻してからバックアップする（無ければ書き直さない）
+            if self.journal is not None and self.journal.has_pending():
+                self.save_current_file()
+            manifest = self.get_backup_store().backup(self.current_file)
+            QMessageBox.information(self, "バックアップ完了", f"OneDriveにバックアップしました。\n世代: {manifest['version']}")
         except Exception as e:
             QMessageBox.critical(self, "バックアップ失敗", f"OneDriveへのバックアップに失敗しました。\n{e}")
 
-    # OneDriveから復元
+    # OneDriveから復元（ファイルを選んでから世代を選ぶ）
     def restore_from_onedrive(self):
         try:
-            files = [f for f in os.listdir(self.onedrive_dir) if os.path.isfile(os.path.join(self.onedrive_dir, f))]
+            # 以前の形式（ファイルをそのままコピーしたもの）も復元できるようにしておく
+            legacy_files = [f for f in os.listdir(self.onedrive_dir) if os.path.isfile(os.path.join(self.onedrive_dir, f))]
+            files = sorted(set(self.get_backup_store().list_names()) | set(legacy_files))
             if not files:
                 QMessageBox.warning(self, "復元失敗", "OneDriveのバックアップフォルダにファイルがありません。")
                 return
@@ -361,131 +1128,81 @@ class MainWindow(QWidget):
             if not ok or not fname:
                 return
 
-            src = os.path.join(self.onedrive_dir, fname)
-            dst = os.path.join(self.dictionary_dir, fname)
+            versions = self.get_backup_store().list_versions(fname)
+            labels = [
+                f"{time.strftime('%Y/%m/%d %H:%M:%S', time.localtime(v['created']))}（{v['size']} bytes）"
+                for v in versions
+            ]
+            if fname in legacy_files:
+                labels.append("以前の形式のバックアップ")
+            label, ok = QInputDialog.getItem(self, "復元する世代を選択", "バックアップ日時:", labels, 0, False)
+            if not ok or not label:
+                return
 
-            shutil.copy2(src, dst)
+            dst = os.path.join(self.dictionary_dir, fname)
+            # 開いている辞書を復元する場合は、閉じてから上書きし、古いジャーナルも捨てて開き直す
+            is_current = self.current_file is not None and os.path.abspath(self.current_file) == os.path.abspath(dst)
+            if is_current:
+                self.close_current_file()
+            if labels.index(label) < len(versions):
+                self.get_backup_store().restore(fname, versions[labels.index(label)]["version"], dst)
+            else:
+                import shutil
+                shutil.copy2(os.path.join(self.onedrive_dir, fname), dst)
+            self.discard_file_data(dst)
             self.refresh_file_list()  # ファイルリストを更新
+            if is_current:
+                self.load_selected_file()
             QMessageBox.information(self, "復元完了", f"OneDriveから復元しました：\n{dst}")
         except Exception as e:
             QMessageBox.critical(self, "復元失敗", f"OneDriveからの復元に失敗しました。\n{e}")
 
-    # クリップボードに辞書テキストをコピー
-    def export_to_clipboard(self):
-        if not self.entries or not self.current_file:
-            QMessageBox.warning(self, "共有失敗", "エクスポートする辞書ファイルを選択してください。")
-            return
-
-        file_name = os.path.basename(self.current_file)
-        text = f"{file_name}\n"
-        for yomi, hyouki, hinshi in self.entries:
-            text += f"{yomi}\t{hyouki}\t{hinshi}\n"
-
-        clipboard = QApplication.clipboard()
-        clipboard.setText(text)
-        QMessageBox.information(self, "コピー完了", f"{file_name} と辞書データをクリップボードにコピーしました。")
-
-    # クリップボードから読み込み
-    def import_from_clipboard(self):
-        clipboard = QApplication.clipboard()
-        text = clipboard.text()
-        if not text:
-            QMessageBox.warning(self, "貼り付け失敗", "クリップボードにテキストがありません。")
-            return
-
-        lines = text.strip().splitlines()
-        if not lines:
-            QMessageBox.warning(self, "貼り付け失敗", "クリップボードに有効な行がありません。")
-            return
-
-        first_line = lines[0].strip()
-        if not (first_line.endswith(".txt") or first_line.endswith("）")):
-            QMessageBox.warning(self, "ファイル名エラー", "1行目にファイル名（例: xxx.txt）を含めてください。")
-            return
-
-        import re
-        match = re.search(r"\(?([^\s()]+\.txt)\)?", first_line)
-        if not match:
-            QMessageBox.warning(self, "ファイル名抽出失敗", "先頭行からファイル名が抽出できませんでした。")
-            return
-        file_name = match.group(1)
-        self.current_file = os.path.join(self.dictionary_dir, file_name)
-
-        new_entries = []
-        for line in lines[1:]:
-            parts = line.strip().split('\t')
-            if len(parts) == 3:
-                new_entries.append(tuple(parts))
-
-        if not new_entries:
-            QMessageBox.warning(self, "貼り付け失敗", "有効な辞書データが見つかりませんでした。")
-            return
-
-        ret = QMessageBox.question(
-            self, "辞書データ読み込み",
-            f"{file_name} に {len(new_entries)} 件のデータを上書き保存します。よろしいですか？",
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-        )
-        if ret != QMessageBox.StandardButton.Yes:
-            return
-
-        self.entries = new_entries
-        self.save_current_file()
-        self.refresh_table()
-        self.refresh_file_list()
-
-        QMessageBox.information(self, "読み込み完了", f"{file_name} を作成または上書きし、辞書データをインポートしました。")
-
-    # QRコードを表示
-    def show_qr_code(self):
-        if not self.entries:
-            QMessageBox.warning(self, "QRコード生成失敗", "エクスポートする辞書データがありません。")
-            return
-
-        text = ""
-        for yomi, hyouki, hinshi in self.entries:
-            text += f"{yomi}\t{hyouki}\t{hinshi}\n"
-
-        if self.current_file:
-            base_name = os.path.splitext(os.path.basename(self.current_file))[0]
+    # 終了時に未保存の編集を書き戻す
+    def closeEvent(self, event):
+        self.close_current_file()
+        for loader in self.findChildren(DictionaryLoader):
+            loader.cancel()
+            loader.wait()
+        for thread in self.findChildren(ImportThread):
+            thread.requestInterruption()
+            thread.wait()
+        if self.sync_server is not None:
+            self.sync_server.stop()
+            self.sync_server = None
+        super().closeEvent(event)
+
+    # 計測のオン・オフ（ログのパスがNoneならメモリ上に記録するだけ）
+    def set_metrics_enabled(self, enabled, log_path=None):
+        if enabled:
+            instrumentation.enable(log_path)
+            self.stall_monitor.start()
         else:
-            base_name = "qr_code"
+            instrumentation.disable()
+            self.stall_monitor.stop()
 
-        dlg = QRCodeDialog(text, self, filename=base_name)
+    # パフォーマンス情報（計測結果）を表示
+    def show_metrics(self):
+        dlg = MetricsDialog(self.set_metrics_enabled, self.metrics_log_path, self)
         dlg.exec()
 
 
-
 # ここからMainWindow抜ける
-# QRコードの表示ウィンドウ
-class QRCodeDialog(QDialog):
-    def __init__(self, text, parent=None, filename="qr_code"):
+# IMEの辞書の取り込み。1ファイル終わるごとにImportResultを知らせる
+class ImportThread(QThread):
+    file_imported = pyqtSignal(object)
+
+    def __init__(self, jobs, cache_dir=None, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("QRコード表示")
-        self.setMinimumSize(300, 400)
-
-        self.qr_img = qrcode.make(text).convert('RGB')
-        qt_img = ImageQt(self.qr_img)
-        pix = QPixmap.fromImage(QImage(qt_img))
-
-        self.label = QLabel()
-        self.label.setPixmap(pix.scaled(280, 280, Qt.AspectRatioMode.KeepAspectRatio))
-
-        self.filename = filename
-
-        save_button = QPushButton("QRコードを保存")
-        save_button.clicked.connect(self.save_qr_code)
-
-        layout = QVBoxLayout()
-        layout.addWidget(self.label)
-        layout.addWidget(save_button)
-        self.setLayout(layout)
-
-    # QRコードを保存できるようにする処理
-    def save_qr_code(self):
-        downloads = str(Path.home() / "Downloads")
-        save_name = f"{self.filename}.png"
-        save_path, _ = QFileDialog.getSaveFileName(self, "QRコードを保存", os.path.join(downloads, save_name), "PNG Files (*.png)")
-        if save_path:
-            self.qr_img.save(save_path)
-            QMessageBox.information(self, "保存完了", f"QRコードを保存しました：\n{save_path}")
+        self.jobs = jobs
+        self.cache_dir = cache_dir
+
+    def run(self):
+        from logic.dictionary_importer import iter_import_files
+        results = iter_import_files(self.jobs, cache_dir=self.cache_dir)
+        try:
+            for result in results:
+                self.file_imported.emit(result)
+                if self.isInterruptionRequested():
+                    return
+        finally:
+            results.close()
@@ -0,0 +1,130 @@
+# 計測結果を見るためのデバッグ用ダイアログ
+# 計測のオン・オフ、JSON Linesへの書き出し、記録のリセットができ、表示は1秒ごとに更新する。
+import time
+
+from PyQt6.QtCore import QObject, QTimer, Qt
+from PyQt6.QtWidgets import (
+    QCheckBox, QDialog, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem, QVBoxLayout
+)
+
+from logic import instrumentation
+
+
+# イベントループが止まっていた時間を「ui.stall」に記録する（画面が固まった時間の目安）
+# 計測がオンの間だけタイマーを動かす
+class StallMonitor(QObject):
+    INTERVAL_MSEC = 100
+    # これ以上遅れたら固まったとみなす
+    THRESHOLD_MSEC = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.INTERVAL_MSEC)
+        self._timer.timeout.connect(self._tick)
+        self._last = None
+
+    def start(self):
+        self._last = None
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def _tick(self):
+        now = time.perf_counter()
+        if self._last is not None:
+            late_ms = (now - self._last) * 1000 - self.INTERVAL_MSEC
+            if late_ms >= self.THRESHOLD_MSEC:
+                instrumentation.observe("ui.stall", late_ms)
+        self._last = now
+
+
+class MetricsDialog(QDialog):
+    COLUMNS = ["名前", "回数", "平均ms", "p50ms", "p95ms", "最大ms", "合計ms"]
+
+    # set_enabledは計測のオン・オフを切り替える関数（MainWindow.set_metrics_enabled）
+    def __init__(self, set_enabled, log_path, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("パフォーマンス情報")
+        self.resize(720, 420)
+        self.set_enabled = set_enabled
+        self.default_log_path = log_path
+
+        self.enabled_check = QCheckBox("計測する")
+        self.enabled_check.setChecked(instrumentation.is_enabled())
+        self.log_check = QCheckBox(f"ログに書き出す（{log_path}）")
+        self.log_check.setChecked(instrumentation.log_path() is not None)
+        self.enabled_check.toggled.connect(self.on_toggled)
+        self.log_check.toggled.connect(self.on_toggled)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.counters_label = QLabel()
+        self.counters_label.setWordWrap(True)
+
+        reset_button = QPushButton("リセット")
+        close_button = QPushButton("閉じる")
+        reset_button.clicked.connect(self.on_reset)
+        close_button.clicked.connect(self.close)
+
+        options = QHBoxLayout()
+        options.addWidget(self.enabled_check)
+        options.addWidget(self.log_check)
+        options.addStretch()
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(reset_button)
+        buttons.addWidget(close_button)
+
+        layout = QVBoxLayout()
+        layout.addLayout(options)
+        layout.addWidget(self.table)
+        layout.addWidget(self.counters_label)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+        self.refresh()
+
+    def on_toggled(self):
+        self.log_check.setEnabled(self.enabled_check.isChecked())
+        log_path = self.default_log_path if self.log_check.isChecked() else None
+        self.set_enabled(self.enabled_check.isChecked(), log_path)
+        self.refresh()
+
+    def on_reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def refresh(self):
+        data = instrumentation.snapshot()
+        histograms = sorted(data["histograms"].items(), key=lambda item: -item[1]["total_ms"])
+        self.table.setRowCount(len(histograms))
+        for row, (name, values) in enumerate(histograms):
+            cells = [name, values["count"], values["mean_ms"], values["p50_ms"], values["p95_ms"], values["max_ms"], values["total_ms"]]
+            for column, value in enumerate(cells):
+                if isinstance(value, float):
+                    value = f"{value:.1f}"
+                item = QTableWidgetItem(str(value))
+                if column > 0:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+        counters = ", ".join(f"{name}: {value}" for name, value in sorted(data["counters"].items()))
+        if not instrumentation.is_enabled():
+            counters = "計測はオフです。" + (f"（前回までの記録: {counters}）" if counters else "")
+        self.counters_label.setText(counters or "カウンタはまだありません。")
+
+    def done(self, result):
+        self.refresh_timer.stop()
+        super().done(result)
+
+    def closeEvent(self, event):
+        self.refresh_timer.stop()
+        super().closeEvent(event)
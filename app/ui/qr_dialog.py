@@ -0,0 +1,158 @@
+# QRコードでの辞書の共有（共有プラグイン「qr」）
+# qrcodeとPillowは読み込みに時間がかかるので、起動時ではなくQRコードを初めて表示するときに読み込む
+import os
+from pathlib import Path
+
+import qrcode
+from PIL.ImageQt import ImageQt
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtWidgets import QDialog, QFileDialog, QHBoxLayout, QLabel, QMessageBox, QPushButton, QVBoxLayout
+
+from logic.instrumentation import span
+from logic.qr_share import QRShareError, encode_qr_chunks
+
+
+# QRコードを表示
+def show_qr_code(window):
+    if not window.entries:
+        QMessageBox.warning(window, "QRコード生成失敗", "エクスポートする辞書データがありません。")
+        return
+
+    if window.is_loading():
+        QMessageBox.warning(window, "QRコード生成失敗", "辞書ファイルの読み込みが終わるまでお待ちください。")
+        return
+
+    # 圧縮してQRコード1枚に収まる大きさに分割する
+    try:
+        chunks = encode_qr_chunks(window.entries)
+    except QRShareError as e:
+        QMessageBox.warning(window, "QRコード生成失敗", str(e))
+        return
+
+    if window.current_file:
+        base_name = os.path.splitext(os.path.basename(window.current_file))[0]
+    else:
+        base_name = "qr_code"
+
+    dlg = QRCodeDialog(chunks, window, filename=base_name)
+    dlg.exec()
+
+
+# QRコード画像を別スレッドで作る
+class QRImageThread(QThread):
+    image_ready = pyqtSignal(int, object)
+
+    def __init__(self, chunks, parent=None):
+        super().__init__(parent)
+        self.chunks = chunks
+        # qrcodeの誤り訂正の計算は再帰が深いので、スレッドのスタックを大きめにとる
+        self.setStackSize(16 * 1024 * 1024)
+
+    def run(self):
+        for i, chunk in enumerate(self.chunks):
+            if self.isInterruptionRequested():
+                return
+            with span("qr.image", chunk=i):
+                image = qrcode.make(chunk).convert('RGB')
+            self.image_ready.emit(i, image)
+
+
+# QRコードの表示ウィンドウ（複数枚の場合はページ送りで表示）
+class QRCodeDialog(QDialog):
+    def __init__(self, chunks, parent=None, filename="qr_code"):
+        super().__init__(parent)
+        self.setWindowTitle("QRコード表示")
+        self.setMinimumSize(300, 400)
+
+        self.images = [None] * len(chunks)
+        self.page = 0
+        self.filename = filename
+
+        self.label = QLabel("QRコードを作成中...")
+        self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.label.setMinimumSize(280, 280)
+        self.page_label = QLabel()
+        self.page_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        self.prev_button = QPushButton("前へ")
+        self.next_button = QPushButton("次へ")
+        self.prev_button.clicked.connect(lambda: self.show_page(self.page - 1))
+        self.next_button.clicked.connect(lambda: self.show_page(self.page + 1))
+
+        page_btns = QHBoxLayout()
+        page_btns.addWidget(self.prev_button)
+        page_btns.addWidget(self.page_label)
+        page_btns.addWidget(self.next_button)
+
+        self.save_button = QPushButton("QRコードを保存")
+        self.save_button.clicked.connect(self.save_qr_code)
+        self.save_all_button = QPushButton("すべてのQRコードを保存")
+        self.save_all_button.clicked.connect(self.save_all_qr_codes)
+        self.save_all_button.setVisible(len(chunks) > 1)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.label)
+        layout.addLayout(page_btns)
+        layout.addWidget(self.save_button)
+        layout.addWidget(self.save_all_button)
+        self.setLayout(layout)
+
+        self.thread = QRImageThread(chunks, self)
+        self.thread.image_ready.connect(self.on_image_ready)
+        self.thread.start()
+        self.show_page(0)
+
+    def on_image_ready(self, index, image):
+        self.images[index] = image
+        if index == self.page:
+            self.show_page(self.page)
+        else:
+            self.update_buttons()
+
+    def show_page(self, page):
+        self.page = max(0, min(page, len(self.images) - 1))
+        image = self.images[self.page]
+        if image is None:
+            self.label.setText("QRコードを作成中...")
+        else:
+            qt_img = ImageQt(image)
+            pix = QPixmap.fromImage(QImage(qt_img))
+            self.label.setPixmap(pix.scaled(280, 280, Qt.AspectRatioMode.KeepAspectRatio))
+        self.page_label.setText(f"{self.page + 1} / {len(self.images)}")
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.prev_button.setEnabled(self.page > 0)
+        self.next_button.setEnabled(self.page < len(self.images) - 1)
+        self.save_button.setEnabled(self.images[self.page] is not None)
+        self.save_all_button.setEnabled(all(image is not None for image in self.images))
+
+    def page_filename(self, page):
+        if len(self.images) == 1:
+            return f"{self.filename}.png"
+        return f"{self.filename}_{page + 1:03d}of{len(self.images):03d}.png"
+
+    # QRコードを保存できるようにする処理
+    def save_qr_code(self):
+        downloads = str(Path.home() / "Downloads")
+        save_name = self.page_filename(self.page)
+        save_path, _ = QFileDialog.getSaveFileName(self, "QRコードを保存", os.path.join(downloads, save_name), "PNG Files (*.png)")
+        if save_path:
+            self.images[self.page].save(save_path)
+            QMessageBox.information(self, "保存完了", f"QRコードを保存しました：\n{save_path}")
+
+    # 全ページをまとめてフォルダに保存
+    def save_all_qr_codes(self):
+        downloads = str(Path.home() / "Downloads")
+        folder = QFileDialog.getExistingDirectory(self, "QRコードの保存先フォルダ", downloads)
+        if not folder:
+            return
+        for page, image in enumerate(self.images):
+            image.save(os.path.join(folder, self.page_filename(page)))
+        QMessageBox.information(self, "保存完了", f"QRコードを{len(self.images)}枚保存しました：\n{folder}")
+
+    def done(self, result):
+        self.thread.requestInterruption()
+        self.thread.wait()
+        super().done(result)
@@ -0,0 +1,41 @@
+# EntryStoreとタプルのリストのメモリ使用量比較
+# 実行方法: python benchmarks/bench_entry_store.py [件数 ...]
+import sys
+import time
+import tracemalloc
+
+from synthetic import make_lines
+from logic.entry_store import EntryStore
+
+
+def measure(build, lines):
+    tracemalloc.start()
+    start = time.perf_counter()
+    container = build(lines)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+    return current, elapsed
+
+
+def build_list(lines):
+    return [tuple(line.rstrip("\n").split("\t")) for line in lines]
+
+
+def build_store(lines):
+    return EntryStore(tuple(line.rstrip("\n").split("\t")) for line in lines)
+
+
+def main(counts):
+    print(f"{'件数':>10} {'list[tuple] MB':>15} {'EntryStore MB':>14} {'比率':>6} {'list秒':>7} {'store秒':>8}")
+    for count in counts:
+        lines = make_lines(count)
+        list_bytes, list_time = measure(build_list, lines)
+        store_bytes, store_time = measure(build_store, lines)
+        print(f"{count:>10} {list_bytes / 2**20:>15.1f} {store_bytes / 2**20:>14.1f} "
+              f"{store_bytes / list_bytes:>6.2f} {list_time:>7.2f} {store_time:>8.2f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
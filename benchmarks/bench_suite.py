@@ -0,0 +1,522 @@
+# 読み込み・表示・編集・検索・保存・エクスポート・共有の処理時間をまとめて測る
+# 結果はJSONで保存し、--compareで以前の結果（別のコミットで測ったものなど）と比べられる。
+# 画面が関係するものはQT_QPA_PLATFORM=offscreenで実行する。
+#
+# 実行方法:
+#   python benchmarks/bench_suite.py                          # 1k, 10k, 100k件で全項目
+#   python benchmarks/bench_suite.py --sizes 1000000 --only load export
+#   python benchmarks/bench_suite.py --compare benchmarks/results/old.json
+#   python benchmarks/bench_suite.py --profile prof/          # 項目ごとのcProfileを保存
+#   python benchmarks/bench_suite.py --memory                 # tracemallocで最大メモリも記録
+import argparse
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from synthetic import make_entries, write_dictionary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+BENCHMARKS = {}
+
+
+# ベンチマークの登録。関数は準備をしてから、測りたい処理を引数なしの関数で返す
+# 毎回の計測の前に時間に含めずにやっておくことは ctx.before_each に、後片付けは ctx.cleanups に入れる
+def benchmark(name, gui=False):
+    def register(func):
+        BENCHMARKS[name] = (func, gui)
+        return func
+    return register
+
+
+class Context:
+    def __init__(self, work_dir, size):
+        self.work_dir = work_dir
+        self.size = size
+        self.entries = make_entries(size)
+        self.path = write_dictionary(os.path.join(work_dir, "bench.txt"), size)
+        self.before_each = None
+        self.cleanups = []
+
+    def tmp_path(self, name):
+        return os.path.join(self.work_dir, name)
+
+
+_qt_app = None
+
+
+def qt_app():
+    global _qt_app
+    if _qt_app is None:
+        from PyQt6.QtWidgets import QApplication
+        _qt_app = QApplication.instance() or QApplication([])
+    return _qt_app
+
+
+# 読み込み（load_selected_fileが別スレッドで行う解析とインデックス作成）
+@benchmark("load.parse")
+def bench_parse(ctx):
+    from logic.loader import iter_entry_chunks
+    from logic.search_index import EntryIndex
+
+    def run():
+        index = EntryIndex()
+        count = 0
+        for chunk in iter_entry_chunks(ctx.path):
+            index.extend(count, chunk)
+            count += len(chunk)
+        index.finish_extend()
+    return run
+
+
+@benchmark("load.build_cache")
+def bench_build_cache(ctx):
+    from logic.dictionary_cache import build_cache
+    return lambda: build_cache(ctx.path, ctx.tmp_path("bench.cache"))
+
+
+@benchmark("load.open_cache")
+def bench_open_cache(ctx):
+    from logic.dictionary_cache import build_cache, open_cache
+    cache_path = ctx.tmp_path("bench.cache")
+    build_cache(ctx.path, cache_path)
+
+    def run():
+        cached = open_cache(ctx.path, cache_path)
+        # 画面に出す最初の行と最後の行だけ読む
+        cached[0], cached[len(cached) - 1]
+    return run
+
+
+@benchmark("store.build")
+def bench_store(ctx):
+    from logic.entry_store import EntryStore
+    return lambda: EntryStore(ctx.entries)
+
+
+# 起動（新しいプロセスでMainWindowを読み込み、最初の画面を表示するまで。件数には関係しない）
+_STARTUP_SCRIPT = """
+import os, sys
+sys.path.insert(0, sys.argv[1])
+from PyQt6.QtWidgets import QApplication
+app = QApplication([])
+from ui.main_window import MainWindow
+window = MainWindow(sys.argv[2])
+window.show()
+app.processEvents()
+"""
+
+
+@benchmark("startup.main_window", gui=True)
+def bench_startup(ctx):
+    command = [sys.executable, "-c", _STARTUP_SCRIPT, os.path.join(ROOT, "app"), ctx.tmp_path("startup")]
+    return lambda: subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+# 画面込みの読み込み（ファイル選択から検索できるようになるまで）
+@benchmark("gui.load_selected_file", gui=True)
+def bench_gui_load(ctx):
+    from logic.loader import DictionaryLoader
+    from ui.main_window import MainWindow
+    app = qt_app()
+    dictionaries = ctx.tmp_path("gui")
+    os.makedirs(os.path.join(dictionaries, "base_dictionary"), exist_ok=True)
+    write_dictionary(os.path.join(dictionaries, "base_dictionary", "bench.txt"), ctx.size)
+    window = MainWindow(dictionaries)
+    cache_path = os.path.join(dictionaries, "cache", "bench.txt.cache")
+
+    # 前回の読み込みのあとに作られるキャッシュを待ってから消し、毎回txtから読むようにする
+    def reset():
+        for loader in window.findChildren(DictionaryLoader):
+            loader.wait()
+        window.file_list.clearSelection()
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+
+    def close():
+        window.close()
+        app.processEvents()
+
+    ctx.before_each = reset
+    ctx.cleanups.append(close)
+
+    def run():
+        window.file_list.setCurrentRow(0)
+        while window.is_loading():
+            app.processEvents()
+    return run
+
+
+@benchmark("gui.refresh_table", gui=True)
+def bench_refresh_table(ctx):
+    from PyQt6.QtWidgets import QTableView
+    from logic.entry_store import EntryStore
+    from ui.entry_table_model import EntryTableModel
+    app = qt_app()
+    store = EntryStore(ctx.entries)
+    model = EntryTableModel()
+    view = QTableView()
+    view.setModel(model)
+    view.resize(800, 600)
+    view.show()
+    ctx.cleanups.append(view.close)
+
+    def run():
+        model.set_entries(store)
+        app.processEvents()
+    return run
+
+
+@benchmark("search.index")
+def bench_search(ctx):
+    from logic.entry_store import EntryStore
+    from logic.search_index import EntryIndex
+    index = EntryIndex.from_store(EntryStore(ctx.entries))
+    queries = [ctx.entries[i][0][:2] for i in range(0, len(ctx.entries), max(1, len(ctx.entries) // 20))]
+    queries += [ctx.entries[i][1][:2] for i in range(0, len(ctx.entries), max(1, len(ctx.entries) // 20))]
+
+    def run():
+        for query in queries:
+            index.search(query)
+    return run
+
+
+# 編集（1件ずつの追加と、まとめて削除してから元に戻す）
+@benchmark("edit.undo_stack")
+def bench_edit(ctx):
+    from logic.edit_commands import InsertCommand, RemoveCommand, UndoStack
+    from logic.entry_store import EntryStore
+    from logic.journal import DictionaryJournal
+    from logic.search_index import EntryIndex
+
+    # MainWindowの行単位の操作と同じことを画面なしで行う
+    class Target:
+        def __init__(self):
+            self.entries = EntryStore(ctx.entries)
+            self.index = EntryIndex.from_store(self.entries)
+            self.journal = DictionaryJournal(ctx.tmp_path("edit.txt"))
+
+        def insert_row(self, row, entry, entry_id=None):
+            self.entries.insert(row, entry, entry_id)
+            entry_id = self.entries.id_at(row)
+            self.index.add(entry_id, entry[0], entry[1])
+            self.journal.record_insert(row, entry)
+            return entry_id
+
+        def remove_row(self, row):
+            entry, entry_id = self.entries[row], self.entries.id_at(row)
+            self.index.remove(entry_id)
+            del self.entries[row]
+            self.journal.record_delete(row)
+            return entry, entry_id
+
+        def update_row(self, row, entry):
+            old_entry, entry_id = self.entries[row], self.entries.id_at(row)
+            self.index.remove(entry_id)
+            self.entries[row] = entry
+            self.index.add(entry_id, entry[0], entry[1])
+            self.journal.record_update(row, entry)
+            return old_entry
+
+        def begin_batch(self):
+            self.journal.begin_batch()
+
+        def end_batch(self):
+            self.journal.end_batch()
+
+        def after_edit(self):
+            pass
+
+    target = Target()
+    stack = UndoStack(target)
+    step = max(1, ctx.size // 1000)
+
+    def run():
+        for i in range(100):
+            stack.execute(InsertCommand(len(target.entries), (f"べんち{i}", f"ベンチ{i}", "名詞")))
+        with stack.transaction("削除"):
+            for row in range(len(target.entries) - 1, 0, -step):
+                stack.execute(RemoveCommand(row))
+        while stack.can_undo():
+            stack.undo()
+        target.journal.discard()
+    return run
+
+
+@benchmark("save.compact")
+def bench_save(ctx):
+    from logic.entry_store import EntryStore
+    from logic.journal import DictionaryJournal
+    store = EntryStore(ctx.entries)
+    journal = DictionaryJournal(ctx.tmp_path("save.txt"))
+    return lambda: journal.compact(store)
+
+
+# エクスポート前のチェック（EntryStoreから取り出す時間も含む）
+@benchmark("validate.serial")
+def bench_validate(ctx):
+    from logic.entry_store import EntryStore
+    from logic.validation import validate_entries
+    store = EntryStore(ctx.entries)
+    return lambda: validate_entries(store, parallel=False)
+
+
+@benchmark("validate.parallel")
+def bench_validate_parallel(ctx):
+    from logic.entry_store import EntryStore
+    from logic.validation import validate_entries
+    store = EntryStore(ctx.entries)
+    return lambda: validate_entries(store, parallel=True)
+
+
+def _export_benchmark(format_name):
+    def bench(ctx):
+        from logic.dictionary_manager import DictionaryManager
+        manager = DictionaryManager(ctx.tmp_path("export"))
+        return lambda: manager.export(ctx.entries, "bench", [format_name], parallel=False)
+    return bench
+
+
+def _register_exports():
+    from logic.dictionary_manager import EXPORT_FORMATS
+    for name in EXPORT_FORMATS:
+        benchmark(f"export.{name}")(_export_benchmark(name))
+
+
+@benchmark("export.all_parallel")
+def bench_export_all(ctx):
+    from logic.dictionary_manager import DictionaryManager
+    manager = DictionaryManager(ctx.tmp_path("export"))
+    return lambda: manager.export(ctx.entries, "bench")
+
+
+@benchmark("share.clipboard")
+def bench_clipboard(ctx):
+    from logic.share_codec import decode_share, encode_delta, encode_full
+    changed = ctx.entries[: len(ctx.entries) * 99 // 100] + [("さぶん", "差分", "名詞")]
+
+    def run():
+        decode_share(encode_full("bench.txt", ctx.entries))
+        text, _, _ = encode_delta("bench.txt", ctx.entries, changed)
+        decode_share(text)
+    return run
+
+
+# QRコード用の分割と、最初の数枚の画像生成
+@benchmark("share.qr")
+def bench_qr(ctx):
+    import qrcode
+    from logic.qr_share import decode_qr_chunks, encode_qr_chunks
+
+    def run():
+        chunks = encode_qr_chunks(ctx.entries)
+        decode_qr_chunks(chunks)
+        for chunk in chunks[:3]:
+            qrcode.make(chunk)
+    return run
+
+
+# LAN同期（同じプロセスのサーバーから、空の辞書フォルダに全件を取り込む）
+@benchmark("sync.pull")
+def bench_sync_pull(ctx):
+    import asyncio
+    import shutil
+    import threading
+    from logic.lan_sync import SyncServer, pull
+    from logic.sync_log import SyncFolder
+    source_dir = ctx.tmp_path("sync_a")
+    os.makedirs(source_dir, exist_ok=True)
+    shutil.copy(ctx.path, os.path.join(source_dir, "bench.txt"))
+    loop = asyncio.new_event_loop()
+    server = SyncServer(SyncFolder(source_dir, ctx.tmp_path("sync_a_log")), "bench", "127.0.0.1", 0)
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    target = {}
+
+    def reset():
+        shutil.rmtree(ctx.tmp_path("sync_b"), ignore_errors=True)
+        os.makedirs(ctx.tmp_path("sync_b/base_dictionary"))
+        target["folder"] = SyncFolder(ctx.tmp_path("sync_b/base_dictionary"), ctx.tmp_path("sync_b/sync"))
+
+    def close():
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.run_until_complete(server.close())
+        loop.close()
+
+    ctx.before_each = reset
+    ctx.cleanups.append(close)
+    return lambda: pull(target["folder"], "127.0.0.1", server.port, "bench")
+
+
+@benchmark("merge.two_files")
+def bench_merge(ctx):
+    from logic.merge import merge_dictionaries
+    other = write_dictionary(ctx.tmp_path("other.txt"), ctx.size, seed=1)
+    return lambda: merge_dictionaries([ctx.path, other], ctx.tmp_path("merged.txt"))
+
+
+def _import_benchmark(format_name):
+    def bench(ctx):
+        from logic.dictionary_importer import iter_import
+        from logic.dictionary_manager import DictionaryManager
+        manager = DictionaryManager(ctx.tmp_path("export"))
+        path = manager.export(ctx.entries, "bench", [format_name])[format_name]
+        return lambda: sum(1 for _ in iter_import(path, format_name))
+    return bench
+
+
+def _register_imports():
+    from logic.dictionary_importer import IMPORT_FORMATS
+    for name in IMPORT_FORMATS:
+        benchmark(f"import.{name}")(_import_benchmark(name))
+
+
+def measure(run, repeat, before_each=None):
+    times = []
+    for _ in range(repeat):
+        if before_each is not None:
+            before_each()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_one(name, size, work_dir, args):
+    func, _ = BENCHMARKS[name]
+    ctx = Context(work_dir, size)
+    try:
+        return _run_measurements(name, size, ctx, func(ctx), args)
+    finally:
+        for cleanup in ctx.cleanups:
+            cleanup()
+
+
+def _run_measurements(name, size, ctx, run, args):
+    times = measure(run, args.repeat, ctx.before_each)
+    result = {
+        "name": name,
+        "size": size,
+        "min": min(times),
+        "median": statistics.median(times),
+        "repeat": args.repeat,
+    }
+    if args.memory:
+        if ctx.before_each is not None:
+            ctx.before_each()
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        result["peak_bytes"] = peak
+        result["top_allocations"] = [str(stat) for stat in snapshot.statistics("lineno")[:5]]
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+        if ctx.before_each is not None:
+            ctx.before_each()
+        profiler = cProfile.Profile()
+        profiler.runcall(run)
+        prof_path = os.path.join(args.profile, f"{name}.{size}.prof")
+        profiler.dump_stats(prof_path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(25)
+        with open(prof_path[:-5] + ".txt", "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, old_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    previous = {(r["name"], r["size"]): r for r in old["results"]}
+    print(f"\n{old_path}（{old['meta']['commit']}）との比較（medianの比。1より大きいと遅くなった）")
+    for result in results:
+        before = previous.get((result["name"], result["size"]))
+        if before is None or not before["median"]:
+            continue
+        ratio = result["median"] / before["median"]
+        mark = "  <-- 遅くなった" if ratio > 1.2 else ""
+        print(f"  {result['name']:<28} {result['size']:>9} {ratio:>6.2f}{mark}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="辞書管理ツールのベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="辞書の件数")
+    parser.add_argument("--only", nargs="+", help="名前がこれで始まる項目だけ実行（例: load export.msime）")
+    parser.add_argument("--no-gui", action="store_true", help="画面を使う項目を飛ばす")
+    parser.add_argument("--repeat", type=int, default=3, help="繰り返し回数")
+    parser.add_argument("-o", "--output", help="結果のJSON（既定は benchmarks/results/<日時>_<コミット>.json）")
+    parser.add_argument("--compare", help="比べる以前の結果のJSON")
+    parser.add_argument("--profile", metavar="DIR", help="項目ごとのcProfileの結果を保存するフォルダ")
+    parser.add_argument("--memory", action="store_true", help="tracemallocで最大メモリと確保の多い箇所を記録")
+    parser.add_argument("--list", action="store_true", help="項目の一覧を表示")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    _register_exports()
+    _register_imports()
+    names = [name for name, (_, gui) in BENCHMARKS.items() if not (gui and args.no_gui)]
+    if args.only:
+        names = [name for name in names if name.startswith(tuple(args.only))]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    commit = git_commit()
+    results = []
+    print(f"{'項目':<28} {'件数':>9} {'min秒':>9} {'median秒':>9}")
+    for size in args.sizes:
+        for name in names:
+            with tempfile.TemporaryDirectory(prefix="dictionary_bench_") as work_dir:
+                result = run_one(name, size, work_dir, args)
+            results.append(result)
+            extra = f" {result['peak_bytes'] / 2**20:>8.1f}MB" if "peak_bytes" in result else ""
+            print(f"{name:<28} {size:>9} {result['min']:>9.4f} {result['median']:>9.4f}{extra}", flush=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{commit}.json")
+    meta = {
+        "commit": commit,
+        "created": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "sizes": args.sizes,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=1)
+    print(f"\n結果: {output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# ベンチマーク用の辞書データを作る
+# 実際のユーザー辞書に近づけるため、読みは2〜12文字（4〜6文字が多い）のひらがな、
+# 表記は漢字1〜4文字を中心に、カタカナ語・英数字まじりを一定の割合で混ぜる。
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+from logic.entry_store import HINSHI_LIST
+
+HIRAGANA = [chr(c) for c in range(ord("ぁ"), ord("ん") + 1)] + ["ー"]
+KATAKANA = [chr(c) for c in range(ord("ァ"), ord("ヶ") + 1)] + ["ー"]
+# Shift_JISで出力する形式もあるので、JIS第1・第2水準にある漢字だけを使う
+KANJI = [ch for ch in map(chr, range(0x4E00, 0x9FA0)) if len(ch.encode("shift_jis", errors="ignore")) == 2][:3000]
+ALNUM = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+# 読みの長さと出やすさ
+YOMI_LENGTHS = [2, 3, 4, 5, 6, 7, 8, 10, 12]
+YOMI_WEIGHTS = [4, 10, 18, 20, 16, 12, 10, 6, 4]
+# 品詞の出やすさ（名詞がほとんど）
+HINSHI_WEIGHTS = [70, 8, 5, 4, 1, 1, 2, 2, 7]
+
+
+def make_entry(rng):
+    yomi = "".join(rng.choices(HIRAGANA, k=rng.choices(YOMI_LENGTHS, YOMI_WEIGHTS)[0]))
+    kind = rng.random()
+    if kind < 0.7:
+        hyouki = "".join(rng.choices(KANJI, k=rng.choices([1, 2, 3, 4, 6], [10, 45, 25, 15, 5])[0]))
+    elif kind < 0.9:
+        hyouki = "".join(rng.choices(KATAKANA, k=rng.randint(3, 10)))
+    else:
+        hyouki = "".join(rng.choices(ALNUM, k=rng.randint(2, 8))) + "".join(rng.choices(KANJI, k=rng.randint(0, 2)))
+    return (yomi, hyouki, rng.choices(HINSHI_LIST, HINSHI_WEIGHTS)[0])
+
+
+def make_entries(count, seed=0):
+    rng = random.Random(seed)
+    return [make_entry(rng) for _ in range(count)]
+
+
+# ファイルから読み込んだときと同じく、1行ずつの文字列を用意する
+def make_lines(count, seed=0):
+    return [f"{yomi}\t{hyouki}\t{hinshi}\n" for yomi, hyouki, hinshi in make_entries(count, seed)]
+
+
+def write_dictionary(path, count, seed=0):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(make_lines(count, seed))
+    return path
@@ -0,0 +1,5 @@
+# app/ 以下を python -m app と同じようにimportできるようにする
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
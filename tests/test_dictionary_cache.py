@@ -0,0 +1,16 @@
+import os
+
+from logic.dictionary_cache import build_cache, open_cache
+
+
+def test_close_releases_cache(tmp_path):
+    source = tmp_path / "a.txt"
+    source.write_text("よみ\t読み\t名詞\nかお\t顔\t名詞\n", encoding="utf-8")
+    cache_path = str(tmp_path / "a.cache")
+    build_cache(str(source), cache_path)
+    cached = open_cache(str(source), cache_path)
+    assert list(cached) == [("よみ", "読み", "名詞"), ("かお", "顔", "名詞")]
+    cached.close()
+    cached.close()
+    os.remove(cache_path)
+    assert not os.path.exists(cache_path)
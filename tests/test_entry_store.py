@@ -0,0 +1,45 @@
+from logic.entry_store import EntryStore
+from logic.search_index import EntryIndex
+
+
+def make_store(count):
+    return EntryStore((f"よみ{i}", f"表記{i}", "名詞") for i in range(count))
+
+
+# 削除の取り消しで元のIDを元の位置に戻しても、二分探索で引ける
+def test_reinserted_id_keeps_order():
+    store = make_store(10)
+    entry, entry_id = store[3], store.id_at(3)
+    del store[3]
+    store.insert(3, entry, entry_id)
+    assert store._ids_sorted
+    assert [store.position_of(store.id_at(row)) for row in range(10)] == list(range(10))
+
+
+# 途中に新しいIDを入れて並びが崩れても、行が動いたあとの位置を正しく返す
+def test_position_of_after_middle_insert():
+    store = make_store(10)
+    store.insert(2, ("なか", "中", "名詞"))
+    assert not store._ids_sorted
+    new_id = store.id_at(2)
+    assert store.position_of(new_id) == 2
+    del store[0]
+    store.append(("すえ", "末", "名詞"))
+    assert store.position_of(new_id) == 1
+    assert [store.position_of(store.id_at(row)) for row in range(len(store))] == list(range(len(store)))
+    assert store.position_of(10 ** 9) == -1
+    store.renumber()
+    assert store._ids_sorted and store.position_of(5) == 5
+
+
+def test_index_after_middle_insert():
+    store = make_store(100)
+    index = EntryIndex.from_store(store)
+    store.insert(50, ("なか", "中", "名詞"))
+    index.add(store.id_at(50), "なか", "中")
+    entry_id = store.id_at(10)
+    index.remove(entry_id)
+    del store[10]
+    assert index.contains("なか", "中")
+    assert not index.contains("よみ10", "表記10")
+    assert [store[store.position_of(i)][1] for i in index.search("中")] == ["中"]
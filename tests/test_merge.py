@@ -0,0 +1,52 @@
+import pytest
+
+from logic.merge import POLICY_FIRST, POLICY_KEEP_ALL, POLICY_LAST, merge_dictionaries
+
+BASE = "かお\t顔\t名詞\nよみ\t読み\t名詞\n"
+OTHER = "かお\t顔\t名詞\nよみ\t読み\t動詞\nあたらしい\t新\t形容詞\n"
+CONFLICT = ("衝突", "よみ", "読み", "", "", "名詞(a.txt) / 動詞(b.txt)")
+ADDED = ("追加", "あたらしい", "新", "形容詞", "b.txt", "")
+
+EXPECTED = {
+    POLICY_FIRST: (
+        [("かお", "顔", "名詞"), ("よみ", "読み", "名詞"), ("あたらしい", "新", "形容詞")],
+        [("除外", "かお", "顔", "名詞", "b.txt", "重複"), CONFLICT,
+         ("除外", "よみ", "読み", "動詞", "b.txt", "品詞の衝突"), ADDED],
+    ),
+    # 後の辞書のものを残すので、除外として報告するのは先の辞書の方
+    POLICY_LAST: (
+        [("かお", "顔", "名詞"), ("よみ", "読み", "動詞"), ("あたらしい", "新", "形容詞")],
+        [("除外", "かお", "顔", "名詞", "a.txt", "重複"), CONFLICT,
+         ("除外", "よみ", "読み", "名詞", "a.txt", "品詞の衝突"), ADDED],
+    ),
+    POLICY_KEEP_ALL: (
+        [("かお", "顔", "名詞"), ("よみ", "読み", "名詞"), ("よみ", "読み", "動詞"), ("あたらしい", "新", "形容詞")],
+        [("除外", "かお", "顔", "名詞", "b.txt", "重複"), CONFLICT, ADDED],
+    ),
+}
+
+
+def read_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [tuple(line.rstrip("\n").split("\t")) for line in f]
+
+
+# max_entries_in_memory=1 は一時ファイルに書き出して突き合わせる場合
+@pytest.mark.parametrize("max_entries_in_memory", [200000, 1])
+@pytest.mark.parametrize("policy", [POLICY_FIRST, POLICY_LAST, POLICY_KEEP_ALL])
+def test_merge_report(tmp_path, policy, max_entries_in_memory):
+    (tmp_path / "a.txt").write_text(BASE, encoding="utf-8")
+    (tmp_path / "b.txt").write_text(OTHER, encoding="utf-8")
+    output = tmp_path / "merged.txt"
+    report_path = tmp_path / "report.tsv"
+
+    report = merge_dictionaries([str(tmp_path / "a.txt"), str(tmp_path / "b.txt")], str(output), policy,
+                                str(report_path), max_entries_in_memory)
+
+    entries, report_rows = EXPECTED[policy]
+    assert sorted(read_rows(output)) == sorted(entries)
+    rows = read_rows(report_path)
+    assert rows[0] == ("種別", "読み", "表記", "品詞", "辞書", "備考")
+    assert sorted(rows[1:]) == sorted(report_rows)
+    assert (report.total, report.added, report.conflicts) == (len(entries), 1, 1)
+    assert report.dropped == len([row for row in report_rows if row[0] == "除外"])
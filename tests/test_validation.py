@@ -0,0 +1,37 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pytest
+
+from logic import plugins, validation
+
+PLUGIN_SOURCE = '''
+from logic.dictionary_manager import ExportFormat, register_format
+
+register_format(ExportFormat("euc_test", "EUCテスト", "EUC-JPの形式", "_euc.txt", lambda y, h, p: f"{y}\\t{h}\\t{p}", encoding="euc_jp"))
+'''
+
+
+@pytest.fixture
+def euc_plugin(tmp_path):
+    (tmp_path / "euc_test.py").write_text(PLUGIN_SOURCE, encoding="utf-8")
+    assert plugins.load_plugin_dir(str(tmp_path)) == []
+    yield
+    plugins._PLUGINS.pop((plugins.KIND_EXPORT, "euc_test"), None)
+    plugins._plugin_files.remove(str(tmp_path / "euc_test.py"))
+
+
+# 別プロセスではプラグインが登録されていない（Windowsと同じspawnで確かめる）
+def test_plugin_format_in_parallel_validation(euc_plugin, monkeypatch):
+    monkeypatch.setattr(validation, "CHUNK_ROWS", 2)
+    monkeypatch.setattr(validation, "ProcessPoolExecutor",
+                        partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context("spawn")))
+    entries = [("よみ", "読み", "名詞")] * 4 + [("かお", "😀", "名詞")]
+
+    report = validation.validate_entries(entries, parallel=True, max_workers=2)
+
+    issues = [issue for issue in report.issues[4] if issue.code == "encoding"]
+    assert any("euc_test" in issue.formats and "EUCテスト" in issue.message for issue in issues)
+    assert report.error_rows(["euc_test"]) == [4]
+    assert report.error_rows(["google_mozc"]) == []